@@ -0,0 +1,262 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+# --- Özet Tablo Ayarları ---
+# Satış özetleri: (tablo, anahtar sütunları, anahtarın satırdan hesaplanışı; {row} = NEW/OLD/sales)
+SALES_AGGREGATES = (
+    ('daily_product_sales', ('sale_date', 'product_id'), ('{row}.sale_date', '{row}.product_id')),
+    ('product_sales_totals', ('product_id',), ('{row}.product_id',)),
+    ('monthly_sales', ('month',), ('substr({row}.sale_date, 1, 7)',)),
+)
+SALES_MEASURES = ('sale_count', 'total_quantity', 'total_revenue')
+CATEGORY_TABLE = 'category_product_counts'
+# Kaynak tablo → ona yazıldığında değişen özet tabloları
+DEPENDENTS = {
+    'sales': tuple(table for table, _, _ in SALES_AGGREGATES),
+    'products': (CATEGORY_TABLE,),
+}
+AGGREGATE_TABLES = DEPENDENTS['sales'] + DEPENDENTS['products']
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS daily_product_sales (
+        sale_date TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        sale_count INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_revenue REAL NOT NULL,
+        PRIMARY KEY (sale_date, product_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS product_sales_totals (
+        product_id INTEGER PRIMARY KEY,
+        sale_count INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_revenue REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS monthly_sales (
+        month TEXT PRIMARY KEY,
+        sale_count INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_revenue REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS category_product_counts (
+        category TEXT,
+        product_count INTEGER NOT NULL
+    );
+"""
+
+# Şema talimatında (schema_info.py) tablo notları ve kullanım ipucu olarak yer alır
+TABLE_NOTES = {
+    'daily_product_sales': "gün × ürün toplamları",
+    'product_sales_totals': "ürün başına tüm zamanların satış toplamı",
+    'monthly_sales': "ay ('YYYY-MM') başına satış toplamı",
+    'category_product_counts': "kategori başına ürün sayısı",
+}
+PROMPT_HINT = (
+    "Toplam, sayım ve gruplama sorularında sales/products üzerinde GROUP BY yerine "
+    "tetikleyicilerle güncel tutulan özet tablolarını kullan."
+)
+
+
+def _keys(expressions, row):
+    return [expression.format(row=row) for expression in expressions]
+
+
+def _add_sale_sql(table, columns, expressions, row='NEW'):
+    keys = _keys(expressions, row)
+    updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in SALES_MEASURES)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns + SALES_MEASURES)}) "
+        f"VALUES ({', '.join(keys)}, 1, {row}.quantity, {row}.total_amount) "
+        f"ON CONFLICT ({', '.join(columns)}) DO UPDATE SET {updates};"
+    )
+
+
+def _remove_sale_sql(table, columns, expressions, row='OLD'):
+    condition = " AND ".join(f"{c} = {k}" for c, k in zip(columns, _keys(expressions, row)))
+    return (
+        f"UPDATE {table} SET sale_count = sale_count - 1, total_quantity = total_quantity - {row}.quantity, "
+        f"total_revenue = total_revenue - {row}.total_amount WHERE {condition};\n"
+        f"DELETE FROM {table} WHERE {condition} AND sale_count <= 0;"
+    )
+
+
+def _add_product_sql(row='NEW'):
+    return (
+        f"UPDATE {CATEGORY_TABLE} SET product_count = product_count + 1 WHERE category IS {row}.category;\n"
+        f"INSERT INTO {CATEGORY_TABLE} (category, product_count) SELECT {row}.category, 1 "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {CATEGORY_TABLE} WHERE category IS {row}.category);"
+    )
+
+
+def _remove_product_sql(row='OLD'):
+    return (
+        f"UPDATE {CATEGORY_TABLE} SET product_count = product_count - 1 WHERE category IS {row}.category;\n"
+        f"DELETE FROM {CATEGORY_TABLE} WHERE category IS {row}.category AND product_count <= 0;"
+    )
+
+
+def _trigger(name, event, body):
+    return name, f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN\n{body}\nEND"
+
+
+def trigger_sql():
+    """Kaynak tablo → o tablodaki özetleri güncel tutan (ad, CREATE TRIGGER) çiftleri"""
+    add_sale = "\n".join(_add_sale_sql(*spec) for spec in SALES_AGGREGATES)
+    remove_sale = "\n".join(_remove_sale_sql(*spec) for spec in SALES_AGGREGATES)
+    return {
+        'sales': [
+            _trigger('agg_sales_insert', "AFTER INSERT ON sales", add_sale),
+            _trigger('agg_sales_delete', "AFTER DELETE ON sales", remove_sale),
+            _trigger('agg_sales_update', "AFTER UPDATE OF product_id, sale_date, quantity, total_amount ON sales",
+                     f"{remove_sale}\n{add_sale}"),
+        ],
+        'products': [
+            _trigger('agg_products_insert', "AFTER INSERT ON products", _add_product_sql()),
+            _trigger('agg_products_delete', "AFTER DELETE ON products", _remove_product_sql()),
+            _trigger('agg_products_update', "AFTER UPDATE OF category ON products WHEN OLD.category IS NOT NEW.category",
+                     f"{_remove_product_sql()}\n{_add_product_sql()}"),
+        ],
+    }
+
+
+def affected_tables(table):
+    """Tabloya yazıldığında sonuç önbelleğinde geçersiz kılınması gereken tüm tablolar"""
+    return (table,) + DEPENDENTS.get(table, ())
+
+
+def _existing(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def _fold_sales(conn, after_rowid=None):
+    """sales satırlarını (after_rowid verilirse yalnızca yenilerini) tek GROUP BY ile özetlere ekle"""
+    where = "WHERE rowid > ?" if after_rowid is not None else "WHERE 1"
+    params = (after_rowid,) if after_rowid is not None else ()
+    for table, columns, expressions in SALES_AGGREGATES:
+        keys = ", ".join(_keys(expressions, 'sales'))
+        updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in SALES_MEASURES)
+        # 'WHERE' yan tümcesi, INSERT ... SELECT ile ON CONFLICT arasındaki ayrıştırma belirsizliğini giderir
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns + SALES_MEASURES)}) "
+            f"SELECT {keys}, COUNT(*), SUM(quantity), SUM(total_amount) FROM sales {where} GROUP BY {keys} "
+            f"ON CONFLICT ({', '.join(columns)}) DO UPDATE SET {updates}",
+            params
+        )
+
+
+def rebuild(conn, source=None):
+    """Özetleri kaynak tablolardan baştan hesapla (source verilirse yalnızca o tablonunkileri)"""
+    sources = [source] if source else list(DEPENDENTS)
+    if 'sales' in sources:
+        for table in DEPENDENTS['sales']:
+            conn.execute(f"DELETE FROM {table}")
+        _fold_sales(conn)
+    if 'products' in sources:
+        conn.execute(f"DELETE FROM {CATEGORY_TABLE}")
+        conn.execute(
+            f"INSERT INTO {CATEGORY_TABLE} (category, product_count) "
+            "SELECT category, COUNT(*) FROM products GROUP BY category"
+        )
+
+
+def install(conn):
+    """Özet tablolarını ve tetikleyicileri kur; yeni kurulan ya da tetikleyicisi eksik özetleri doldur
+
+    Birden çok kez çağrılabilir; her şey zaten kuruluysa yalnızca sqlite_master okunur.
+    Kurulan kaynak tabloların listesini döndürür.
+    """
+    tables, triggers = _existing(conn, 'table'), _existing(conn, 'trigger')
+    installed = []
+    for source, statements in trigger_sql().items():
+        if set(DEPENDENTS[source]) <= tables and {name for name, _ in statements} <= triggers:
+            continue
+        # executescript bekleyen işlemi commit edeceği için ifadeler tek tek çalıştırılır
+        for statement in SCHEMA_SQL.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        for _, statement in statements:
+            conn.execute(statement)
+        rebuild(conn, source)
+        installed.append(source)
+    return installed
+
+
+def suspend_triggers(conn, source):
+    """Kaynak tablonun özet tetikleyicilerini sil ve yeniden oluşturmak için SQL'lerini döndür
+
+    Toplu içe aktarımda satır başına tetikleyici yerine sonda apply_inserted ile tek GROUP BY yapılır.
+    """
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? AND name LIKE 'agg\\_%' ESCAPE '\\'",
+        (source,)
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP TRIGGER "{name}"')
+    return [sql for _, sql in rows]
+
+
+def apply_inserted(conn, source, after_rowid=None):
+    """Tetikleyiciler kapalıyken eklenen satırları özetlere yansıt
+
+    after_rowid, eklemeden önceki MAX(rowid)'dir; bilinmiyorsa (ör. kimlikler dosyadan geldiyse)
+    o kaynağın özetleri baştan hesaplanır.
+    """
+    if source == 'sales' and after_rowid is not None:
+        _fold_sales(conn, after_rowid)
+    else:
+        rebuild(conn, source)
+
+
+def _differs(conn, expected, actual):
+    return conn.execute(
+        f"SELECT (SELECT COUNT(*) FROM ({expected} EXCEPT {actual})) + (SELECT COUNT(*) FROM ({actual} EXCEPT {expected}))"
+    ).fetchone()[0] > 0
+
+
+def check(conn):
+    """Özetleri kaynak tablolardan yeniden hesaplananla karşılaştır; uyuşmayan tabloları döndür"""
+    mismatched = []
+    for table, columns, expressions in SALES_AGGREGATES:
+        keys = ", ".join(_keys(expressions, 'sales'))
+        expected = f"SELECT {keys}, COUNT(*), SUM(quantity), ROUND(SUM(total_amount), 2) FROM sales GROUP BY {keys}"
+        actual = f"SELECT {', '.join(columns)}, sale_count, total_quantity, ROUND(total_revenue, 2) FROM {table}"
+        if _differs(conn, expected, actual):
+            mismatched.append(table)
+    expected = "SELECT category, COUNT(*) FROM products GROUP BY category"
+    actual = f"SELECT category, product_count FROM {CATEGORY_TABLE}"
+    if _differs(conn, expected, actual):
+        mismatched.append(CATEGORY_TABLE)
+    return mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Özet tablolarını kur, yeniden hesapla veya doğrula")
+    parser.add_argument("--db", default="sales.db", help="SQLite veritabanı dosyası")
+    parser.add_argument("--rebuild", action="store_true", help="Tüm özetleri baştan hesapla")
+    parser.add_argument("--check", action="store_true", help="Özetlerin kaynak tablolarla tutarlılığını doğrula")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        started = time.perf_counter()
+        with conn:
+            installed = install(conn)
+            if args.rebuild:
+                rebuild(conn)
+        if installed or args.rebuild:
+            print(f"Özetler {time.perf_counter() - started:.2f} sn'de hesaplandı.")
+        if args.check:
+            mismatched = check(conn)
+            if mismatched:
+                print(f"Tutarsız özet tablo(lar): {', '.join(mismatched)} (--rebuild ile düzeltin)")
+                return 1
+            print("Tüm özet tabloları kaynak tablolarla tutarlı.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
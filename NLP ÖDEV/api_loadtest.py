@@ -0,0 +1,292 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark import DEFAULT_QUESTIONS
+
+# --- Yük Testi Ayarları ---
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONCURRENCY = 16
+DEFAULT_DURATION = 10.0
+DEFAULT_PORT = 8765
+# Senaryo → ağırlık; okumalar ağırlıklı, az sayıda yazma ve büyük sonuç akışı
+DEFAULT_MIX = "ask=4,query=3,get=4,list=2,write=1,stream=1"
+STARTUP_TIMEOUT_SECONDS = 60
+REQUEST_TIMEOUT_SECONDS = 60
+QUERIES = [
+    "SELECT * FROM products ORDER BY price DESC LIMIT 5",
+    "SELECT customer_id, SUM(total_amount) AS total FROM sales GROUP BY customer_id ORDER BY total DESC LIMIT 10",
+    "SELECT COUNT(*) FROM sales",
+]
+# Akış senaryosu sınırlı bir sonuç indirir; tüm tabloyu (EXPORT_MAX_ROWS'a kadar) akıtmak büyük
+# veritabanında tek isteği testin süresinden uzun yapar ve diğer senaryoları aç bırakır
+STREAM_ROWS = 20000
+STREAM_QUERY = f"SELECT * FROM sales LIMIT {STREAM_ROWS}"
+
+
+def _percentiles(samples):
+    values = sorted(value * 1000 for value in samples)
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+
+    def rank(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+    return {"p50_ms": rank(0.50), "p95_ms": rank(0.95), "p99_ms": rank(0.99),
+            "mean_ms": round(statistics.fmean(values), 3)}
+
+
+def parse_mix(text):
+    """'ask=4,get=2' → [('ask', 4), ('get', 2)]"""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Bilinmeyen senaryo: {name} (seçenekler: {', '.join(SCENARIOS)})")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+class Cancelled(Exception):
+    """İstek test süresi dolduğu için yarıda bırakıldı"""
+
+
+class Client:
+    """Bağlantıyı açık tutan (keep-alive) basit JSON istemcisi; iş parçacığı başına bir tane
+
+    deadline (perf_counter) verilirse o andan sonra yanıt beklenmez: soket süresi kalan süreyle
+    sınırlanır, akış okuması yarıda kesilir ve Cancelled fırlatılır.
+    """
+
+    def __init__(self, base_url, deadline=None):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.deadline = deadline
+        self.conn = None
+
+    def _remaining(self):
+        if self.deadline is None:
+            return REQUEST_TIMEOUT_SECONDS
+        remaining = self.deadline - time.perf_counter()
+        if remaining <= 0:
+            raise Cancelled()
+        return min(remaining, REQUEST_TIMEOUT_SECONDS)
+
+    def request(self, method, path, body=None, read_lines=False):
+        """(durum, gövde) döndür; read_lines ise NDJSON gövdesi satır sayısı olarak döner"""
+        timeout = self._remaining()
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        elif self.conn.sock is not None:
+            self.conn.sock.settimeout(timeout)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {"Content-Type": 'application/json'} if data else {}
+        try:
+            self.conn.request(method, path, data, headers)
+            response = self.conn.getresponse()
+            if read_lines:
+                lines = 0
+                for _ in response:
+                    lines += 1
+                    if self.deadline is not None and time.perf_counter() > self.deadline:
+                        raise Cancelled()
+                return response.status, lines
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException, Cancelled) as e:
+            self.conn.close()
+            self.conn = None
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise Cancelled() from e
+            raise
+
+
+def _ask(client, rng, state):
+    return client.request('POST', '/ask', {"question": rng.choice(DEFAULT_QUESTIONS), "max_rows": 100})
+
+
+def _query(client, rng, state):
+    return client.request('POST', '/query', {"sql": rng.choice(QUERIES)})
+
+
+def _get(client, rng, state):
+    return client.request('GET', f"/products/{rng.randint(1, state['products'])}")
+
+
+def _list(client, rng, state):
+    return client.request('GET', f"/sales?after={rng.randint(0, state['sales'])}&limit=50")
+
+
+def _write(client, rng, state):
+    quantity = rng.randint(1, 5)
+    return client.request('POST', '/sales', {
+        "product_id": rng.randint(1, state['products']), "customer_id": rng.randint(100, 999),
+        "sale_date": time.strftime('%Y-%m-%d'), "quantity": quantity, "total_amount": quantity * 10.0,
+    })
+
+
+def _stream(client, rng, state):
+    return client.request('POST', '/query', {"sql": STREAM_QUERY, "stream": True}, read_lines=True)
+
+
+SCENARIOS = {'ask': _ask, 'query': _query, 'get': _get, 'list': _list, 'write': _write, 'stream': _stream}
+
+
+def _table_size(client, table):
+    """Satır sayısı; ID'ler 1'den başlayıp ardışık olduğundan rastgele ID seçiminde üst sınırdır"""
+    status, body = client.request('POST', '/query', {"sql": f"SELECT COUNT(*) AS n FROM {table}"})
+    if status != 200:
+        raise RuntimeError(f"Tablo boyutu okunamadı ({status}): {body[:200]!r}")
+    return max(1, json.loads(body)["rows"][0][0])
+
+
+def run_load(base_url, mix, concurrency=DEFAULT_CONCURRENCY, duration=DEFAULT_DURATION, seed=0):
+    """concurrency iş parçacığıyla duration saniye boyunca karışımdan istek gönder; senaryo başına sonuçlar"""
+    probe = Client(base_url)
+    state = {"products": _table_size(probe, 'products'), "sales": _table_size(probe, 'sales')}
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results = {name: {"latencies": [], "errors": 0, "cancelled": 0, "statuses": {}} for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(base_url, deadline)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _ = SCENARIOS[name](client, rng, state)
+            except Cancelled:
+                # Süre dolunca yarıda kalan istek ne başarı ne hata sayılır
+                with lock:
+                    results[name]["cancelled"] += 1
+                continue
+            except (OSError, http.client.HTTPException):
+                status = 'connection'
+            elapsed = time.perf_counter() - started
+            with lock:
+                item = results[name]
+                item["statuses"][str(status)] = item["statuses"].get(str(status), 0) + 1
+                if status in (200, 201):
+                    item["latencies"].append(elapsed)
+                else:
+                    item["errors"] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name, item in results.items():
+        count = len(item["latencies"]) + item["errors"]
+        report[name] = {"requests": count, "errors": item["errors"], "cancelled": item["cancelled"],
+                        "per_sec": round(count / elapsed, 1),
+                        "statuses": item["statuses"], **_percentiles(item["latencies"])}
+    total = sum(item["requests"] for item in report.values())
+    return {"seconds": round(elapsed, 2), "requests": total, "per_sec": round(total / elapsed, 1),
+            "errors": sum(item["errors"] for item in report.values()), "scenarios": report}
+
+
+def start_server(db_file, port, backend='mock'):
+    """api_service'i veritabanı kopyasıyla geçici klasörde başlat; (süreç, klasör) döndür"""
+    workdir = tempfile.mkdtemp(prefix="api_load_")
+    if db_file and os.path.exists(db_file):
+        shutil.copy(db_file, os.path.join(workdir, 'sales.db'))
+    env = dict(os.environ, LLM_BACKEND=backend, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, 'api_service.py'), '--port', str(port)],
+                               cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    client = Client(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Sunucu başlatılamadı: {process.stderr.read().decode('utf-8', 'replace')[-500:]}")
+        try:
+            status, body = client.request('GET', '/health')
+            if status == 200 and json.loads(body)["status"] == 'ok':
+                return process, workdir
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Sunucu zamanında hazır olmadı.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API'sine (api_service.py) yerel yük testi uygula")
+    parser.add_argument("--url", help="Çalışan sunucu (verilmezse mock LLM ile yerel sunucu başlatılır)")
+    parser.add_argument("--db", default=os.path.join(HERE, 'sales.db'), help="Yerel sunucu için kopyalanan veritabanı")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Yerel sunucunun portu")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Eşzamanlı istemci sayısı")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Test süresi (sn)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Senaryo ağırlıkları ({', '.join(SCENARIOS)})")
+    parser.add_argument("--output", help="JSON sonucun yazılacağı dosya (varsayılan: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"HATA: {e}", file=sys.stderr)
+        return 1
+
+    process = workdir = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            process, workdir = start_server(args.db, args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+        print(f"{base_url} üzerinde {args.concurrency} istemciyle {args.duration:g} sn yük uygulanıyor...",
+              file=sys.stderr)
+        result = run_load(base_url, mix, args.concurrency, args.duration)
+    except RuntimeError as e:
+        print(f"HATA: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, item in result["scenarios"].items():
+        print(f"  {name:7s} {item['per_sec']:8.1f} istek/sn  p50 {item['p50_ms'] or 0:8.2f} ms  "
+              f"p95 {item['p95_ms'] or 0:8.2f} ms  p99 {item['p99_ms'] or 0:8.2f} ms  hata {item['errors']}"
+              f"  yarıda {item['cancelled']}",
+              file=sys.stderr)
+    print(f"Toplam {result['requests']} istek, {result['per_sec']} istek/sn, {result['errors']} hata", file=sys.stderr)
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "url": args.url or "local",
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "mix": dict(mix),
+        **result,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if result["errors"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import columnar
+import crud
+import text_to_sql_app as core
+from llm_client import background_loop, get_client, strip_code_fences
+from metrics import CONTENT_TYPE, METRICS_FILE, REGISTRY, record_error, render as render_metrics, track, write_textfile
+from query_guard import EXPORT_MAX_ROWS, EXPORT_TIMEOUT_SECONDS, MAX_ROWS, QueryRejected, QueryTimeout, iter_query, validate
+from sql_repair import execute_with_repair
+from warmup import WarmUp, preload_modules
+from write_queue import WRITE_QUEUE_ENABLED, get_write_queue
+
+# Sunucu isteğe bağlıdır; uygulama herhangi bir ASGI sunucusuyla (uvicorn, hypercorn) çalışır
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+# --- API Ayarları ---
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8000"))
+# SQL (okuma, yazma, önbellek) iş parçacıklarında çalışır; havuzdaki boşta okuyucu sayısıyla aynı tutulur
+SQL_WORKERS = int(os.environ.get("API_SQL_WORKERS", "8"))
+MAX_BODY_BYTES = 1024 * 1024
+STREAM_CHUNK_ROWS = 1000
+NDJSON_TYPE = 'application/x-ndjson'
+JSON_TYPE = 'application/json; charset=utf-8'
+
+REQUEST_SECONDS = REGISTRY.histogram('texttosql_api_request_seconds', 'HTTP API istek süresi', ('route',))
+RESPONSES = REGISTRY.counter('texttosql_api_responses_total', 'HTTP API yanıtları', ('route', 'status'))
+
+
+class HTTPError(Exception):
+    """İstemciye {"error": ...} gövdesi ve verilen durum koduyla dönen hata"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _status_for(error):
+    """Çekirdek istisnasını HTTP durum koduna eşle"""
+    if isinstance(error, HTTPError):
+        return error.status
+    if isinstance(error, QueryTimeout):
+        return 504
+    if isinstance(error, QueryRejected):
+        return 422
+    if isinstance(error, sqlite3.IntegrityError):
+        return 409
+    if isinstance(error, (ValueError, sqlite3.DatabaseError)):
+        return 400
+    # pandas, sqlite3 hatasını kendi DatabaseError türüne sarar
+    if type(error).__name__ == 'DatabaseError':
+        return 400
+    return 500
+
+
+def _fields(body, spec):
+    """Gövdedeki alanları sırayla ve türüne dönüştürerek döndür; spec: [(ad, tür, zorunlu mu)]"""
+    values = []
+    for name, kind, required in spec:
+        value = body.get(name)
+        if value is None:
+            if required:
+                raise HTTPError(400, f"'{name}' alanı gereklidir.")
+            values.append(None)
+            continue
+        try:
+            values.append(kind(value))
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"'{name}' alanı {kind.__name__} olmalıdır.") from None
+    return values
+
+
+def _int_param(query, name, default):
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' parametresi tam sayı olmalıdır.") from None
+
+
+def _max_rows(value):
+    """İstemcinin max_rows değeri 1..MAX_ROWS aralığına çekilir; verilmezse MAX_ROWS"""
+    return MAX_ROWS if value is None else max(1, min(value, MAX_ROWS))
+
+
+PRODUCT_FIELDS = [('product_name', str, True), ('category', str, False), ('price', float, True)]
+SALE_FIELDS = [('product_id', int, True), ('customer_id', int, True), ('sale_date', str, True),
+               ('quantity', int, True), ('total_amount', float, True)]
+# Kaynak adı → (sütunlar, alanlar, getir, listele, ekle, güncelle, sil)
+RESOURCES = {
+    'products': (crud.PRODUCT_COLUMNS, PRODUCT_FIELDS, crud.get_product, crud.list_products,
+                 crud.add_product, crud.update_product, crud.delete_product),
+    'sales': (crud.SALE_COLUMNS, SALE_FIELDS, crud.get_sale, crud.list_sales,
+              crud.add_sale, crud.update_sale, crud.delete_sale),
+}
+
+
+class Streamed:
+    """Bayt parçaları üreten async üreteçten parça parça gönderilecek yanıt"""
+
+    def __init__(self, chunks, content_type=NDJSON_TYPE):
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+class Raw:
+    """JSON'a çevrilmeden gönderilecek gövde"""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+
+
+class TextToSqlApi:
+    """text_to_sql_app çekirdeğini ve CRUD işlemlerini JSON uç noktaları olarak sunan ASGI uygulaması
+
+    Olay döngüsü yalnızca HTTP'yi ve LLM çağrılarını bekler: SQL (sorgu, CRUD, önbellek) havuzdaki
+    bağlantılarla iş parçacığı havuzunda çalışır; LLM çağrıları ortak arka plan döngüsündeki
+    AsyncLLMClient'a gider, böylece eşzamanlılık sınırı ve istek birleştirme CLI ile aynı kalır.
+    Büyük sonuçlar stream=true ile NDJSON olarak parça parça gönderilir.
+    """
+
+    def __init__(self, sql_workers=SQL_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=sql_workers, thread_name_prefix="api-sql")
+        self.warm_up = WarmUp()
+        self.routes = [
+            ('GET', re.compile(r'/health'), self.health),
+            ('GET', re.compile(r'/metrics'), self.metrics),
+            ('POST', re.compile(r'/sql'), self.sql),
+            ('POST', re.compile(r'/query'), self.query),
+            ('POST', re.compile(r'/ask'), self.ask),
+        ]
+        for resource in RESOURCES:
+            self.routes += [
+                ('GET', re.compile(rf'/{resource}'), functools.partial(self.list_items, resource)),
+                ('POST', re.compile(rf'/{resource}'), functools.partial(self.create_item, resource)),
+                ('GET', re.compile(rf'/{resource}/(\d+)'), functools.partial(self.get_item, resource)),
+                ('PUT', re.compile(rf'/{resource}/(\d+)'), functools.partial(self.update_item, resource)),
+                ('DELETE', re.compile(rf'/{resource}/(\d+)'), functools.partial(self.delete_item, resource)),
+            ]
+
+    # --- ASGI ---
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope["type"] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == 'lifespan.startup':
+                self.start()
+                await send({"type": 'lifespan.startup.complete'})
+            elif message["type"] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                if METRICS_FILE:
+                    write_textfile(METRICS_FILE)
+                await send({"type": 'lifespan.shutdown.complete'})
+                return
+
+    def start(self):
+        """Kurulumu (veritabanı, şema, model, önbellekler) ve sütunlu kopyayı arka planda başlat"""
+        self.warm_up.start("modules", preload_modules)
+        self.warm_up.start("initialize", core.initialize)
+        self.warm_up.start("columnar", columnar.get_mirror, core.DB_FILE)
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+        route, handler, args = self._match(scope["method"], scope["path"])
+        status = 500
+        try:
+            if handler is None:
+                raise HTTPError(405 if route else 404, "Bulunamadı." if not route else "Yönteme izin verilmiyor.")
+            request = {
+                "query": parse_qs(scope.get("query_string", b"").decode('latin-1')),
+                "headers": {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get("headers", [])},
+                "body": await self._read_body(receive, scope["method"]),
+            }
+            result = await handler(request, *args)
+            if isinstance(result, Streamed):
+                status = await self._send_stream(send, result)
+            else:
+                status, payload = result
+                await _send(send, status, payload)
+        except Exception as e:
+            status = _status_for(e)
+            if status >= 500:
+                record_error(f"api_{route or 'unknown'}", e)
+            await _send(send, status, {"error": str(e)})
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=route or 'unknown')
+            RESPONSES.inc(route=route or 'unknown', status=str(status))
+
+    def _match(self, method, path):
+        """(metrik için rota adı, işleyici, yol parametreleri); yol var ama yöntem yoksa işleyici None"""
+        path = path.rstrip('/') or '/'
+        route = None
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            route = re.sub(r'/\d+', '/{id}', path).lstrip('/')
+            if route_method == method:
+                return route, handler, [int(group) for group in match.groups()]
+        return route, None, []
+
+    async def _read_body(self, receive, method):
+        if method in ('GET', 'DELETE'):
+            return {}
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "İstek gövdesi çok büyük.")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        raw = b"".join(chunks)
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise HTTPError(400, "Gövde geçerli JSON değil.") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Gövde bir JSON nesnesi olmalıdır.")
+        return body
+
+    async def _send_stream(self, send, streamed):
+        """İlk parça hazır olduktan sonra 200 başlığını gönder; sonraki hata son satırda bildirilir"""
+        chunks = streamed.chunks
+        try:
+            first = await chunks.__anext__()
+            await send({"type": 'http.response.start', "status": 200,
+                        "headers": [(b"content-type", streamed.content_type.encode())]})
+            await send({"type": 'http.response.body', "body": first, "more_body": True})
+            try:
+                async for chunk in chunks:
+                    await send({"type": 'http.response.body', "body": chunk, "more_body": True})
+            except Exception as e:
+                record_error("api_stream", e)
+                await send({"type": 'http.response.body', "body": _json_line({"error": str(e)}), "more_body": True})
+            await send({"type": 'http.response.body', "body": b""})
+        finally:
+            # İstemci bağlantıyı kesse de sorgu durdurulur ve bağlantı havuza döner
+            await chunks.aclose()
+        return 200
+
+    # --- Yardımcılar ---
+    async def run(self, function, *args):
+        """Engelleyen işi (SQL, önbellek) iş parçacığı havuzunda çalıştır"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(function, *args))
+
+    async def ready(self):
+        """Kurulum bitene kadar bekle; sunucu lifespan göndermediyse kurulumu burada başlat"""
+        if not self.warm_up.ready("initialize"):
+            self.start()
+            await self.run(self.warm_up.wait, "initialize")
+
+    async def translate(self, question):
+        """Soruyu SQL'e çevir; (sql, kaynak) döndür. Kaynak: fast_path, cache, similar ya da llm"""
+        await self.ready()
+        with track("nl_to_sql"):
+            # Eşleyici mikro saniyeler sürer; iş parçacığı havuzuna gönderilmez
+            matched = core.fast_path.match(question) if core.fast_path is not None else None
+            if matched is not None:
+                return matched.sql, 'fast_path'
+            cached_sql = await self.run(core.query_cache.get, question, core.SCHEMA_HASH)
+            if cached_sql is not None:
+                return cached_sql, 'cache'
+            similar_sql = await self.run(core.question_index.lookup, question)
+            if similar_sql is not None:
+                return similar_sql, 'similar'
+            if core.model is None:
+                raise HTTPError(503, "LLM modeli başlatılamadı.")
+            # İstemci ortak arka plan döngüsüne bağlıdır; çağrı oraya gönderilir ve burada beklenir
+            future = asyncio.run_coroutine_threadsafe(
+                get_client(core.model).generate(core.schema.user_prompt(question)), background_loop().loop
+            )
+            sql_query = strip_code_fences(await asyncio.wrap_future(future))
+        if not sql_query:
+            raise HTTPError(502, "Model boş bir SQL döndürdü.")
+        await self.run(core.query_cache.put, question, core.SCHEMA_HASH, sql_query)
+        return sql_query, 'llm'
+
+    def _stream_rows(self, sql_query):
+        """Sorgu sonucunu NDJSON olarak üret: önce {"sql", "columns"}, sonra satırlar, en son {"row_count"}"""
+        async def chunks():
+            frames = iter_query(core.db_pool, sql_query, None, STREAM_CHUNK_ROWS, EXPORT_MAX_ROWS, EXPORT_TIMEOUT_SECONDS)
+            # Üreteç sorguyu ilk next() çağrısında çalıştırır; hata başlık gönderilmeden önce çıkar
+            frame = await self.run(next, frames, None)
+            columns = list(frame.columns) if frame is not None else []
+            yield _json_line({"sql": sql_query, "columns": columns})
+            row_count = 0
+            try:
+                while frame is not None:
+                    row_count += len(frame)
+                    yield await self.run(_ndjson, frame)
+                    frame = await self.run(next, frames, None)
+            finally:
+                await self.run(frames.close)
+            yield _json_line({"row_count": row_count, "truncated": row_count >= EXPORT_MAX_ROWS})
+        return Streamed(chunks())
+
+    # --- Uç noktalar ---
+    async def health(self, request):
+        status = "ok" if self.warm_up.ready("initialize") else "starting"
+        writes = get_write_queue(core.db_pool).stats() if WRITE_QUEUE_ENABLED else None
+        fast_path = core.fast_path.stats() if core.fast_path is not None else None
+        return 200, {"status": status, "warmup": self.warm_up.stats(), "writes": writes, "fast_path": fast_path}
+
+    async def metrics(self, request):
+        return 200, Raw(render_metrics().encode('utf-8'), CONTENT_TYPE)
+
+    async def sql(self, request):
+        """{"question"} → {"question", "sql", "source"}"""
+        question, = _fields(request["body"], [('question', str, True)])
+        sql_query, source = await self.translate(question)
+        return 200, {"question": question, "sql": sql_query, "source": source}
+
+    async def query(self, request):
+        """{"sql", "max_rows"?, "stream"?} → sonuç (JSON ya da NDJSON akışı)"""
+        body = request["body"]
+        sql_query, max_rows = _fields(body, [('sql', str, True), ('max_rows', int, False)])
+        await self.ready()
+        if _wants_stream(request):
+            await self.run(core.workload.record, sql_query)
+            return self._stream_rows(sql_query)
+        df, truncated = await self.run(core.run_sql, sql_query, _max_rows(max_rows))
+        return 200, await self.run(_result, sql_query, df, truncated)
+
+    async def ask(self, request):
+        """{"question", "max_rows"?, "stream"?} → çevir, gerekirse onar ve çalıştır"""
+        body = request["body"]
+        question, max_rows = _fields(body, [('question', str, True), ('max_rows', int, False)])
+        sql_query, source = await self.translate(question)
+        try:
+            if _wants_stream(request):
+                # Akışta sorgu yalnızca doğrulanır (derleme + maliyet); hata varsa önce onarılır
+                _, executed_sql, _ = await self.run(
+                    execute_with_repair, lambda sql: validate(core.db_pool, sql), sql_query, core.model,
+                    core.SCHEMA_HASH, core.fix_store, core.schema
+                )
+            else:
+                df, truncated, executed_sql = await self.run(
+                    functools.partial(core.run_repaired_sql, sql_query, _max_rows(max_rows), verbose=False)
+                )
+        except Exception:
+            await self.run(core.query_cache.discard, question, core.SCHEMA_HASH)
+            raise
+        if executed_sql != sql_query:
+            await self.run(core.query_cache.put, question, core.SCHEMA_HASH, executed_sql)
+        await self.run(core.question_index.add, question, executed_sql)
+        if _wants_stream(request):
+            await self.run(core.workload.record, executed_sql)
+            return self._stream_rows(executed_sql)
+        result = await self.run(_result, executed_sql, df, truncated)
+        result.update(question=question, source=source)
+        if executed_sql != sql_query:
+            result["repaired_from"] = sql_query
+        return 200, result
+
+    async def list_items(self, resource, request):
+        """?after=<id>&limit=<n> ile anahtar kümesi sayfalama; next_after sonraki sayfanın başlangıcı"""
+        columns, _, _, list_function, *_ = RESOURCES[resource]
+        after_id = _int_param(request["query"], 'after', 0)
+        limit = max(1, min(_int_param(request["query"], 'limit', crud.DEFAULT_PAGE_SIZE), crud.MAX_PAGE_SIZE))
+        await self.ready()
+        # Bir fazla satır okunarak sonraki sayfanın varlığı anlaşılır
+        rows = await self.run(list_function, core.db_pool, after_id, limit + 1)
+        items = [dict(zip(columns, row)) for row in rows[:limit]]
+        return 200, {"items": items, "next_after": items[-1][columns[0]] if len(rows) > limit else None}
+
+    async def get_item(self, resource, request, item_id):
+        columns, _, get_function, *_ = RESOURCES[resource]
+        await self.ready()
+        row = await self.run(get_function, core.db_pool, item_id)
+        if row is None:
+            raise HTTPError(404, f"Kayıt bulunamadı: {item_id}")
+        return 200, dict(zip(columns, row))
+
+    async def create_item(self, resource, request):
+        columns, fields, _, _, add_function, *_ = RESOURCES[resource]
+        values = _fields(request["body"], fields)
+        await self.ready()
+        item_id = await self.run(add_function, core.db_pool, *values)
+        return 201, {columns[0]: item_id, **dict(zip(columns[1:], values))}
+
+    async def update_item(self, resource, request, item_id):
+        columns, fields, _, _, _, update_function, _ = RESOURCES[resource]
+        values = _fields(request["body"], fields)
+        await self.ready()
+        if not await self.run(update_function, core.db_pool, item_id, *values):
+            raise HTTPError(404, f"Kayıt bulunamadı: {item_id}")
+        return 200, {columns[0]: item_id, **dict(zip(columns[1:], values))}
+
+    async def delete_item(self, resource, request, item_id):
+        delete_function = RESOURCES[resource][-1]
+        await self.ready()
+        if not await self.run(delete_function, core.db_pool, item_id):
+            raise HTTPError(404, f"Kayıt bulunamadı: {item_id}")
+        return 200, {"deleted": item_id}
+
+
+async def _send(send, status, payload):
+    if isinstance(payload, Raw):
+        body, content_type = payload.body, payload.content_type
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'), JSON_TYPE
+    await send({"type": 'http.response.start', "status": status,
+                "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]})
+    await send({"type": 'http.response.body', "body": body})
+
+
+def _json_line(item):
+    return (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+
+
+def _ndjson(frame):
+    # pandas NaN'ı null'a, tarihleri ISO metnine çevirir
+    text = frame.to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+    return (text if text.endswith("\n") else text + "\n").encode('utf-8')
+
+
+def _result(sql_query, df, truncated):
+    """DataFrame'i {"sql", "columns", "rows", "row_count", "truncated"} yanıtına çevir"""
+    data = json.loads(df.to_json(orient='split', index=False, force_ascii=False, date_format='iso'))
+    return {"sql": sql_query, "columns": data["columns"], "rows": data["data"], "row_count": len(df),
+            "truncated": truncated}
+
+
+def _wants_stream(request):
+    return bool(request["body"].get("stream")) or NDJSON_TYPE in request["headers"].get("accept", "")
+
+
+app = TextToSqlApi()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text-to-SQL ve CRUD işlemleri için HTTP API sunucusu")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+    if uvicorn is None:
+        print("HATA: Sunucuyu başlatmak için uvicorn kurulu olmalıdır (pip install uvicorn).")
+        print("Uygulama başka bir ASGI sunucusuyla da çalıştırılabilir: api_service:app")
+        return 1
+    # Tek süreç: önbellekler, bağlantı havuzu ve LLM istemcisi süreç içinde paylaşılır
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from query_guard import QueryRejected
+
+# --- Toplu Çalıştırma Ayarları ---
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 1
+RETRY_DELAY_SECONDS = 0.5
+WINDOW_PER_WORKER = 4          # sıra korunurken işçi başına önde çalışabilecek soru sayısı
+PARQUET_ROW_GROUP = 500
+PROGRESS_INTERVAL_SECONDS = 0.5
+FORMATS = ('jsonl', 'csv', 'parquet')
+SUMMARY_COLUMNS = ('id', 'question', 'sql', 'row_count', 'truncated', 'error', 'attempts', 'seconds', 'rows_json')
+
+
+def read_questions(path):
+    """Dosyadan ('-' ise stdin) soruları oku
+
+    Her satır {"id": ..., "question": ...} nesnesi, JSON metni ya da düz metin olabilir.
+    """
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        items = []
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                value = line
+            if isinstance(value, dict):
+                items.append({"id": value.get("id", len(items) + 1), "question": str(value["question"])})
+            else:
+                items.append({"id": len(items) + 1, "question": str(value)})
+        return items
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def process(item, translate, execute, retries=DEFAULT_RETRIES):
+    """Tek bir soruyu çevir ve çalıştır; sonucu (hata dahil) kayıt olarak döndür
+
+    execute(sql) (DataFrame, kesildi mi) ya da sorgu düzeltildiyse ek olarak çalışan SQL'i döndürür.
+    """
+    started = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"], "sql": None, "row_count": 0,
+              "truncated": False, "rows": [], "error": None, "attempts": 0}
+    for attempt in range(retries + 1):
+        record["attempts"] = attempt + 1
+        try:
+            record["sql"] = translate(item["question"])
+            if not record["sql"]:
+                raise ValueError("Model boş bir SQL döndürdü.")
+            df, truncated, *executed = execute(record["sql"])
+            if executed and executed[0] != record["sql"]:
+                # Sorgu çalıştırılırken otomatik düzeltildi (sql_repair.py)
+                record["repaired_from"], record["sql"] = record["sql"], executed[0]
+            record.update(rows=df.to_dict('records'), row_count=len(df), truncated=truncated, error=None)
+            break
+        except QueryRejected as e:
+            # Engellenen sorgu tekrar denense de engellenir
+            record["error"] = f"Sorgu engellendi: {e}"
+            break
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            if attempt < retries:
+                time.sleep(RETRY_DELAY_SECONDS * (attempt + 1))
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def run_batch(items, translate, execute, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES):
+    """Soruları concurrency iş parçacığıyla işle; sonuçları girdi sırasıyla üret"""
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(process, item, translate, execute, retries))
+            # Önde biriken sonuçlar sınırlı kalsın; en eski soru bitmeden yenileri beklesin
+            if len(pending) >= concurrency * WINDOW_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _summary_row(record):
+    row = {column: record.get(column) for column in SUMMARY_COLUMNS}
+    row["rows_json"] = json.dumps(record["rows"], ensure_ascii=False, default=str)
+    return row
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+class CsvWriter:
+    """Soru başına bir satır; sonuç satırları rows_json sütununda JSON olarak tutulur"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._writer = csv.DictWriter(stream, fieldnames=SUMMARY_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, record):
+        self._writer.writerow(_summary_row(record))
+
+    def close(self):
+        self.stream.flush()
+
+
+class ParquetWriter:
+    """CsvWriter ile aynı sütunlar; kayıtlar PARQUET_ROW_GROUP'luk gruplar halinde yazılır"""
+
+    def __init__(self, path):
+        # Parquet çıktısı isteğe bağlıdır; pyarrow (numpy ile birlikte) yalnızca bu biçim istenince yüklenir
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet çıktısı için pyarrow kurulu olmalıdır.") from None
+        self._pa = pa
+        self.schema = pa.schema([
+            ('id', pa.string()), ('question', pa.string()), ('sql', pa.string()), ('row_count', pa.int64()),
+            ('truncated', pa.bool_()), ('error', pa.string()), ('attempts', pa.int64()),
+            ('seconds', pa.float64()), ('rows_json', pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema)
+        self._buffer = []
+
+    def write(self, record):
+        row = _summary_row(record)
+        row["id"] = str(row["id"])
+        self._buffer.append(row)
+        if len(self._buffer) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self.schema))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path, output_format=None):
+    """Çıktı yazıcısı ve kapatılacak dosyayı döndür; biçim verilmezse uzantıdan anlaşılır"""
+    if output_format is None:
+        extension = path.rsplit('.', 1)[-1].lower() if '.' in path else 'jsonl'
+        output_format = extension if extension in FORMATS else 'jsonl'
+    if output_format == 'parquet':
+        if path == '-':
+            raise ValueError("Parquet çıktısı bir dosyaya yazılmalıdır.")
+        return ParquetWriter(path), None
+    stream = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    writer = CsvWriter(stream) if output_format == 'csv' else JsonlWriter(stream)
+    return writer, (None if stream is sys.stdout else stream)
+
+
+def run(input_path, output_path, translate, execute, output_format=None,
+        concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, on_result=None):
+    """Girdi dosyasındaki tüm soruları işle, çıktıya yaz; ilerlemeyi stderr'e bildir ve istatistik döndür"""
+    items = read_questions(input_path)
+    writer, stream = open_writer(output_path, output_format)
+    stats = {"questions": len(items), "succeeded": 0, "failed": 0, "retried": 0, "rows": 0}
+    started = last_report = time.perf_counter()
+    try:
+        for done, record in enumerate(run_batch(items, translate, execute, concurrency, retries), 1):
+            writer.write(record)
+            if on_result:
+                on_result(record)
+            stats["failed" if record["error"] else "succeeded"] += 1
+            stats["retried"] += record["attempts"] > 1
+            stats["rows"] += record["row_count"]
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL_SECONDS or done == len(items):
+                last_report = now
+                print(f"\r  {done}/{len(items)} soru · {stats['failed']} hata · {done / (now - started):.1f} soru/sn",
+                      end="", file=sys.stderr, flush=True)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["questions_per_sec"] = round(len(items) / stats["seconds"], 2) if stats["seconds"] else 0.0
+    print(file=sys.stderr)
+    return stats
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from aggregates import install as install_aggregates
+from datagen import generate
+from db_pool import get_pool
+from llm_backend import MockBackend
+from llm_client import generate_text, strip_code_fences
+
+# Arrow dönüşümü Streamlit'in st.dataframe serileştirmesine karşılık gelir; pyarrow yoksa CSV ölçülür
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# resource modülü yalnızca Unix'te vardır; Windows'ta süreç tepe belleği raporlanmaz
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# --- Kıyaslama Ayarları ---
+BENCH_DIR = 'bench_data'
+DEFAULT_SIZES = '10k,1m'
+DEFAULT_REPEATS = 5
+DEFAULT_LATENCY_MS = 0.0
+STAGES = ('llm', 'strip', 'execute', 'render', 'total')
+ENGINES = ('sqlite', 'duckdb')
+REGRESSION_THRESHOLD = 0.10
+# Bundan kısa aşamalar (ör. strip) ölçüm gürültüsünden dolayı karşılaştırılmaz
+MIN_REGRESSION_MS = 0.1
+# Web arayüzündeki örnek sorular (example_queries) ve birkaç ek soru
+DEFAULT_QUESTIONS = [
+    "Tüm ürünleri listele",
+    "En pahalı 3 ürünü göster",
+    "Toplam satış miktarını hesapla",
+    "Kategori bazında ürün sayısını göster",
+    "En çok satan 5 ürünü listele",
+    "Temmuz ayındaki satışları göster",
+    "Kategori bazında ciroyu göster",
+    "Müşteri bazında harcamaları göster",
+]
+def parse_size(text):
+    """'10k', '1m', '10M' veya '2500' biçimindeki satır sayısını çöz"""
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def prepare_database(rows, bench_dir=BENCH_DIR):
+    """rows satırlık sentetik veritabanının yolunu döndür; yoksa datagen ile oluştur"""
+    os.makedirs(bench_dir, exist_ok=True)
+    path = os.path.join(bench_dir, f"bench_{rows}.db")
+    if os.path.exists(path):
+        with get_pool(path).reader() as conn:
+            try:
+                complete = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == rows
+            except Exception:
+                complete = False
+        if complete:
+            # Özet tablolarından önce üretilmiş dosyalar yeniden üretilmeden tamamlanır
+            with get_pool(path).writer() as conn:
+                install_aggregates(conn)
+            return path
+        get_pool(path).close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    generate(path, rows=rows, seed=0)
+    return path
+
+
+def render(df):
+    """Sonucu arayüzün göndereceği biçime serileştir"""
+    if pa is not None:
+        return pa.Table.from_pandas(df, preserve_index=False).nbytes
+    return len(df.to_csv(index=False))
+
+
+def run_question(pool, model, question, mirror=None):
+    """Bir soruyu hattın tüm aşamalarından geçir; aşama süreleri (sn) ve satır sayısını döndür
+
+    mirror verilirse uygulamadaki gibi analiz sorguları sütunlu kopyada çalıştırılır.
+    """
+    timings = {}
+    started = time.perf_counter()
+    text = generate_text(model, question)
+    timings['llm'] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    sql_query = strip_code_fences(text)
+    timings['strip'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    result = None
+    if mirror is not None and mirror.accepts(sql_query):
+        result = mirror.run(sql_query, max_rows=sys.maxsize - 1, timeout=0)
+    if result is not None:
+        df = result[0]
+    else:
+        with pool.reader() as conn:
+            df = pd.read_sql_query(sql_query, conn)
+    timings['execute'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    render(df)
+    timings['render'] = time.perf_counter() - mark
+    timings['total'] = time.perf_counter() - started
+    return timings, len(df)
+
+
+def _percentiles(samples):
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(values.mean()), 3)}
+
+
+def benchmark_size(rows, questions, repeats=DEFAULT_REPEATS, latency_ms=DEFAULT_LATENCY_MS, bench_dir=BENCH_DIR,
+                   engine='sqlite'):
+    """Tek bir veritabanı boyutu için aşama yüzdeliklerini, satır/sn ve tepe belleği ölç"""
+    path = prepare_database(rows, bench_dir)
+    pool = get_pool(path)
+    model = MockBackend(latency_ms=latency_ms)
+    mirror = None
+    if engine == 'duckdb':
+        # Kopya ölçümden önce eşzamanlı yüklenir; yükleme süresi ayrıca raporlanır
+        mirror = columnar.ColumnarMirror(path)
+        mirror.refresh()
+    samples = {stage: [] for stage in STAGES}
+    per_question = {}
+    rows_returned = 0
+
+    # İlk tur ısınma: sayfa önbelleği ve bağlantılar hazır olsun
+    for question in questions:
+        run_question(pool, model, question, mirror)
+    for _ in range(repeats):
+        for question in questions:
+            timings, count = run_question(pool, model, question, mirror)
+            for stage in STAGES:
+                samples[stage].append(timings[stage])
+            per_question.setdefault(question, []).append(timings['total'])
+            rows_returned += count
+
+    # Bellek ölçümü ayrı turda yapılır; tracemalloc süreleri bozmasın
+    tracemalloc.start()
+    for question in questions:
+        run_question(pool, model, question, mirror)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    execute_seconds = sum(samples['execute'])
+    if mirror is not None:
+        mirror.close()
+    return {
+        "rows": rows,
+        "queries": len(samples['total']),
+        "stages": {stage: _percentiles(samples[stage]) for stage in STAGES},
+        "questions": {question: _percentiles(values) for question, values in per_question.items()},
+        "rows_returned": rows_returned,
+        "rows_per_sec": round(rows_returned / execute_seconds, 1) if execute_seconds else None,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "engine": engine,
+        "columnar_refresh_seconds": round(mirror.refresh_seconds, 3) if mirror else None,
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Aşama p95 değerleri baz çizgisine göre threshold oranından fazla kötüleşenleri listele"""
+    regressions = []
+    previous = {item["rows"]: item for item in baseline.get("results", [])}
+    for item in current["results"]:
+        old = previous.get(item["rows"])
+        if old is None:
+            continue
+        for stage in STAGES:
+            before = old["stages"][stage]["p95_ms"]
+            after = item["stages"][stage]["p95_ms"]
+            if before >= MIN_REGRESSION_MS and (after - before) / before > threshold:
+                regressions.append({"rows": item["rows"], "stage": stage, "before_p95_ms": before,
+                                    "after_p95_ms": after, "change": round((after - before) / before, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text-to-SQL hattını yerel mock LLM ile uçtan uca ölç")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Virgülle ayrılmış satış satırı sayıları (ör. 10k,1m,10m)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Her soru için tekrar sayısı")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="Mock LLM'in simüle gecikmesi")
+    parser.add_argument("--questions", help="Satır başına bir soru içeren dosya (varsayılan: örnek sorular)")
+    parser.add_argument("--bench-dir", default=BENCH_DIR, help="Sentetik veritabanlarının tutulduğu klasör")
+    parser.add_argument("--output", help="JSON sonucun yazılacağı dosya (varsayılan: stdout)")
+    parser.add_argument("--engine", choices=ENGINES, default='sqlite', help="Analiz sorgularını çalıştıran motor")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON sonuç; gerileme varsa çıkış kodu 1")
+    args = parser.parse_args(argv)
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    if args.engine == 'duckdb' and columnar.load_duckdb() is None:
+        print("HATA: --engine duckdb için duckdb kurulu olmalıdır.", file=sys.stderr)
+        return 1
+
+    results = []
+    for rows in (parse_size(size) for size in args.sizes.split(',')):
+        print(f"{rows:,} satır ölçülüyor...", file=sys.stderr)
+        item = benchmark_size(rows, questions, args.repeats, args.latency_ms, args.bench_dir, args.engine)
+        results.append(item)
+        for stage in STAGES:
+            s = item["stages"][stage]
+            print(f"  {stage:8s} p50 {s['p50_ms']:9.3f} ms  p95 {s['p95_ms']:9.3f} ms  p99 {s['p99_ms']:9.3f} ms",
+                  file=sys.stderr)
+        print(f"  {item['rows_per_sec'] or 0:,.0f} satır/sn · tepe bellek {item['peak_memory_mb']} MB", file=sys.stderr)
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "latency_ms": args.latency_ms,
+        "engine": args.engine,
+        "questions": questions,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report["regressions"] = compare(report, json.load(f))
+        for r in report["regressions"]:
+            print(f"GERİLEME: {r['rows']:,} satır, {r['stage']} p95 {r['before_p95_ms']} → {r['after_p95_ms']} ms",
+                  file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from aggregates import apply_inserted, suspend_triggers
+from db_pool import get_pool
+
+# Parquet okuma isteğe bağlıdır; pyarrow kurulu değilse yalnızca CSV desteklenir
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# --- İçe Aktarım Ayarları ---
+DEFAULT_BATCH_SIZE = 100000
+PREFETCH_BATCHES = 2
+MAX_REPORTED_ERRORS = 10
+TABLES = ('products', 'sales')
+ID_COLUMNS = {'products': 'product_id', 'sales': 'sale_id'}
+# Metin sütunları str olarak okunur; sayısal sütunları C ayrıştırıcı doğrudan int/float yapar
+TEXT_COLUMNS = {'product_name': str, 'category': str, 'sale_date': str}
+REQUIRED_COLUMNS = {
+    'products': ('product_name', 'price'),
+    'sales': ('product_id', 'customer_id', 'sale_date', 'quantity'),
+}
+
+
+def _iter_batches(source, batch_size, file_name=None):
+    """CSV veya Parquet dosyasını batch_size satırlık DataFrame'ler olarak oku"""
+    name = (file_name or getattr(source, 'name', None) or str(source)).lower()
+    if name.endswith('.parquet') or name.endswith('.pq'):
+        if pq is None:
+            raise RuntimeError("Parquet içe aktarımı için pyarrow kurulu olmalıdır.")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=batch_size, dtype=TEXT_COLUMNS)
+
+
+def _check_columns(df, table):
+    """Zorunlu sütunlar eksikse dosyanın tamamını reddet"""
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in REQUIRED_COLUMNS[table] if c not in df.columns]
+    if missing:
+        raise ValueError(f"{table} için eksik sütun(lar): {', '.join(missing)}")
+
+
+def _reject(errors, df, mask, reason):
+    """Geçersiz satırları hata listesine ekle (ilk MAX_REPORTED_ERRORS kadarı)"""
+    if len(errors) < MAX_REPORTED_ERRORS and mask.any():
+        for row_number in df.index[mask][:MAX_REPORTED_ERRORS - len(errors)]:
+            errors.append(f"Satır {row_number + 2}: {reason}")
+
+
+def _prepare_products(df, errors, prices):
+    """Ürün parçasını doğrula; eklenecek sütunlarla temizlenmiş DataFrame döndür"""
+    _check_columns(df, 'products')
+    name = df['product_name'].fillna('').astype(str).str.strip()
+    price = pd.to_numeric(df['price'], errors='coerce')
+    category = df['category'].fillna('').astype(str).str.strip() if 'category' in df else pd.Series('', index=df.index)
+
+    bad_name = name == ''
+    bad_price = price.isna() | (price < 0)
+    _reject(errors, df, bad_name, "product_name boş")
+    _reject(errors, df, bad_price & ~bad_name, "price geçersiz")
+    valid = ~(bad_name | bad_price)
+
+    out = pd.DataFrame({
+        'product_name': name,
+        'category': category.where(category != '', None),
+        'price': price,
+    })
+    if 'product_id' in df:
+        out.insert(0, 'product_id', pd.to_numeric(df['product_id'], errors='coerce').astype('Int64'))
+    return out[valid]
+
+
+def _parse_dates(values):
+    """YYYY-MM-DD tarihlerini doğrula; geçersizler NaN olur
+
+    Tarihlerin kardinalitesi düşüktür, bu yüzden yalnızca benzersiz değerler ayrıştırılır.
+    """
+    text = values.fillna('').astype(str).str.strip()
+    unique = pd.unique(text.to_numpy())
+    parsed = pd.to_datetime(pd.Series(unique), format='%Y-%m-%d', errors='coerce')
+    normalized = pd.Series(parsed.dt.strftime('%Y-%m-%d').to_numpy(), index=unique)
+    return text.map(normalized)
+
+
+def _prepare_sales(df, errors, prices):
+    """Satış parçasını doğrula; total_amount boşsa web formu gibi price * quantity ile hesapla"""
+    _check_columns(df, 'sales')
+    product_id = pd.to_numeric(df['product_id'], errors='coerce')
+    customer_id = pd.to_numeric(df['customer_id'], errors='coerce')
+    quantity = pd.to_numeric(df['quantity'], errors='coerce')
+    sale_date = _parse_dates(df['sale_date'])
+    unit_price = product_id.map(prices)
+
+    checks = [
+        (product_id.isna() | (product_id % 1 != 0), "product_id geçersiz"),
+        (unit_price.isna(), "product_id products tablosunda yok"),
+        (customer_id.isna() | (customer_id % 1 != 0), "customer_id geçersiz"),
+        (sale_date.isna(), "sale_date YYYY-MM-DD biçiminde olmalı"),
+        (quantity.isna() | (quantity % 1 != 0) | (quantity < 1), "quantity pozitif tam sayı olmalı"),
+    ]
+    invalid = pd.Series(False, index=df.index)
+    for mask, reason in checks:
+        _reject(errors, df, mask & ~invalid, reason)
+        invalid |= mask
+
+    derived = unit_price * quantity
+    if 'total_amount' in df:
+        total_amount = pd.to_numeric(df['total_amount'], errors='coerce').fillna(derived)
+    else:
+        total_amount = derived
+
+    valid = ~invalid
+    out = pd.DataFrame({
+        'product_id': product_id[valid].astype('int64'),
+        'customer_id': customer_id[valid].astype('int64'),
+        'sale_date': sale_date[valid],
+        'quantity': quantity[valid].astype('int64'),
+        'total_amount': total_amount[valid].astype(float),
+    })
+    if 'sale_id' in df:
+        out.insert(0, 'sale_id', pd.to_numeric(df['sale_id'][valid], errors='coerce').astype('Int64'))
+    return out
+
+
+def _rows(df):
+    """DataFrame'i executemany için satır demetlerine çevir (NaN/NA → NULL)"""
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if column.hasnans:
+            column = column.astype(object).where(column.notna(), None)
+        columns.append(column.tolist())
+    return zip(*columns)
+
+
+def _prefetch(iterable, depth=PREFETCH_BATCHES):
+    """Sonraki batch'leri arka planda hazırla; ayrıştırma SQLite yazımıyla örtüşür"""
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put((item, None))
+        except BaseException as e:
+            buffer.put((None, e))
+        buffer.put((done, None))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        # Üretici dolu kuyrukta beklemesin
+        while worker.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                worker.join(0.01)
+
+
+def _drop_indexes(conn, table):
+    """Tablonun ikincil indekslerini sil ve yeniden oluşturmak için SQL'lerini döndür"""
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in rows]
+
+
+def import_file(source, table, db_file='sales.db', batch_size=DEFAULT_BATCH_SIZE, progress=None, file_name=None):
+    """CSV/Parquet dosyasını tek bir işlem içinde, batch'ler halinde tabloya aktar
+
+    progress(satır_sayısı, eklenen, reddedilen) her batch'ten sonra çağrılır.
+    Hata durumunda işlem geri alınır ve indeksler eski haline döner.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Bilinmeyen tablo: {table}")
+    prepare = _prepare_products if table == 'products' else _prepare_sales
+    pool = get_pool(db_file)
+    stats = {"rows_read": 0, "rows_inserted": 0, "rows_rejected": 0, "errors": []}
+    started = time.perf_counter()
+
+    with pool.writer() as conn:
+        prices = pd.Series(dict(conn.execute("SELECT product_id, price FROM products").fetchall()), dtype=float)
+        conn.execute("BEGIN")
+        # İndeksler her satırda güncellenmesin diye aktarım sonunda tek seferde kurulur
+        index_sql = _drop_indexes(conn, table)
+        # Özet tabloları da satır başına tetikleyici yerine sonda tek GROUP BY ile güncellenir
+        trigger_sql = suspend_triggers(conn, table)
+        last_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        explicit_ids = False
+        prepared = _prefetch(
+            (batch, prepare(batch, stats["errors"], prices)) for batch in _iter_batches(source, batch_size, file_name)
+        )
+        for batch, rows in prepared:
+            columns = ", ".join(rows.columns)
+            placeholders = ", ".join("?" * len(rows.columns))
+            conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", _rows(rows))
+            explicit_ids = explicit_ids or ID_COLUMNS[table] in rows.columns
+            stats["rows_read"] += len(batch)
+            stats["rows_inserted"] += len(rows)
+            stats["rows_rejected"] += len(batch) - len(rows)
+            if progress:
+                progress(stats["rows_read"], stats["rows_inserted"], stats["rows_rejected"])
+        for sql in index_sql:
+            conn.execute(sql)
+        if trigger_sql:
+            # Dosyadan gelen kimlikler eski satırların arasına düşebilir; o durumda özet baştan hesaplanır
+            apply_inserted(conn, table, None if explicit_ids else last_rowid)
+            for sql in trigger_sql:
+                conn.execute(sql)
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_sec"] = stats["rows_inserted"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV/Parquet dosyalarını products veya sales tablosuna toplu aktar")
+    parser.add_argument("table", choices=TABLES, help="Hedef tablo")
+    parser.add_argument("files", nargs="+", help="İçe aktarılacak .csv veya .parquet dosyaları")
+    parser.add_argument("--db", default="sales.db", help="SQLite veritabanı dosyası")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Batch başına satır sayısı")
+    args = parser.parse_args(argv)
+
+    def report(read, inserted, rejected):
+        print(f"\r  {read:,} satır okundu, {inserted:,} eklendi, {rejected:,} reddedildi", end="", flush=True)
+
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"HATA: Dosya bulunamadı: {path}")
+            return 1
+        print(f"İçe aktarılıyor: {path} → {args.table}")
+        try:
+            stats = import_file(path, args.table, db_file=args.db, batch_size=args.batch_size, progress=report)
+        except Exception as e:
+            print(f"\nİçe aktarım hatası (işlem geri alındı): {e}")
+            return 1
+        print(f"\n  {stats['rows_inserted']:,} satır {stats['seconds']:.2f} sn'de eklendi "
+              f"({stats['rows_per_sec']:,.0f} satır/sn)")
+        for error in stats["errors"]:
+            print(f"  - {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
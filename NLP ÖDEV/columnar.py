@@ -0,0 +1,410 @@
+import atexit
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY, record_error
+from query_guard import (
+    MAX_COST, MAX_ROWS, TIMEOUT_SECONDS, QueryRejected, QueryTimeout, check_statement, prepare,
+    run_query as run_sqlite_query
+)
+from result_cache import referenced_names
+from sql_params import bind, fingerprint
+
+# Sütunlu motor isteğe bağlıdır; duckdb yalnızca motor açıkken ilk kullanımda yüklenir (load_duckdb),
+# kurulu değilse tüm sorgular SQLite'ta çalışır
+duckdb = None
+
+# --- Sütunlu Motor Ayarları ---
+# DuckDB bazı ifadelerde SQLite'tan farklı sonuç verir; kopya yalnızca açıkça istenirse kullanılır
+COLUMNAR_ENGINE = os.environ.get("COLUMNAR_ENGINE", "off").lower()   # off | duckdb
+MIRRORED_TABLES = ('products', 'sales')
+LOAD_CHUNK_ROWS = 250000
+# Yoğun yazma sırasında kopya her commit'te yeniden yüklenmesin; arada SQLite kullanılır
+MIN_REFRESH_INTERVAL_SECONDS = float(os.environ.get("COLUMNAR_MIN_REFRESH_SECONDS", "5"))
+# Yalnızca büyük tabloyu tarayan toplama/sıralama sorguları kopyaya gider; nokta sorguları indeksle SQLite'ta hızlıdır
+_ANALYTIC_RE = re.compile(r'\b(?:group\s+by|order\s+by|distinct)\b|\b(?:count|sum|avg|min|max)\s*\(', re.I)
+# İki motorda farklı sonuç veren ifadeler: LIKE/GLOB büyük-küçük harf duyarlılığı, '/' tamsayı bölmesi.
+# Yalnızca sonucu iki motorda aynı olan işlevler kopyaya gider; tarih/metin işlevleri SQLite'ta kalır.
+_UNSAFE_RE = re.compile(r'\b(?:like|glob|regexp|match)\b|/', re.I)
+# Satır sırası (ve LIMIT'le hangi satırların döndüğü) iki motorda yalnızca sıralama eşitlik bırakmıyorsa
+# aynıdır: DuckDB eşit anahtarlı satırları ve grupları her çalıştırmada farklı sırada döndürebilir.
+_SELECT_RE = re.compile(r'\bselect\b', re.I)
+_SELECT_DISTINCT_RE = re.compile(r'\bselect\s+distinct\b', re.I)
+_AGGREGATE_RE = re.compile(r'\b(?:count|sum|avg|min|max)\s*\(', re.I)
+_GROUP_BY_RE = re.compile(r'\bgroup\s+by\s+(.*?)(?=\bhaving\b|\border\s+by\b|\blimit\b|$)', re.I | re.S)
+_ORDER_BY_RE = re.compile(r'\border\s+by\s+(.*?)(?=\blimit\b|\boffset\b|$)', re.I | re.S)
+_DIRECTION_RE = re.compile(r'\s+(?:asc|desc)\b.*$|\s+nulls\s+(?:first|last)\s*$', re.I | re.S)
+_CALL_RE = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+SAFE_FUNCTIONS = {'count', 'sum', 'avg', 'min', 'max', 'coalesce', 'ifnull', 'abs'}
+_CALL_KEYWORDS = {'in', 'exists', 'as', 'from', 'join', 'over', 'and', 'or', 'not', 'on', 'where', 'select',
+                  'values', 'using', 'then', 'else', 'when', 'having', 'by'}
+MAX_VERIFIED_SHAPES = 1024
+_DUCKDB_TYPES = {'INTEGER': 'BIGINT', 'REAL': 'DOUBLE', 'TEXT': 'VARCHAR', 'NUMERIC': 'DOUBLE'}
+
+ENGINE_QUERIES = REGISTRY.counter('texttosql_engine_queries_total', 'Sorguyu çalıştıran motor', ('engine',))
+# result: match (biçim kopyaya açıldı) ya da mismatch (biçim SQLite'ta kalır)
+SHAPE_CHECKS = REGISTRY.counter(
+    'texttosql_columnar_checks_total', 'Sorgu biçiminin iki motordaki sonuç karşılaştırması', ('result',))
+REFRESH_SECONDS = REGISTRY.histogram(
+    'texttosql_columnar_refresh_seconds', 'Sütunlu kopyanın SQLite\'tan yeniden yüklenme süresi',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+class ColumnarMirror:
+    """products/sales tablolarının DuckDB'deki bellek içi sütunlu kopyası
+
+    Kopya, SQLite'ın PRAGMA data_version değeriyle damgalanır. Başka bir bağlantı commit
+    ettiğinde değer değişir; kopya o andan itibaren eski sayılır ve arka planda yeniden
+    yüklenene kadar sorgular SQLite'a yönlendirilir. Yazmalar her zaman SQLite'tadır.
+
+    Bir sorgu biçimi kopyaya ilk gönderildiğinde iki motorda da çalıştırılır ve sonuçlar
+    karşılaştırılır (check); yalnızca aynı sonucu veren biçimler sonraki sorgularda kopyada çalışır.
+    """
+
+    def __init__(self, db_file, tables=MIRRORED_TABLES, min_refresh_interval=MIN_REFRESH_INTERVAL_SECONDS):
+        if load_duckdb() is None:
+            raise RuntimeError("Sütunlu motor için duckdb kurulu olmalıdır.")
+        self.db_file = db_file
+        self.tables = tuple(tables)
+        self.min_refresh_interval = min_refresh_interval
+        # data_version yalnızca aynı bağlantıdaki okumalar arasında karşılaştırılabilir; maliyet
+        # tahmini (EXPLAIN) de bu salt okunur bağlantıda yapılır
+        self._probe = sqlite3.connect(f"file:{os.path.abspath(db_file)}?mode=ro", uri=True, check_same_thread=False)
+        self._probe_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._db = None
+        self._version = None
+        self._refreshing = False
+        self._thread = None
+        self._closed = threading.Event()
+        self._last_refresh = float('-inf')
+        self.rows = {}
+        self.refresh_seconds = None
+        self.refreshed_at = None
+        self.queries = 0
+        self.fallbacks = 0
+        self.last_error = None
+        self._shapes = {}              # biçim özeti → SQLite sütun adları (eşleşti) ya da False
+
+    def _data_version(self):
+        with self._probe_lock:
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def is_current(self):
+        return self._db is not None and self._version == self._data_version()
+
+    def refresh(self):
+        """Tabloları tek bir okuma işlemi (tutarlı anlık görüntü) içinde yeni bir DuckDB veritabanına yükle"""
+        started = time.perf_counter()
+        # Sürüm yüklemeden önce okunur; arada commit olursa kopya damgasından yeni olur ve bir sonraki
+        # denetim yalnızca gereksiz bir yenilemeye yol açar, hiçbir zaman eski veri döndürmez.
+        version = self._data_version()
+        # Yükleme ayrı bağlantıda yapılır; sorguların sürüm denetimi yükleme boyunca beklemez
+        source = sqlite3.connect(self.db_file)
+        target = duckdb.connect()
+        # SQLite'taki gibi NULL'lar artan sıralamada başta, azalanda sonda
+        target.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+        rows = {}
+        try:
+            source.execute("BEGIN")
+            for table in self.tables:
+                rows[table] = self._copy_table(source, table, target)
+        except BaseException:
+            target.close()
+            raise
+        finally:
+            source.close()
+        seconds = time.perf_counter() - started
+        with self._lock:
+            previous, self._db, self._version = self._db, target, version
+            self.rows, self.refresh_seconds, self.refreshed_at = rows, seconds, time.time()
+        REFRESH_SECONDS.observe(seconds)
+        if previous is not None:
+            previous.close()
+        return seconds
+
+    def _copy_table(self, source, table, target):
+        import pandas as pd
+        columns = source.execute(f'PRAGMA table_info("{table}")').fetchall()
+        definitions = ", ".join(f'"{c[1]}" {_DUCKDB_TYPES.get((c[2] or "").upper(), "VARCHAR")}' for c in columns)
+        target.execute(f'CREATE TABLE "{table}" ({definitions})')
+        count = 0
+        for chunk in pd.read_sql_query(f'SELECT * FROM "{table}"', source, chunksize=LOAD_CHUNK_ROWS):
+            # DuckDB pandas DataFrame'ini adıyla doğrudan tarar
+            if self._closed.is_set():
+                raise RuntimeError("Sütunlu kopya kapatıldı.")
+            target.execute(f'INSERT INTO "{table}" SELECT * FROM chunk')
+            count += len(chunk)
+        return count
+
+    def refresh_async(self):
+        """Kopya eskiyse ve yakın zamanda yenilenmediyse arka planda yenilemeyi başlat"""
+        with self._lock:
+            if (self._refreshing or self._closed.is_set()
+                    or time.monotonic() - self._last_refresh < self.min_refresh_interval):
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                record_error("columnar_refresh", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                    self._last_refresh = time.monotonic()
+
+        self._thread = threading.Thread(target=run, name="columnar-refresh", daemon=True)
+        self._thread.start()
+
+    def accepts(self, sql_query):
+        """Sorgu yalnızca kopyalanan tabloları okuyan, iki motorda aynı sonucu veren bir analiz sorgusu mu"""
+        try:
+            statement = check_statement(sql_query)
+        except QueryRejected:
+            return False  # reddi SQLite yolundaki koruma bildirir
+        if self._shapes.get(_shape_key(statement)) is False:
+            return False
+        # Yorumlar ve dizgi sabitleri çıkarılır; içlerindeki '/' veya sözcükler ifadeye ait değildir
+        code = re.sub(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'", ' ', statement, flags=re.S)
+        if _UNSAFE_RE.search(code):
+            return False
+        calls = {name.lower() for name in _CALL_RE.findall(code)} - _CALL_KEYWORDS
+        if not calls <= SAFE_FUNCTIONS:
+            return False
+        names = referenced_names(statement)
+        with self._probe_lock:
+            tables = {row[0].lower() for row in self._probe.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        used = names & tables
+        return ('sales' in used and used <= set(self.tables) and _ANALYTIC_RE.search(code) is not None
+                and self._deterministic(code, used))
+
+    def _deterministic(self, code, used):
+        """Sonuç satırları ve sırası tek türlü mü belirli
+
+        Kabul edilenler: gruplamasız toplama (tek satır), ORDER BY'ı tüm GROUP BY ifadelerini içeren
+        gruplama (her grup bir kez geçer) ve tek tablodan birincil anahtarla sıralanan satırlar.
+        Alt sorgu, CTE, UNION, SELECT DISTINCT ve ifadeyle sıralama SQLite'ta kalır.
+        """
+        if len(_SELECT_RE.findall(code)) != 1 or _SELECT_DISTINCT_RE.search(code):
+            return False
+        order = _ORDER_BY_RE.search(code)
+        order_terms = _order_terms(order.group(1)) if order else set()
+        if order_terms is None:
+            return False
+        group = _GROUP_BY_RE.search(code)
+        if group is not None:
+            group_terms = _order_terms(group.group(1))
+            return bool(group_terms) and group_terms <= order_terms
+        if _AGGREGATE_RE.search(code):
+            return True
+        if len(used) != 1:
+            return False
+        table, = used
+        with self._probe_lock:
+            keys = {row[1].lower() for row in self._probe.execute(f'PRAGMA table_info("{table}")') if row[5]}
+        return len(keys) == 1 and keys <= order_terms
+
+    def columns(self, sql_query):
+        """Biçim daha önce doğrulandıysa SQLite'ın sütun adları; doğrulanmadıysa None"""
+        return self._shapes.get(_shape_key(sql_query)) or None
+
+    def check(self, sql_query, result, expected):
+        """Kopyanın sonucunu SQLite'ınkiyle karşılaştır ve biçim için kararı kaydet; eşleşti mi döndür
+
+        Sütun adları yalnızca büyük-küçük harf ya da DuckDB'nin kendi adlandırmasıyla (count_star())
+        farklı olabilir; eşleşen biçimlerde SQLite'ın adları saklanır ve kopyanın sonucuna uygulanır.
+        """
+        (df, truncated), (expected_df, expected_truncated) = result, expected
+        matched = (truncated == expected_truncated and df.shape == expected_df.shape
+                   and all(_same_row(a, b) for a, b in zip(df.itertuples(index=False, name=None),
+                                                           expected_df.itertuples(index=False, name=None))))
+        if len(self._shapes) >= MAX_VERIFIED_SHAPES:
+            self._shapes.clear()
+        self._shapes[_shape_key(sql_query)] = tuple(expected_df.columns) if matched else False
+        SHAPE_CHECKS.inc(result='match' if matched else 'mismatch')
+        return matched
+
+    def run(self, sql_query, params=None, max_rows=MAX_ROWS, timeout=TIMEOUT_SECONDS, max_cost=MAX_COST):
+        """Güncel kopyada çalıştır; (Arrow destekli DataFrame, kesildi mi) ya da kopya eskiyse None döndür
+
+        Sorgu SQLite yolundaki gibi önce denetlenir ve EXPLAIN maliyeti sınırı aşarsa QueryRejected fırlatılır.
+        """
+        if not self.is_current():
+            self.refresh_async()
+            return None
+        with self._probe_lock:
+            limited_sql, _ = prepare(self._probe, sql_query, params, max_rows + 1, max_cost)
+        with self._lock:
+            cursor = self._db.cursor()
+        timer = threading.Timer(timeout, cursor.interrupt) if timeout else None
+        try:
+            if timer:
+                timer.start()
+            table = _plain_numbers(cursor.execute(limited_sql, params or []).fetch_arrow_table())
+        except duckdb.InterruptException as e:
+            raise QueryTimeout(f"Sorgu {timeout:g} sn bütçesini aştığı için durduruldu.") from e
+        finally:
+            if timer:
+                timer.cancel()
+            cursor.close()
+        self.queries += 1
+        import pandas as pd
+        # Arrow sütunları kopyalanmadan pandas'a geçer
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        columns = self.columns(sql_query)
+        if columns is not None and len(columns) == len(df.columns):
+            df.columns = list(columns)
+        return df.iloc[:max_rows], len(df) > max_rows
+
+    def stats(self):
+        return {
+            "current": self.is_current(),
+            "refreshing": self._refreshing,
+            "rows": dict(self.rows),
+            "refresh_seconds": self.refresh_seconds,
+            "refreshed_at": self.refreshed_at,
+            "queries": self.queries,
+            "fallbacks": self.fallbacks,
+            "verified_shapes": sum(1 for value in self._shapes.values() if value),
+            "sqlite_shapes": sum(1 for value in self._shapes.values() if value is False),
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        """Süren yüklemeyi bir sonraki parçada durdur ve bağlantıları kapat"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        with self._probe_lock:
+            self._probe.close()
+
+
+def _order_terms(clause):
+    """ORDER BY / GROUP BY listesindeki sütun adları (tablo öneki ve yön olmadan); ifade varsa None"""
+    terms = set()
+    for term in clause.split(','):
+        term = _DIRECTION_RE.sub('', term.strip()).strip().lower()
+        if not re.fullmatch(r'(?:[a-z_]\w*\.)?[a-z_]\w*', term):
+            return None   # sütun sırası (ORDER BY 2) ya da ifade
+        terms.add(term.rsplit('.', 1)[-1])
+    return terms
+
+
+def _shape_key(sql_query):
+    return fingerprint(sql_query.strip().rstrip(';'))
+
+
+def _plain_numbers(table):
+    """DuckDB'nin tamsayı toplamları (HUGEINT) Arrow'da decimal gelir; SQLite gibi int/float'a çevir"""
+    import pyarrow as pa
+    for index, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            target = pa.int64() if field.type.scale == 0 else pa.float64()
+            table = table.set_column(index, field.name, table.column(index).cast(target))
+    return table
+
+
+def _missing(value):
+    import pandas as pd
+    return value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value))
+
+
+def _same_value(a, b):
+    """İki motorun hücre değeri aynı mı; NULL/NaN eşit, sayılar küçük yuvarlama farkıyla karşılaştırılır"""
+    if _missing(a) or _missing(b):
+        return _missing(a) and _missing(b)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def _same_row(a, b):
+    return len(a) == len(b) and all(_same_value(x, y) for x, y in zip(a, b))
+
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+@atexit.register
+def _close_mirrors():
+    # Yorumlayıcı kapanırken süren bir DuckDB yüklemesi süreci çökertir
+    with _mirrors_lock:
+        mirrors = list(_mirrors.values())
+        _mirrors.clear()
+    for mirror in mirrors:
+        mirror.close()
+
+
+def load_duckdb():
+    """duckdb modülünü ilk çağrıda içe aktar; kurulu değilse None"""
+    global duckdb
+    if duckdb is None:
+        try:
+            import duckdb as module
+        except ImportError:
+            return None
+        duckdb = module
+    return duckdb
+
+
+def engine_available():
+    # Motor kapalıyken duckdb (ve pyarrow/numpy) hiç yüklenmez
+    return COLUMNAR_ENGINE != 'off' and load_duckdb() is not None
+
+
+def get_mirror(db_file):
+    """Veritabanı başına tek kopya; ilk çağrıda arka planda yüklenmeye başlar, motor kapalıysa None"""
+    if not engine_available():
+        return None
+    key = os.path.abspath(db_file)
+    with _mirrors_lock:
+        mirror = _mirrors.get(key)
+        if mirror is None:
+            mirror = _mirrors[key] = ColumnarMirror(db_file)
+            mirror.refresh_async()
+        return mirror
+
+
+def run_query(pool, sql_query, params=None, max_rows=MAX_ROWS, timeout=TIMEOUT_SECONDS, **guard_options):
+    """query_guard.run_query gibi; doğrulanmış analiz sorgularını güncel sütunlu kopyada, diğerlerini SQLite'ta çalıştır
+
+    Kopyaya uygun bir biçim ilk kez geldiğinde iki motorda da çalıştırılır ve SQLite'ın sonucu
+    döndürülür; biçim ancak sonuçlar aynıysa sonraki sorgularda kopyaya gider.
+    """
+    # Sabitler iki motor için de aynı biçimde parametreye çevrilir
+    sql_query, params = bind(sql_query, params)
+    mirror = get_mirror(pool.db_file)
+    if mirror is not None and mirror.accepts(sql_query):
+        try:
+            result = mirror.run(sql_query, params, max_rows, timeout, guard_options.get('max_cost', MAX_COST))
+        except (QueryTimeout, QueryRejected):
+            raise
+        except duckdb.Error as e:
+            # SQLite lehçesine özgü işlevler (ör. metin üzerinde strftime) DuckDB'de bağlanamayabilir
+            mirror.fallbacks += 1
+            mirror.last_error = f"{type(e).__name__}: {str(e).splitlines()[0]}"
+            result = None
+        if result is not None and mirror.columns(sql_query) is None:
+            expected = run_sqlite_query(pool, sql_query, params, max_rows, timeout, **guard_options)
+            ENGINE_QUERIES.inc(engine='sqlite')
+            if not mirror.check(sql_query, result, expected):
+                mirror.last_error = "Sonuç SQLite'tan farklı; bu sorgu biçimi SQLite'ta çalışacak"
+            return expected
+        if result is not None:
+            ENGINE_QUERIES.inc(engine='duckdb')
+            return result
+    ENGINE_QUERIES.inc(engine='sqlite')
+    return run_sqlite_query(pool, sql_query, params, max_rows, timeout, **guard_options)
@@ -0,0 +1,101 @@
+from metrics import track_operation
+from write_queue import write
+
+# --- CRUD Ayarları ---
+PRODUCT_COLUMNS = ('product_id', 'product_name', 'category', 'price')
+SALE_COLUMNS = ('sale_id', 'product_id', 'customer_id', 'sale_date', 'quantity', 'total_amount')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Ürün ve satış işlemleri Streamlit uygulaması ile HTTP API'si (api_service.py) arasında ortaktır.
+# Fonksiyonlar hatayı fırlatır; kullanıcıya gösterme (st.error, JSON hata yanıtı) çağırana kalır.
+# Yazma işlemleri değişen satır sayısını (eklemede yeni ID'yi) döndürür; eşzamanlı yazmalar
+# yazma kuyruğunda (write_queue.py) tek commit'te birleştirilir. Listeleme fonksiyonları limit'i
+# olduğu gibi uygular; sayfa boyutunu MAX_PAGE_SIZE ile sınırlamak çağırana kalır (API sonraki
+# sayfanın varlığını anlamak için bir fazla satır okur).
+
+
+def add_product(pool, product_name, category, price):
+    """Yeni ürün ekle; ürün ID'sini döndür"""
+    with track_operation("add_product"):
+        row_id, _ = write(
+            pool, "INSERT INTO products (product_name, category, price) VALUES (?, ?, ?)",
+            (product_name, category, price)
+        )
+    return row_id
+
+
+def update_product(pool, product_id, product_name, category, price):
+    """Ürün güncelle"""
+    with track_operation("update_product"):
+        _, row_count = write(
+            pool, "UPDATE products SET product_name = ?, category = ?, price = ? WHERE product_id = ?",
+            (product_name, category, price, product_id)
+        )
+    return row_count
+
+
+def delete_product(pool, product_id):
+    """Ürün sil"""
+    with track_operation("delete_product"):
+        _, row_count = write(pool, "DELETE FROM products WHERE product_id = ?", (product_id,))
+    return row_count
+
+
+def add_sale(pool, product_id, customer_id, sale_date, quantity, total_amount):
+    """Yeni satış ekle; satış ID'sini döndür"""
+    with track_operation("add_sale"):
+        row_id, _ = write(
+            pool, "INSERT INTO sales (product_id, customer_id, sale_date, quantity, total_amount) VALUES (?, ?, ?, ?, ?)",
+            (product_id, customer_id, sale_date, quantity, total_amount)
+        )
+    return row_id
+
+
+def update_sale(pool, sale_id, product_id, customer_id, sale_date, quantity, total_amount):
+    """Satış güncelle"""
+    with track_operation("update_sale"):
+        _, row_count = write(
+            pool, "UPDATE sales SET product_id = ?, customer_id = ?, sale_date = ?, quantity = ?, total_amount = ? WHERE sale_id = ?",
+            (product_id, customer_id, sale_date, quantity, total_amount, sale_id)
+        )
+    return row_count
+
+
+def delete_sale(pool, sale_id):
+    """Satış sil"""
+    with track_operation("delete_sale"):
+        _, row_count = write(pool, "DELETE FROM sales WHERE sale_id = ?", (sale_id,))
+    return row_count
+
+
+def get_product(pool, product_id):
+    """ID'ye göre ürün satırı (tuple) ya da None"""
+    with pool.reader() as conn:
+        return conn.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
+
+
+def get_sale(pool, sale_id):
+    """ID'ye göre satış satırı (tuple) ya da None"""
+    with pool.reader() as conn:
+        return conn.execute("SELECT * FROM sales WHERE sale_id = ?", (sale_id,)).fetchone()
+
+
+def list_products(pool, after_id=0, limit=DEFAULT_PAGE_SIZE):
+    """ID'si after_id'den büyük en fazla limit ürün (anahtar kümesi sayfalama)"""
+    with pool.reader() as conn:
+        return conn.execute(
+            "SELECT product_id, product_name, category, price FROM products WHERE product_id > ? "
+            "ORDER BY product_id LIMIT ?",
+            (after_id, limit)
+        ).fetchall()
+
+
+def list_sales(pool, after_id=0, limit=DEFAULT_PAGE_SIZE):
+    """ID'si after_id'den büyük en fazla limit satış (anahtar kümesi sayfalama)"""
+    with pool.reader() as conn:
+        return conn.execute(
+            "SELECT sale_id, product_id, customer_id, sale_date, quantity, total_amount FROM sales WHERE sale_id > ? "
+            "ORDER BY sale_id LIMIT ?",
+            (after_id, limit)
+        ).fetchall()
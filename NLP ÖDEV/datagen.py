@@ -0,0 +1,191 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import install as install_aggregates
+
+# --- Üretici Ayarları ---
+DEFAULT_ROWS = 1000000
+DEFAULT_BATCH_SIZE = 500000
+DEFAULT_START_DATE = '2023-01-01'
+DEFAULT_END_DATE = '2024-12-31'
+DEFAULT_CUSTOMERS = 100000
+DEFAULT_PRODUCT_SKEW = 1.1
+DEFAULT_CUSTOMER_SKEW = 0.6
+DEFAULT_CATEGORY_SKEW = 0.8
+MAX_QUANTITY = 10
+CATEGORIES = [
+    'Electronics', 'Furniture', 'Kitchenware', 'Stationery', 'Books', 'Toys', 'Garden', 'Sports',
+    'Clothing', 'Beauty', 'Grocery', 'Automotive', 'Music', 'Health', 'Pets', 'Office',
+]
+# Kategori başına tipik fiyat (log-normal dağılımın medyanı)
+_CATEGORY_PRICE = {
+    'Electronics': 300, 'Furniture': 150, 'Kitchenware': 20, 'Stationery': 5, 'Books': 15, 'Toys': 25,
+    'Garden': 40, 'Sports': 60, 'Clothing': 35, 'Beauty': 18, 'Grocery': 4, 'Automotive': 80,
+    'Music': 20, 'Health': 12, 'Pets': 22, 'Office': 30,
+}
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name TEXT NOT NULL,
+        category TEXT,
+        price REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sales (
+        sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        sale_date TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        total_amount REAL NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    );
+"""
+# Boş bir dosya sıfırdan kurulduğu için günlük tutulmaz; bitince uygulamanın kullandığı WAL moduna geçilir
+_BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ZipfSampler:
+    """1..n arası kimlikleri Zipf (s) dağılımıyla örnekle; en popüler kimlikler rastgele dağıtılır"""
+
+    def __init__(self, n, skew, rng):
+        weights = 1.0 / np.arange(1, n + 1) ** skew
+        self.cdf = np.cumsum(weights / weights.sum())
+        self.cdf[-1] = 1.0
+        # Sıra → kimlik eşlemesi; yoksa en çok satanlar hep en küçük kimlikler olurdu
+        self.ids = rng.permutation(n) + 1
+        self.rng = rng
+
+    def sample(self, size):
+        return self.ids[np.searchsorted(self.cdf, self.rng.random(size), side='right')]
+
+
+def default_product_count(rows):
+    """Satış sayısına göre makul ürün sayısı"""
+    return int(min(100000, max(100, rows // 500)))
+
+
+def make_products(count, rng, category_skew=DEFAULT_CATEGORY_SKEW):
+    """Kategorisi çarpık, fiyatı kategoriye göre log-normal dağılan ürün tablosu"""
+    categories = np.array(CATEGORIES)
+    category = categories[ZipfSampler(len(categories), category_skew, rng).sample(count) - 1]
+    median = np.array([_CATEGORY_PRICE[c] for c in category], dtype=float)
+    price = np.round(np.maximum(0.5, rng.lognormal(np.log(median), 0.6)), 2)
+    number = np.arange(1, count + 1).astype(str)
+    return pd.DataFrame({
+        'product_name': np.char.add(np.char.add(category.astype(str), ' Product '), number),
+        'category': category,
+        'price': price,
+    })
+
+
+def generate(db_file, rows=DEFAULT_ROWS, products=None, customers=DEFAULT_CUSTOMERS,
+             start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE, product_skew=DEFAULT_PRODUCT_SKEW,
+             customer_skew=DEFAULT_CUSTOMER_SKEW, category_skew=DEFAULT_CATEGORY_SKEW,
+             batch_size=DEFAULT_BATCH_SIZE, seed=0, progress=None):
+    """db_file'a products ve rows satırlık sales tablosu yaz; aynı seed aynı veriyi üretir
+
+    progress(yazılan_satır, toplam_satır) her batch'ten sonra çağrılır.
+    """
+    if os.path.exists(db_file):
+        raise FileExistsError(f"Veritabanı zaten var: {db_file}")
+    rng = np.random.default_rng(seed)
+    products = products or default_product_count(rows)
+    product_df = make_products(products, rng, category_skew)
+    prices = product_df['price'].to_numpy()
+    days = pd.date_range(start_date, end_date).strftime('%Y-%m-%d').to_numpy()
+    if len(days) == 0:
+        raise ValueError("Bitiş tarihi başlangıç tarihinden önce olamaz.")
+    product_sampler = ZipfSampler(products, product_skew, rng)
+    customer_sampler = ZipfSampler(customers, customer_skew, rng)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    try:
+        for pragma in _BUILD_PRAGMAS:
+            conn.execute(pragma)
+        conn.executescript(SCHEMA_SQL)
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO products (product_name, category, price) VALUES (?, ?, ?)",
+            zip(*(product_df[c].tolist() for c in product_df.columns))
+        )
+        written = 0
+        while written < rows:
+            n = min(batch_size, rows - written)
+            product_id = product_sampler.sample(n)
+            # Çoğu satış tek adettir: geometrik dağılım, MAX_QUANTITY ile sınırlı
+            quantity = np.minimum(rng.geometric(0.55, n), MAX_QUANTITY)
+            conn.executemany(
+                "INSERT INTO sales (product_id, customer_id, sale_date, quantity, total_amount) VALUES (?, ?, ?, ?, ?)",
+                zip(product_id.tolist(), customer_sampler.sample(n).tolist(), days[rng.integers(0, len(days), n)].tolist(),
+                    quantity.tolist(), np.round(prices[product_id - 1] * quantity, 2).tolist())
+            )
+            written += n
+            if progress:
+                progress(written, rows)
+        # Özetler satır başına tetikleyiciyle değil, sonda tek GROUP BY ile hesaplanır
+        install_aggregates(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = WAL")
+    except BaseException:
+        conn.close()
+        os.remove(db_file)
+        raise
+    conn.close()
+
+    seconds = time.perf_counter() - started
+    return {"products": products, "rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="products/sales şeması için çarpık dağılımlı sentetik veritabanı üret")
+    parser.add_argument("db", help="Oluşturulacak SQLite dosyası")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Satış satırı sayısı")
+    parser.add_argument("--products", type=int, help="Ürün sayısı (varsayılan: satır sayısına göre)")
+    parser.add_argument("--customers", type=int, default=DEFAULT_CUSTOMERS, help="Farklı müşteri sayısı")
+    parser.add_argument("--start-date", default=DEFAULT_START_DATE, help="İlk satış tarihi (YYYY-MM-DD)")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE, help="Son satış tarihi (YYYY-MM-DD)")
+    parser.add_argument("--product-skew", type=float, default=DEFAULT_PRODUCT_SKEW, help="Ürün popülerliği Zipf üssü")
+    parser.add_argument("--customer-skew", type=float, default=DEFAULT_CUSTOMER_SKEW, help="Müşteri aktivitesi Zipf üssü")
+    parser.add_argument("--category-skew", type=float, default=DEFAULT_CATEGORY_SKEW, help="Kategori dağılımı Zipf üssü")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Batch başına satır sayısı")
+    parser.add_argument("--seed", type=int, default=0, help="Rastgele üreteç tohumu")
+    parser.add_argument("--force", action="store_true", help="Dosya varsa üzerine yaz")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            print(f"HATA: {args.db} zaten var; üzerine yazmak için --force kullanın.")
+            return 1
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    def report(written, total):
+        print(f"\r  {written:,} / {total:,} satış yazıldı", end="", flush=True)
+
+    stats = generate(
+        args.db, rows=args.rows, products=args.products, customers=args.customers,
+        start_date=args.start_date, end_date=args.end_date, product_skew=args.product_skew,
+        customer_skew=args.customer_skew, category_skew=args.category_skew,
+        batch_size=args.batch_size, seed=args.seed, progress=report,
+    )
+    print(f"\n{stats['products']:,} ürün ve {stats['rows']:,} satış {stats['seconds']:.1f} sn'de yazıldı "
+          f"({stats['rows_per_sec']:,.0f} satır/sn)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# --- Bağlantı Ayarları ---
+# Her bağlantıda uygulanan PRAGMA'lar. journal_mode=WAL veritabanı dosyasında
+# kalıcıdır; okuyucular yazıcıyı, yazıcı da okuyucuları bekletmez.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",        # WAL ile güvenli, her commit'te fsync yapmaz
+    "cache_size": -32000,           # negatif değer KiB cinsindendir (~32 MB)
+    "mmap_size": 268435456,         # 256 MB bellek eşlemeli okuma
+    "temp_store": "MEMORY",
+}
+BUSY_TIMEOUT_SECONDS = 30
+# sqlite3'ün bağlantı başına hazırlanmış ifade önbelleği (SQL metni → derlenmiş ifade).
+# Üretilen sorgular parametreleştirildiğinden (sql_params.py) aynı biçimdeki sorgular derlenmeden çalışır.
+STATEMENT_CACHE_SIZE = int(os.environ.get("SQLITE_STATEMENT_CACHE", "256"))
+MAX_IDLE_READERS = 8
+
+
+class ConnectionPool:
+    """SQLite için paylaşılan bağlantı havuzu: iş parçacığı başına okuyucu, tek yazıcı"""
+
+    def __init__(self, db_file, pragmas=None, max_idle_readers=MAX_IDLE_READERS):
+        self.db_file = db_file
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.max_idle_readers = max_idle_readers
+        self._idle_readers = []
+        self._idle_read_only = []
+        self._idle_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._write_lock = threading.RLock()
+
+    def _connect(self, read_only=False):
+        """PRAGMA'ları uygulanmış yeni bir bağlantı aç"""
+        # Bağlantılar iş parçacıkları arasında el değiştirir, ancak aynı anda
+        # yalnızca bir iş parçacığı tarafından kullanılır.
+        if read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_file))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        for name, value in self.pragmas.items():
+            # journal_mode dosyada kalıcıdır; salt okunur bağlantı onu değiştiremez
+            if read_only and name == "journal_mode":
+                continue
+            conn.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Okuma bağlantısı ödünç al; aynı iş parçacığında iç içe çağrılar aynı bağlantıyı kullanır"""
+        conn = getattr(self._local, "reader", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        with self._idle_lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            conn = self._connect()
+
+        self._local.reader = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.reader = None
+            self._local.depth = 0
+            self._release(conn, self._idle_readers)
+
+    @contextmanager
+    def read_only(self):
+        """Yazamayan (mode=ro) bir bağlantı ödünç al; dışarıdan gelen SQL bununla çalıştırılır"""
+        with self._idle_lock:
+            conn = self._idle_read_only.pop() if self._idle_read_only else None
+        if conn is None:
+            conn = self._connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            self._release(conn, self._idle_read_only)
+
+    def _release(self, conn, idle):
+        """Bağlantıyı havuza geri koy ya da fazlaysa kapat"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._idle_lock:
+            if len(idle) < self.max_idle_readers:
+                idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def writer(self):
+        """Tek yazıcı bağlantısını kilitle; çıkışta commit, hata durumunda rollback yapar"""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+    def close(self):
+        """Havuzdaki tüm boştaki bağlantıları kapat"""
+        with self._idle_lock:
+            readers = self._idle_readers + self._idle_read_only
+            self._idle_readers, self._idle_read_only = [], []
+        for conn in readers:
+            conn.close()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file):
+    """Veritabanı dosyası başına tek bir havuz döndür"""
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_file)
+            _pools[key] = pool
+        return pool
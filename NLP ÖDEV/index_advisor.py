@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+
+from db_pool import get_pool
+from query_guard import execution_budget, prepare
+from result_cache import normalize_sql
+
+# --- Danışman Ayarları ---
+WORKLOAD_FILE = 'query_workload.jsonl'
+MAX_WORKLOAD_QUERIES = 1000
+MAX_INDEX_COLUMNS = 4
+LATENCY_REPEATS = 5
+_SQL_KEYWORDS = {
+    'on', 'where', 'join', 'inner', 'left', 'right', 'cross', 'outer', 'natural', 'group', 'order',
+    'limit', 'using', 'as', 'union', 'having', 'select', 'from', 'and', 'or', 'not', 'by',
+}
+_CLAUSE_END = r'(?=\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|UNION|WINDOW)\b|\)\s*$|;|$)'
+
+
+class WorkloadRecorder:
+    """execute_sql_query'ye gelen okuma sorgularını (ve son parametrelerini) kaydet"""
+
+    def __init__(self, path=WORKLOAD_FILE, max_queries=MAX_WORKLOAD_QUERIES):
+        self.path = path
+        self.max_queries = max_queries
+        self._queries = {}   # normalize sql -> {"sql", "params", "count"}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                self._remember(item["sql"], item.get("params"), persist=False)
+
+    def _remember(self, sql_query, params, persist):
+        key = normalize_sql(sql_query)
+        if not key.lower().startswith(('select', 'with')):
+            return
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is not None:
+                entry["count"] += 1
+                entry["params"] = params
+                return
+            if len(self._queries) >= self.max_queries:
+                return
+            self._queries[key] = {"sql": key, "params": params, "count": 1}
+        if persist and self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"sql": key, "params": params}, ensure_ascii=False, default=str) + "\n")
+
+    def record(self, sql_query, params=None):
+        """Sorguyu iş yüküne ekle; yeni bir sorgu ise dosyaya da yaz"""
+        self._remember(sql_query, list(params) if params else None, persist=True)
+
+    def queries(self):
+        with self._lock:
+            return [dict(q) for q in self._queries.values()]
+
+
+def explain(conn, sql_query, params=None):
+    """EXPLAIN QUERY PLAN satırlarının açıklama (detail) metinlerini döndür"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql_query}", params or ())]
+
+
+def _schema(conn):
+    """Tablo → sütun listesi ve tablo → mevcut indeks sütunları"""
+    columns = {}
+    indexes = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        columns[table.lower()] = [row[1].lower() for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        indexes[table.lower()] = [
+            [c[2].lower() for c in conn.execute(f'PRAGMA index_info("{index[1]}")') if c[2]]
+            for index in conn.execute(f'PRAGMA index_list("{table}")')
+        ]
+    return columns, indexes
+
+
+def _aliases(sql_query, columns):
+    """Sorgudaki takma ad → tablo eşlemesi"""
+    aliases = {}
+    pattern = r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?'
+    for table, alias in re.findall(pattern, sql_query, re.I):
+        table = table.lower()
+        if table not in columns:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _refs(text, aliases, columns):
+    """Metindeki sütun referanslarını sırasıyla (tablo, sütun, sonraki_metin) olarak döndür"""
+    tables = set(aliases.values())
+    for match in re.finditer(r'(?:\b([A-Za-z_]\w*)\s*\.\s*)?\b([A-Za-z_]\w*)\b', text):
+        qualifier, column = (match.group(1) or '').lower(), match.group(2).lower()
+        if qualifier:
+            table = aliases.get(qualifier)
+            if table is None or column not in columns[table]:
+                continue
+        else:
+            owners = [t for t in tables if column in columns[t]]
+            if len(owners) != 1:
+                continue
+            table = owners[0]
+        yield table, column, text[match.end():match.end() + 12].lstrip().upper()
+
+
+def _clause(sql_query, keyword):
+    """WHERE, GROUP BY gibi bir cümleciğin metnini döndür (yoksa boş metin)"""
+    match = re.search(rf'\b{keyword}\b(.*?){_CLAUSE_END}', sql_query, re.I | re.S)
+    return match.group(1) if match else ''
+
+
+def candidate_indexes(conn, sql_query, params=None):
+    """Tam tarama yapılan tablolar için (tablo, sütunlar) önerileri üret"""
+    columns, existing = _schema(conn)
+    aliases = _aliases(sql_query, columns)
+    plan = explain(conn, sql_query, params)
+
+    scanned = set()
+    for detail in plan:
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if match and 'USING' not in detail:
+            scanned.add(aliases.get(match.group(1).lower(), match.group(1).lower()))
+    if not scanned:
+        return []
+
+    where = _clause(sql_query, 'WHERE')
+    ons = ' '.join(re.findall(r'\bON\b(.*?)(?=\b(?:JOIN|WHERE|GROUP|ORDER|LIMIT|LEFT|INNER|CROSS)\b|$)', sql_query, re.I | re.S))
+    group = _clause(sql_query, r'GROUP\s+BY')
+    order = _clause(sql_query, r'ORDER\s+BY')
+    select_all = re.search(r'SELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*', sql_query, re.I) is not None
+
+    proposals = []
+    for table in sorted(scanned & set(columns)):
+        equality, ranges = [], []
+        for t, column, following in _refs(where, aliases, columns):
+            if t != table:
+                continue
+            if following.startswith(('=', 'IN ', 'IN(', 'IS ')):
+                equality.append(column)
+            elif following.startswith(('<', '>', 'BETWEEN', 'LIKE')):
+                ranges.append(column)
+        joins = [c for t, c, _ in _refs(ons, aliases, columns) if t == table]
+        grouping = [c for t, c, _ in _refs(group + ' ' + order, aliases, columns) if t == table]
+
+        rowid = _rowid_column(conn, table)
+        key = list(dict.fromkeys(equality + ranges[:1])) or list(dict.fromkeys(joins)) or list(dict.fromkeys(grouping))
+        key = [c for c in key if c != rowid]
+        if not key:
+            continue
+        index_columns = list(dict.fromkeys(key + grouping))
+        # Sorgunun bu tablodan okuduğu tüm sütunlar sığıyorsa kapsayan (covering) indeks öner
+        if not select_all:
+            referenced = list(dict.fromkeys(c for t, c, _ in _refs(sql_query, aliases, columns) if t == table))
+            covering = list(dict.fromkeys(index_columns + referenced))
+            if len(covering) <= MAX_INDEX_COLUMNS:
+                index_columns = covering
+        index_columns = [c for c in index_columns if c != rowid][:MAX_INDEX_COLUMNS]
+        if any(existing_cols[:len(index_columns)] == index_columns for existing_cols in existing.get(table, [])):
+            continue
+        proposals.append((table, tuple(index_columns)))
+    return proposals
+
+
+def _rowid_column(conn, table):
+    """INTEGER PRIMARY KEY sütunu rowid'dir; indekse eklenmesine gerek yoktur"""
+    for row in conn.execute(f'PRAGMA table_info("{table}")'):
+        if row[5] and row[2].upper() == 'INTEGER':
+            return row[1].lower()
+    return None
+
+
+def index_name(table, index_columns):
+    return f"idx_{table}_{'_'.join(index_columns)}"
+
+
+def create_index_sql(table, index_columns):
+    return f'CREATE INDEX IF NOT EXISTS {index_name(table, index_columns)} ON {table} ({", ".join(index_columns)})'
+
+
+def propose(db_file, workload):
+    """İş yükündeki tüm sorgular için birleştirilmiş indeks önerilerini döndür"""
+    proposals = {}
+    with get_pool(db_file).reader() as conn:
+        for query in workload:
+            try:
+                found = candidate_indexes(conn, query["sql"], query.get("params"))
+            except Exception:
+                continue  # artık çalışmayan (ör. şeması değişmiş) sorgular atlanır
+            for table, index_columns in found:
+                item = proposals.setdefault((table, index_columns), {"table": table, "columns": list(index_columns), "queries": 0})
+                item["queries"] += query.get("count", 1)
+    # Bir önerinin sütunları başka bir önerinin ön ekiyse daha geniş olanı yeterlidir
+    keys = list(proposals)
+    for table, cols in keys:
+        if any(t == table and len(other) > len(cols) and other[:len(cols)] == cols for t, other in keys):
+            proposals.pop((table, cols), None)
+    return sorted(proposals.values(), key=lambda p: -p["queries"])
+
+
+def measure(db_file, workload, repeats=LATENCY_REPEATS):
+    """Her sorgunun medyan gecikmesini (ms) ve sorgu planını ölç
+
+    Kaydedilen SQL dışarıdan (LLM'den) gelebilir; uygulamadaki gibi salt okunur bağlantıda,
+    ifade/maliyet denetimi ve LIMIT'ten (query_guard.prepare) sonra süre bütçesiyle çalıştırılır.
+    Reddedilen ya da bütçeyi aşan sorgular ölçülmez.
+    """
+    results = []
+    with get_pool(db_file).read_only() as conn:
+        for query in workload:
+            params = query.get("params") or ()
+            try:
+                limited_sql, _ = prepare(conn, query["sql"], params)
+                plan = explain(conn, query["sql"], params)
+                timings = []
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    with execution_budget(conn):
+                        conn.execute(limited_sql, params).fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                continue
+            results.append({"sql": query["sql"], "ms": statistics.median(timings), "plan": plan})
+    return results
+
+
+def apply(db_file, workload, proposals, repeats=LATENCY_REPEATS):
+    """Önerilen indeksleri oluştur; iş yükünün önce/sonra gecikme raporunu döndür"""
+    before = measure(db_file, workload, repeats)
+    with get_pool(db_file).writer() as conn:
+        for proposal in proposals:
+            conn.execute(create_index_sql(proposal["table"], proposal["columns"]))
+        conn.execute("ANALYZE")
+    after = {item["sql"]: item for item in measure(db_file, workload, repeats)}
+
+    report = []
+    for item in before:
+        new = after.get(item["sql"])
+        if new is None:
+            continue
+        report.append({
+            "sql": item["sql"],
+            "before_ms": round(item["ms"], 3),
+            "after_ms": round(new["ms"], 3),
+            "speedup": round(item["ms"] / new["ms"], 2) if new["ms"] else None,
+            "plan_after": "; ".join(new["plan"]),
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kaydedilen SQL iş yükü için indeks önerileri üret ve uygula")
+    parser.add_argument("--db", default="sales.db", help="SQLite veritabanı dosyası")
+    parser.add_argument("--workload", default=WORKLOAD_FILE, help="Kaydedilmiş iş yükü (JSONL)")
+    parser.add_argument("--apply", action="store_true", help="Önerilen indeksleri oluştur ve gecikmeyi ölç")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.workload):
+        print(f"HATA: İş yükü dosyası bulunamadı: {args.workload}")
+        return 1
+    workload = WorkloadRecorder(path=args.workload).queries()
+    print(f"{len(workload)} farklı sorgu inceleniyor...")
+
+    proposals = propose(args.db, workload)
+    if not proposals:
+        print("Önerilecek indeks yok; kayıtlı sorgularda tam tarama bulunmadı.")
+        return 0
+    print("\nÖnerilen indeksler:")
+    for proposal in proposals:
+        print(f"  {create_index_sql(proposal['table'], proposal['columns'])};  -- {proposal['queries']} sorgu")
+
+    if args.apply:
+        print("\nİndeksler oluşturuluyor ve gecikme ölçülüyor...")
+        for row in apply(args.db, workload, proposals):
+            print(f"  {row['before_ms']:9.3f} ms → {row['after_ms']:9.3f} ms  ({row['speedup']}x)  {row['sql'][:80]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from metrics import REGISTRY
+from sql_cache import normalize_question
+from sql_params import render_literal
+
+# --- Hızlı Yol Ayarları ---
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH", "1").lower() not in ('0', 'false', 'off')
+# Sorudaki sözcüklerin en az bu oranı tanınmalıdır; altında soru LLM'e gider
+MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+DEFAULT_LIMIT = 10   # sayı verilmemiş çoğul soru ("en pahalı ürünler"); tekil soruda ("en pahalı ürün") 1
+# Yeni kategoriler CRUD ile eklenebilir; kategori listesi bu kadar saniyede bir yeniden okunur
+CATEGORY_REFRESH_SECONDS = 30
+
+_MONTHS = {
+    'ocak': '01', 'şubat': '02', 'mart': '03', 'nisan': '04', 'mayıs': '05', 'haziran': '06',
+    'temmuz': '07', 'ağustos': '08', 'eylül': '09', 'ekim': '10', 'kasım': '11', 'aralık': '12',
+    # İngilizce 'may' bir yardımcı fiildir; ay olarak tanınmaz, soru LLM'e gider
+    'january': '01', 'february': '02', 'march': '03', 'april': '04', 'june': '06', 'july': '07',
+    'august': '08', 'september': '09', 'october': '10', 'november': '11', 'december': '12',
+}
+_NUMBER_WORDS = {
+    'bir': 1, 'iki': 2, 'üç': 3, 'dört': 4, 'beş': 5, 'altı': 6, 'yedi': 7, 'sekiz': 8, 'dokuz': 9,
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+# Yuvalar; Türkçe ekler ("2024'te", "temmuzda", "temmuz ayındaki") yuvanın parçası sayılır
+_YEAR_RE = re.compile(r"(?<!\w)(?P<value>(?:19|20)\d\d)(?:'?\w*)?(?: yıl\w*)?(?!\w)")
+_NUMBER_RE = re.compile(
+    r"(?<![\w.,])(?P<value>\d+|" + "|".join(_NUMBER_WORDS) + r")(?:'\w+)?(?![\w.,]\w)")
+_MONTH_RE = re.compile(
+    r"(?<!\w)(?:in )?(?P<value>" + "|".join(_MONTHS) + r")(?:'?\w*)?(?: ay\w*)?(?!\w)")
+# Tanınmayan sözcükler arasında bunlar varsa soru anlamı değiştiren bir koşul taşır; güven sıfırdır
+_QUALIFIER_RE = re.compile(
+    r"(?:son|geçen|önceki|hariç|dışında|değil|olmayan|arasında|fazla|az|büyük|küçük|ve|veya"
+    r"|last|past|previous|except|excluding|without|not|between|more|less|than|over|under|and|or)\W*")
+# Anlam taşımayan istek sözcükleri
+_FILLER_RE = re.compile(
+    r"(?:göster|listele|getir|hesapla|bul|ver|sırala)\w*|bana|lütfen|nedir|neler\w*|hangi\w*|m[iıuü]s[iıuü]n\w*"
+    r"|var|vardır|mevcut|olan|tane|adet|ile|kaçtır|acaba"
+    r"|show|list|display|get|give|find|calculate|compute|me|the|a|all|please|what|which|are|is|top|in|of|for")
+
+_PLURAL_RE = re.compile(r"l[ae]r|[a-z]s\b")
+
+# Sık kullanılan ifade parçaları
+_PRODUCT = r"ürün\w*|products?|items?"
+_SALES = r"satış\w*|sales?"
+_ALL = r"tüm|bütün|all"
+_BY_CATEGORY = (r"kategori (?:bazında|başına)|kategori\w* göre|her kategori\w*"
+                r"|(?:by|per|for each) category|category[- ]wise")
+_PRICE_ORDER = (r"(?P<desc>en pahalı|en yüksek fiyatlı|most expensive|priciest|highest[- ]priced)"
+                r"|(?P<asc>en ucuz|en düşük fiyatlı|cheapest|least expensive|lowest[- ]priced)")
+_SALES_ORDER = (r"(?P<desc>en (?:çok|fazla) sat(?:an|ılan|ış yapan)\w*|best[- ]sell\w*|top[- ]sell\w*|most sold)"
+                r"|(?P<asc>en az sat(?:an|ılan|ış yapan)\w*|least sold|worst[- ]sell\w*)")
+_SALE_DATE_FILTERS = {
+    'month': "strftime('%m', sale_date)", 'year': "strftime('%Y', sale_date)",
+    'year_month': "strftime('%Y-%m', sale_date)",
+}
+_MONTHLY_FILTERS = {'month': "substr(month, 6, 2)", 'year': "substr(month, 1, 4)", 'year_month': "month"}
+
+# Niyetler: tümü eşleşmesi gereken ifadeler, varsa tanınan ifadeler, kabul edilen yuvalar ve SQL.
+# {where} yuvalardan kurulur (filters: yuva → sütun ifadesi), {order} sıralama sözcüğünden gelir
+# (artan sıralamanın farklı bir sorgu gerektirdiği niyetlerde sql_asc kullanılır);
+# limit yuvası LIMIT ? olarak eklenir. Yuva değerleri her zaman parametredir.
+FAST_PATH_INTENTS = [
+    {
+        "name": "products_by_price",
+        "required": (_PRICE_ORDER, _PRODUCT),
+        "limit": True,
+        "filters": {'category': "category"},
+        "sql": "SELECT * FROM products{where} ORDER BY price {order}",
+    },
+    {
+        "name": "top_sellers",
+        "required": (_SALES_ORDER,),
+        "optional": (_PRODUCT,),
+        "limit": True,
+        "filters": {'category': "p.category"},
+        "sql": ("SELECT p.product_name, t.total_quantity AS total_sold FROM product_sales_totals t "
+                "JOIN products p ON p.product_id = t.product_id{where} ORDER BY total_sold {order}"),
+        # En az satanlar hiç satılmamış ürünlerdir; özet tablosunda satırları yoktur
+        "sql_asc": ("SELECT p.product_name, COALESCE(t.total_quantity, 0) AS total_sold FROM products p "
+                    "LEFT JOIN product_sales_totals t ON t.product_id = p.product_id{where} ORDER BY total_sold ASC"),
+    },
+    {
+        "name": "all_products",
+        "required": (_PRODUCT,),
+        "optional": (_ALL,),
+        "filters": {'category': "category"},
+        "sql": "SELECT * FROM products{where}",
+    },
+    {
+        "name": "product_count",
+        "required": (r"kaç (?:çeşit )?ürün|ürün sayı\w*|how many products|number of products|product count",),
+        "filters": {'category': "category"},
+        "sql": "SELECT COUNT(*) AS product_count FROM products{where}",
+    },
+    {
+        "name": "product_count_by_category",
+        "required": (_BY_CATEGORY, r"ürün sayı\w*|ürün adedi|(?:number|count) of products|product counts?"),
+        "sql": "SELECT category, product_count FROM category_product_counts",
+    },
+    {
+        "name": "sales",
+        "required": (_SALES,),
+        "optional": (_ALL,),
+        "filters": _SALE_DATE_FILTERS,
+        "sql": "SELECT * FROM sales{where}",
+    },
+    {
+        "name": "revenue_by_category",
+        "required": (_BY_CATEGORY, r"satış\w*|ciro\w*|gelir\w*|revenue|sales"),
+        "sql": ("SELECT p.category, SUM(t.total_revenue) AS total_revenue FROM product_sales_totals t "
+                "JOIN products p ON p.product_id = t.product_id GROUP BY p.category ORDER BY total_revenue DESC"),
+    },
+    {
+        "name": "sales_by_customer",
+        "required": (r"müşteri (?:bazında|başına)|müşteri\w* göre|(?:by|per) customer",),
+        "optional": (_SALES,),
+        "sql": ("SELECT customer_id, COUNT(*) AS sale_count, SUM(total_amount) AS total_spent FROM sales "
+                "GROUP BY customer_id ORDER BY total_spent DESC"),
+    },
+    {
+        "name": "monthly_sales",
+        "required": (r"aylık satış\w*|ay\w* göre satış\w*|ay bazında satış\w*|monthly sales|sales (?:by|per) month",),
+        "filters": {'year': "substr(month, 1, 4)"},
+        "sql": "SELECT month, sale_count, total_quantity, total_revenue FROM monthly_sales{where} ORDER BY month",
+    },
+    {
+        "name": "total_quantity",
+        "required": (r"toplam satış miktar\w*|toplam satılan (?:ürün )?(?:miktar\w*|adet\w*)"
+                     r"|total (?:sales )?quantity(?: sold)?|total units sold",),
+        "filters": _MONTHLY_FILTERS,
+        "sql": "SELECT SUM(total_quantity) AS total_quantity FROM monthly_sales{where}",
+    },
+    {
+        "name": "total_revenue",
+        "required": (r"toplam (?:satış tutar\w*|ciro\w*|gelir\w*)|total (?:revenue|sales amount|sales)",),
+        "filters": _MONTHLY_FILTERS,
+        "sql": "SELECT SUM(total_revenue) AS total_revenue FROM monthly_sales{where}",
+    },
+]
+
+# result: hit (SQL yerelde üretildi) ya da miss (soru LLM'e gitti)
+FAST_PATH = REGISTRY.counter('texttosql_fast_path_total', 'Hızlı yolda yanıtlanan sorular', ('result',))
+
+FastPathMatch = namedtuple('FastPathMatch', 'intent sql params confidence')
+
+
+def render_sql(sql_query, params):
+    """'?' parametrelerini sabit olarak yerleştir; gösterilen ve önbelleğe giren SQL metni budur"""
+    values = iter(params)
+    return re.sub(r'\?', lambda _: render_literal(next(values)), sql_query)
+
+
+def _compile(patterns):
+    return tuple(re.compile(rf"(?<!\w)(?:{pattern})(?!\w)") for pattern in patterns)
+
+
+def _covered(spans, start, end):
+    return any(span_start <= start and end <= span_end for span_start, span_end in spans)
+
+
+class IntentMatcher:
+    """Sık soru biçimlerini (Türkçe ve İngilizce) LLM'e gitmeden parametreli SQL'e çeviren eşleyici
+
+    Soru sözcüklerinin kaçının niyet ifadeleri, yuvalar (sayı, ay, yıl, canlı products.category
+    değerleri) ve istek sözcükleri tarafından açıklandığı güveni verir. Açıklanamayan bir koşul
+    sözcüğü (son, hariç, between...) ya da fazladan bir sayı/ay varsa soru LLM'e bırakılır.
+    """
+
+    def __init__(self, pool, intents=FAST_PATH_INTENTS, min_confidence=MIN_CONFIDENCE):
+        self.pool = pool
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+        self.intent_hits = {}
+        self._lock = threading.Lock()
+        self._categories = []
+        self._categories_at = float('-inf')
+        self.intents = []
+        self.disabled = []
+        for intent in intents:
+            error = self._check(intent)
+            if error is None:
+                self.intents.append(dict(intent, required=_compile(intent["required"]),
+                                         optional=_compile(intent.get("optional", ()))))
+            else:
+                self.disabled.append((intent["name"], error))
+
+    def _check(self, intent):
+        """Niyetin en geniş SQL'leri bu veritabanında derleniyor mu (ör. özet tabloları var mı)"""
+        filters = intent.get("filters", {})
+        conditions = " AND ".join(f"{column} = ?" for column in filters.values())
+        for template in (intent["sql"], intent.get("sql_asc")):
+            if template is None:
+                continue
+            sql_query = template.format(where=f" WHERE {conditions}" if conditions else "", order="DESC")
+            if intent.get("limit"):
+                sql_query += " LIMIT ?"
+            try:
+                with self.pool.reader() as conn:
+                    conn.execute(f"EXPLAIN {sql_query}", [None] * sql_query.count('?'))
+            except sqlite3.Error as e:
+                return str(e)
+        return None
+
+    def categories(self):
+        """(normalleştirilmiş ad, veritabanındaki değer) listesi; uzun adlar önce denenir"""
+        now = time.monotonic()
+        if now - self._categories_at > CATEGORY_REFRESH_SECONDS:
+            with self.pool.reader() as conn:
+                rows = conn.execute(
+                    "SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != ''"
+                ).fetchall()
+            categories = [(normalize_question(row[0]), row[0]) for row in rows]
+            self._categories = sorted(categories, key=lambda item: -len(item[0]))
+            self._categories_at = now
+        return self._categories
+
+    def _slots(self, text):
+        """Sorudaki yuvalar: {tür: (değer, başlangıç, bitiş)}; aynı türden ikinci değer fazlalıktır"""
+        slots, extra, taken = {}, [], []
+
+        def add(kind, value, start, end):
+            if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                return
+            taken.append((start, end))
+            if kind in slots:
+                extra.append((start, end))
+            else:
+                slots[kind] = (value, start, end)
+
+        for name, value in self.categories():
+            pattern = rf"(?<!\w)(?:(?:kategori\w*|category) )?{re.escape(name)}(?:'?\w*)?(?: (?:kategori\w*|category))?(?!\w)"
+            for match in re.finditer(pattern, text):
+                add('category', value, match.start(), match.end())
+        for match in _MONTH_RE.finditer(text):
+            add('month', _MONTHS[match.group('value')], match.start(), match.end())
+        for match in _YEAR_RE.finditer(text):
+            add('year', match.group('value'), match.start(), match.end())
+        for match in _NUMBER_RE.finditer(text):
+            value = match.group('value')
+            add('limit', int(value) if value.isdigit() else _NUMBER_WORDS[value], match.start(), match.end())
+        return slots, extra
+
+    def _score(self, intent, text, tokens, slots, extra):
+        """(güven, SQL, parametreler) ya da gerekli ifadelerden biri yoksa None"""
+        spans, order = [], 'DESC'
+        for pattern in intent["required"]:
+            match = pattern.search(text)
+            if match is None:
+                return None
+            spans.append(match.span())
+            if 'asc' in pattern.groupindex and match.group('asc'):
+                order = 'ASC'
+        for pattern in intent["optional"]:
+            spans.extend(match.span() for match in pattern.finditer(text))
+        plural = any(_PLURAL_RE.search(text[start:end]) for start, end in spans)
+
+        filters = intent.get("filters", {})
+        conditions, params = [], []
+        if 'month' in slots and 'year' in slots and 'year_month' in filters:
+            conditions.append(f"{filters['year_month']} = ?")
+            params.append(f"{slots['year'][0]}-{slots['month'][0]}")
+            spans.extend(slots[kind][1:] for kind in ('month', 'year'))
+        else:
+            for kind in ('category', 'month', 'year'):
+                if kind in slots and kind in filters:
+                    conditions.append(f"{filters[kind]} = ?")
+                    params.append(slots[kind][0])
+                    spans.append(slots[kind][1:])
+        template = intent.get("sql_asc", intent["sql"]) if order == 'ASC' else intent["sql"]
+        sql_query = template.format(where=f" WHERE {' AND '.join(conditions)}" if conditions else "", order=order)
+        if intent.get("limit"):
+            sql_query += " LIMIT ?"
+            if 'limit' in slots:
+                params.append(slots['limit'][0])
+                spans.append(slots['limit'][1:])
+            else:
+                params.append(DEFAULT_LIMIT if plural else 1)
+
+        explained = 0
+        for token, start, end in tokens:
+            if _covered(spans, start, end) or _FILLER_RE.fullmatch(token):
+                explained += 1
+            elif (_QUALIFIER_RE.fullmatch(token) or _covered(extra, start, end)
+                  or any(_covered([slot[1:]], start, end) for slot in slots.values())):
+                # Kullanılmayan yuva ya da koşul sözcüğü sorunun anlamını değiştirir
+                return 0.0, sql_query, params
+        return explained / len(tokens), sql_query, params
+
+    def match(self, question):
+        """Güveni yeterli en iyi eşleşme (FastPathMatch) ya da None"""
+        text = normalize_question(question)
+        tokens = [(m.group().strip("'’\",;:!?."), m.start(), m.end()) for m in re.finditer(r'\S+', text)]
+        best = None
+        if tokens:
+            slots, extra = self._slots(text)
+            for intent in self.intents:
+                scored = self._score(intent, text, tokens, slots, extra)
+                # Eşit güvende daha çok ifade isteyen (daha belirli) niyet seçilir
+                if scored is not None and (best is None or (scored[0], len(intent["required"])) > best[0]):
+                    best = ((scored[0], len(intent["required"])), intent["name"], scored)
+        if best is None or best[2][0] < self.min_confidence:
+            self._count(None)
+            return None
+        confidence, sql_query, params = best[2]
+        self._count(best[1])
+        return FastPathMatch(best[1], render_sql(sql_query, params), tuple(params), confidence)
+
+    def _count(self, intent):
+        with self._lock:
+            if intent is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.intent_hits[intent] = self.intent_hits.get(intent, 0) + 1
+        FAST_PATH.inc(result='miss' if intent is None else 'hit')
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "intents": dict(self.intent_hits),
+            "disabled": [name for name, _ in self.disabled],
+        }
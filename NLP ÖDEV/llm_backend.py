@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+from sql_cache import normalize_question
+
+# --- Arka Uç Ayarları ---
+BACKENDS = ('gemini', 'mock')
+DEFAULT_BACKEND = os.environ.get("LLM_BACKEND", "gemini").lower()
+MOCK_LATENCY_MS = float(os.environ.get("MOCK_LLM_LATENCY_MS", "0"))
+MOCK_JITTER_MS = float(os.environ.get("MOCK_LLM_JITTER_MS", "0"))
+MOCK_REPLAY_FILE = os.environ.get("MOCK_LLM_REPLAY")
+MOCK_FALLBACK_SQL = "SELECT * FROM sales LIMIT 100"
+# Gemini HTTP isteğinin süre sınırı; akışta asılı kalan bağlantı da bu sürede kesilir
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+DEFAULT_LIMIT = 10
+QUESTION_MARKER = "Soru:"
+# Akış modunda mock yanıt sözcük sözcük (boşluklarıyla birlikte) parçalanır
+_STREAM_CHUNK_RE = re.compile(r'\s*\S+')
+
+_MONTHS = {
+    'ocak': '01', 'şubat': '02', 'mart': '03', 'nisan': '04', 'mayıs': '05', 'haziran': '06',
+    'temmuz': '07', 'ağustos': '08', 'eylül': '09', 'ekim': '10', 'kasım': '11', 'aralık': '12',
+}
+_MONTH_PATTERN = '|'.join(_MONTHS)
+# Toplam/gruplama soruları, şema talimatındaki gibi özet tablolarına (aggregates.py) yönlendirilir
+_TOP_SELLERS_SQL = (
+    "SELECT p.product_name, t.total_quantity AS total_sold FROM product_sales_totals t "
+    "JOIN products p ON p.product_id = t.product_id ORDER BY total_sold DESC LIMIT {n}"
+)
+# Hiç satılmamış ürünlerin özet tablosunda satırı yoktur; en az satanlar için ürünlerden başlanır
+_LEAST_SELLERS_SQL = (
+    "SELECT p.product_name, COALESCE(t.total_quantity, 0) AS total_sold FROM products p "
+    "LEFT JOIN product_sales_totals t ON t.product_id = p.product_id ORDER BY total_sold ASC LIMIT {n}"
+)
+
+# Normalize edilmiş soruya uyan ilk kural kullanılır; {n} ve {month} sorudan doldurulur
+MOCK_RULES = [
+    (rf'\b({_MONTH_PATTERN}) ayındaki satış', "SELECT * FROM sales WHERE strftime('%m', sale_date) = '{month}'"),
+    (r'en pahalı (?:(\d+) )?ürün', "SELECT * FROM products ORDER BY price DESC LIMIT {n}"),
+    (r'en ucuz (?:(\d+) )?ürün', "SELECT * FROM products ORDER BY price ASC LIMIT {n}"),
+    (r'en çok sat\w*(?: yapan)? (?:(\d+) )?ürün', _TOP_SELLERS_SQL),
+    (r'en az sat\w*(?: yapan)? (?:(\d+) )?ürün', _LEAST_SELLERS_SQL),
+    (r'kategori bazında ürün sayı', "SELECT category, product_count FROM category_product_counts"),
+    (r'kategori bazında (?:satış|ciro|gelir)', (
+        "SELECT p.category, SUM(t.total_revenue) AS total_revenue FROM product_sales_totals t "
+        "JOIN products p ON p.product_id = t.product_id GROUP BY p.category ORDER BY total_revenue DESC"
+    )),
+    (r'müşteri bazında', (
+        "SELECT customer_id, COUNT(*) AS sale_count, SUM(total_amount) AS total_spent FROM sales "
+        "GROUP BY customer_id ORDER BY total_spent DESC"
+    )),
+    (r'toplam satış miktar', "SELECT SUM(total_quantity) AS total_quantity FROM monthly_sales"),
+    (r'toplam (?:satış tutar|ciro|gelir)', "SELECT SUM(total_revenue) AS total_revenue FROM monthly_sales"),
+    (r'tüm ürün', "SELECT * FROM products"),
+    (r'tüm satış', "SELECT * FROM sales"),
+]
+
+
+class UsageMetadata:
+    """Gemini usage_metadata alanlarının yerel karşılığı"""
+
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class LLMResponse:
+    """google.generativeai yanıtı gibi 'text' ve 'usage_metadata' taşıyan yanıt"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StreamedResponse:
+    """generate_content(stream=True) yanıtı gibi: üzerinde gezinildikçe parçalar gelir"""
+
+    def __init__(self, pieces, delay_per_piece, usage_metadata):
+        self.pieces = pieces
+        self.delay_per_piece = delay_per_piece
+        self.usage_metadata = usage_metadata
+
+    def __iter__(self):
+        for piece in self.pieces:
+            time.sleep(self.delay_per_piece)
+            yield LLMResponse(piece)
+
+    @property
+    def text(self):
+        return "".join(self.pieces)
+
+
+def estimate_tokens(text):
+    """Kaba token tahmini (yaklaşık 4 karakter = 1 token)"""
+    return max(1, len(text) // 4)
+
+
+class GeminiBackend:
+    """Google Gemini modeli; llm_client'ın beklediği generate_content arayüzünü sunar"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name='gemini-2.0-flash', system_instruction=None,
+                 request_timeout=REQUEST_TIMEOUT_SECONDS):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.request_options = {"timeout": request_timeout}
+        self._model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def generate_content(self, prompt):
+        return self._model.generate_content(prompt, request_options=self.request_options)
+
+    def generate_content_stream(self, prompt):
+        # Yanıt parça parça gelir; usage_metadata gezinme bitince dolar
+        return self._model.generate_content(prompt, stream=True, request_options=self.request_options)
+
+    async def generate_content_async(self, prompt):
+        return await self._model.generate_content_async(prompt, request_options=self.request_options)
+
+
+class MockBackend:
+    """Ağ gerektirmeyen, belirlenimci yerel SQL üretici
+
+    Önce kayıtlı soru→SQL çiftlerine (replay), sonra MOCK_RULES kurallarına bakar.
+    Gecikme soru metninden türetildiği için aynı soru her çalıştırmada aynı sürede yanıtlanır.
+    """
+
+    name = 'mock'
+
+    def __init__(self, latency_ms=MOCK_LATENCY_MS, jitter_ms=MOCK_JITTER_MS, replay_file=MOCK_REPLAY_FILE,
+                 rules=MOCK_RULES, fallback_sql=MOCK_FALLBACK_SQL):
+        self.model_name = 'mock'
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rules = [(re.compile(pattern), template) for pattern, template in rules]
+        self.fallback_sql = fallback_sql
+        self.replay = {}
+        if replay_file and os.path.exists(replay_file):
+            self.load_replay(replay_file)
+
+    def load_replay(self, path):
+        """JSONL dosyasındaki {"question", "sql"} çiftlerini yükle"""
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                self.record(item["question"], item["sql"])
+
+    def record(self, question, sql_query):
+        self.replay[normalize_question(question)] = sql_query
+
+    def translate(self, question):
+        """Soruyu SQL'e çevir; eşleşme yoksa fallback_sql döner"""
+        key = normalize_question(question)
+        if key in self.replay:
+            return self.replay[key]
+        for pattern, template in self.rules:
+            match = pattern.search(key)
+            if match is None:
+                continue
+            value = match.group(1) if match.groups() else None
+            return template.format(
+                n=value if value and value.isdigit() else DEFAULT_LIMIT,
+                month=_MONTHS.get(value, ''),
+            )
+        return self.fallback_sql
+
+    def delay(self, question):
+        """Soruya özgü, tekrarlanabilir simüle gecikme (saniye)"""
+        jitter = 0.0
+        if self.jitter_ms:
+            jitter = random.Random(zlib.crc32(question.encode('utf-8'))).uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _response(self, prompt):
+        # Büyük şemalarda istemin başında ilgili tablolar olur (schema_info.py); soru sondadır
+        question = prompt.rsplit(QUESTION_MARKER, 1)[-1].strip()
+        # Gerçek model gibi kod bloğu içinde döndür; temizleme adımı da çalışmış olur
+        text = f"```sql\n{self.translate(question)}\n```"
+        return LLMResponse(text, UsageMetadata(estimate_tokens(prompt), estimate_tokens(text)))
+
+    def generate_content(self, prompt):
+        time.sleep(self.delay(prompt))
+        return self._response(prompt)
+
+    def generate_content_stream(self, prompt):
+        """Aynı yanıt; simüle gecikme parçalara eşit dağıtılır"""
+        response = self._response(prompt)
+        pieces = _STREAM_CHUNK_RE.findall(response.text)
+        return StreamedResponse(pieces, self.delay(prompt) / len(pieces), response.usage_metadata)
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.delay(prompt))
+        return self._response(prompt)
+
+
+def create_model(backend=None, api_key=None, model_name='gemini-2.0-flash', system_instruction=None):
+    """LLM_BACKEND (veya backend) değerine göre Gemini ya da yerel mock modelini oluştur"""
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend == 'mock':
+        return MockBackend()
+    if backend == 'gemini':
+        if not api_key:
+            raise ValueError("Gemini arka ucu için API anahtarı gereklidir.")
+        return GeminiBackend(api_key, model_name, system_instruction)
+    raise ValueError(f"Bilinmeyen LLM arka ucu: {backend} (seçenekler: {', '.join(BACKENDS)})")
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(backend=None, api_key=None, model_name='gemini-2.0-flash', system_instruction=None):
+    """create_model'in süreç genelinde önbelleklenmiş sürümü
+
+    Arka plandaki ısınma (warmup.py) ile ilk istek aynı anahtarla çağırırsa model bir kez kurulur;
+    kurulum sürerken gelen çağrı onu bekler. Kurulum hata verirse bir sonraki çağrı yeniden dener.
+    """
+    key = ((backend or DEFAULT_BACKEND).lower(), api_key, model_name, system_instruction)
+    with _models_lock:
+        entry = _models.setdefault(key, {"lock": threading.Lock(), "model": None})
+    with entry["lock"]:
+        if entry["model"] is None:
+            entry["model"] = create_model(*key)
+        return entry["model"]
+
+
+def peek_model(backend=None, api_key=None, model_name='gemini-2.0-flash', system_instruction=None):
+    """Model kurulmuşsa döndür, kurulmamışsa beklemeden None döndür"""
+    key = ((backend or DEFAULT_BACKEND).lower(), api_key, model_name, system_instruction)
+    with _models_lock:
+        entry = _models.get(key)
+    return entry["model"] if entry else None
@@ -0,0 +1,348 @@
+import asyncio
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import STAGE_SECONDS, record_error, record_tokens
+from sql_cache import normalize_question
+
+# --- İstemci Ayarları ---
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+# Akışta ilk parça TIMEOUT_SECONDS içinde, sonraki her parça bir öncekinden en fazla bu kadar sonra gelmeli
+STREAM_IDLE_SECONDS = float(os.environ.get("LLM_STREAM_IDLE_SECONDS", str(TIMEOUT_SECONDS)))
+MAX_RETRIES = 3
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 8.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+FENCE = '```'
+# Yanıt bu sözcüklerden biriyle başlıyorsa kod bloğu beklenmez; çıplak SQL'dir
+_SQL_START_RE = re.compile(r'(?:select|with|values|insert|update|delete|replace|create|drop|alter|pragma|explain)\b', re.I)
+_FENCE_TAG_RE = re.compile(r'[\w+-]*\s*')
+
+
+def _parse_response(text, final):
+    """Şimdiye kadar gelen yanıttan (SQL, SQL bitti mi) çıkar
+
+    SQL ya yanıtın başındaysa çıplak, ya da ilk kod bloğunun içindedir; bloktan önceki ve sonraki
+    açıklama metni atılır. Kapanış işaretinin yarısı gelmiş olabileceğinden, yanıt bitmeden sondaki
+    ters tırnaklar gösterilmez.
+    """
+    text = text.lstrip()
+    fence = text.find(FENCE)
+    if _SQL_START_RE.match(text) or (final and fence == -1):
+        if fence != -1:
+            return text[:fence].strip(), True
+        return (text if final else text.rstrip('`')).strip(), final
+    if fence == -1:
+        return '', final  # henüz yalnızca açıklama metni var (ya da ilk sözcük yarım)
+    rest = text[fence + len(FENCE):]
+    newline = rest.find('\n')
+    if _FENCE_TAG_RE.fullmatch(rest if newline == -1 else rest[:newline]):
+        if newline == -1:
+            return '', final  # '```sql' satırı henüz bitmedi
+        body = rest[newline + 1:]
+    else:
+        body = rest  # tek satırlık ```SELECT ...``` bloğu
+    close = body.find(FENCE)
+    if close != -1:
+        return body[:close].strip(), True
+    return (body if final else body.rstrip('`')).strip(), final
+
+
+def _first_statement(sql):
+    """';' ile biten ilk tam ifade (tırnak ve yorum içindeki ';' sayılmaz) ya da None"""
+    for index, char in enumerate(sql):
+        if char == ';' and sqlite3.complete_statement(sql[:index + 1]):
+            return sql[:index + 1].strip()
+    return None
+
+
+class SqlExtractor:
+    """Akan model yanıtından SQL'i parça parça ayıklar
+
+    feed() her parçadan sonra o ana kadarki SQL'i döndürür. İlk ifade ';' ile ya da kod bloğu
+    kapanınca tamamlanır (statement); doğrulama yanıtın kalanı beklenmeden başlatılabilir.
+    Kod bloğu kapandıysa (complete) sonrası açıklamadır ve akışın okunmasına gerek yoktur.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.sql = ''
+        self.statement = None
+        self.complete = False
+
+    def _update(self, final):
+        self.sql, self.complete = _parse_response(self.text, final)
+        if self.statement is None:
+            self.statement = _first_statement(self.sql) or (self.sql if self.complete and self.sql else None)
+
+    def feed(self, chunk):
+        self.text += chunk
+        self._update(final=False)
+        return self.sql
+
+    def finish(self):
+        """Yanıt bitti; son SQL'i döndür"""
+        self._update(final=True)
+        return self.sql
+
+
+def strip_code_fences(text):
+    """Model yanıtındaki Markdown kod bloğu işaretlerini ve açıklamaları kaldırıp SQL metnini döndür"""
+    extractor = SqlExtractor()
+    extractor.feed(text)
+    return extractor.finish()
+
+
+def is_retryable(error):
+    """429/5xx ve zaman aşımı hataları yeniden denenir"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # google.api_core istisnaları HTTP durum kodunu 'code' özelliğinde taşır (ör. ResourceExhausted → 429)
+    code = getattr(error, 'code', None)
+    return code in RETRYABLE_STATUS_CODES
+
+
+class AsyncLLMClient:
+    """Eşzamanlılık sınırı, istek birleştirme, zaman aşımı ve jitter'lı yeniden deneme ile LLM istemcisi"""
+
+    def __init__(self, model, max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT_SECONDS,
+                 max_retries=MAX_RETRIES, base_delay=BASE_DELAY_SECONDS, stream_idle_timeout=STREAM_IDLE_SECONDS):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self._semaphore = None
+        self._stream_slots = None
+        self._inflight = {}
+
+    async def generate(self, prompt):
+        """Yanıt metnini döndür; aynı soru zaten işleniyorsa o çağrının sonucunu bekle"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        key = normalize_question(prompt)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._generate(prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Bekleyenlerden biri iptal edilirse ortak çağrı iptal olmasın
+        return await asyncio.shield(task)
+
+    async def _generate(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    self.calls += 1
+                    started = time.perf_counter()
+                    response = await asyncio.wait_for(self._call(prompt), self.timeout)
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage='llm')
+                record_tokens(response)
+                return response.text
+            except Exception as e:
+                record_error('llm', e)
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                # Tam jitter'lı üstel geri çekilme
+                delay = min(MAX_DELAY_SECONDS, self.base_delay * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+    async def _call(self, prompt):
+        if hasattr(self.model, 'generate_content_async'):
+            return await self.model.generate_content_async(prompt)
+        return await asyncio.to_thread(self.model.generate_content, prompt)
+
+    def stream(self, prompt):
+        """Yanıt metnini parça parça üret (senkron üreteç)
+
+        Geçici hatalar yalnızca ilk parça gelmeden önce yeniden denenir; sonrasında yarım yanıt
+        tekrarlanamayacağı için hata çağırana iletilir. İlk parça timeout, sonrakiler bir öncekinden
+        stream_idle_timeout saniye içinde gelmezse TimeoutError fırlatılır (ilk parçadan önceyse
+        yeniden denenir). Üreteç erken kapatılırsa akış bırakılır. Aynı sorular birleştirilmez;
+        her akış ayrı bir çağrıdır.
+        """
+        if self._stream_slots is None:
+            with _lock:
+                if self._stream_slots is None:
+                    self._stream_slots = threading.BoundedSemaphore(self.max_concurrency)
+        for attempt in range(self.max_retries + 1):
+            received = False
+            with self._stream_slots:
+                self.calls += 1
+                started = time.perf_counter()
+                reader = _StreamReader(lambda: self._open_stream(prompt))
+                try:
+                    while True:
+                        chunk = reader.next(self.stream_idle_timeout if received else self.timeout)
+                        if chunk is _END:
+                            break
+                        text = _chunk_text(chunk)
+                        if not text:
+                            continue
+                        if not received:
+                            received = True
+                            STAGE_SECONDS.observe(time.perf_counter() - started, stage='llm_first_token')
+                        yield text
+                    record_tokens(reader.response)
+                    return
+                except Exception as e:
+                    record_error('llm', e)
+                    if received or attempt == self.max_retries or not is_retryable(e):
+                        raise
+                    self.retries += 1
+                finally:
+                    reader.close()
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage='llm')
+            time.sleep(random.uniform(0, min(MAX_DELAY_SECONDS, self.base_delay * 2 ** attempt)))
+
+    def _open_stream(self, prompt):
+        if hasattr(self.model, 'generate_content_stream'):
+            return self.model.generate_content_stream(prompt)
+        # Akış desteklemeyen model: tüm yanıt tek parça gelir
+        response = self.model.generate_content(prompt)
+        return _SingleChunk(response)
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced, "retries": self.retries,
+                "in_flight": len(self._inflight)}
+
+
+_END = object()
+
+
+class _StreamReader:
+    """Akışı ayrı iş parçacığında açıp okur; çağıran her parçayı süre sınırıyla bekler
+
+    Senkron akış yineleyicisi asılı kalırsa next() süre dolunca TimeoutError fırlatır; böylece
+    çağıran (ve tuttuğu akış izni) serbest kalır. Asılı iş parçacığı, bağlantı kendi süre sınırıyla
+    (Gemini request_options) kesildiğinde biter.
+    """
+
+    def __init__(self, open_stream):
+        self.response = None
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        threading.Thread(target=self._run, args=(open_stream,), name="llm-stream", daemon=True).start()
+
+    def _run(self, open_stream):
+        try:
+            self.response = open_stream()
+            for chunk in self.response:
+                if self._closed.is_set():
+                    return
+                self._queue.put((chunk, None))
+            self._queue.put((_END, None))
+        except Exception as e:
+            self._queue.put((None, e))
+
+    def next(self, timeout):
+        """Sonraki parça ya da akış bittiyse _END"""
+        try:
+            chunk, error = self._queue.get(timeout=timeout or None)
+        except queue.Empty:
+            raise TimeoutError(f"LLM akışı {timeout:g} sn içinde yanıt parçası göndermedi.") from None
+        if error is not None:
+            raise error
+        return chunk
+
+    def close(self):
+        self._closed.set()
+
+
+class _SingleChunk:
+    def __init__(self, response):
+        self.response = response
+        self.usage_metadata = getattr(response, 'usage_metadata', None)
+
+    def __iter__(self):
+        yield self.response
+
+
+def _chunk_text(chunk):
+    # Gemini'de metin içermeyen parçalarda (ör. yalnızca bitiş nedeni) .text ValueError fırlatır
+    try:
+        return chunk.text
+    except ValueError:
+        return ''
+
+
+class _BackgroundLoop:
+    """Senkron kodun (Streamlit, CLI) coroutine çalıştırabilmesi için ortak olay döngüsü"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-event-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+
+_loop = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def background_loop():
+    """Tüm oturumların paylaştığı arka plan olay döngüsünü döndür"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = _BackgroundLoop()
+        return _loop
+
+
+def get_client(model):
+    """Model başına tek istemci; birleştirme ve eşzamanlılık sınırı tüm oturumlara uygulanır"""
+    with _lock:
+        client = _clients.get(id(model))
+        if client is None or client.model is not model:
+            client = AsyncLLMClient(model)
+            _clients[id(model)] = client
+        return client
+
+
+def generate_text(model, prompt):
+    """Senkron kod için: istemci üzerinden LLM yanıt metnini döndür"""
+    return background_loop().run(get_client(model).generate(prompt))
+
+
+def stream_sql(model, prompt, on_text=None, on_statement=None):
+    """Yanıtı akıtarak SQL'i döndür; kod bloğu kapanınca akışın kalanı (açıklama) beklenmez
+
+    on_text(sql) SQL her uzadığında o ana kadarki metinle, on_statement(sql) ilk ifade
+    tamamlandığında bir kez çağrılır (ör. yanıtın kalanı gelirken doğrulama başlatmak için).
+    """
+    extractor = SqlExtractor()
+    notified = False
+    stream = get_client(model).stream(prompt)
+    try:
+        for chunk in stream:
+            previous = extractor.sql
+            extractor.feed(chunk)
+            if on_text and extractor.sql != previous:
+                on_text(extractor.sql)
+            if on_statement and extractor.statement and not notified:
+                notified = True
+                on_statement(extractor.statement)
+            if extractor.complete:
+                break
+    finally:
+        stream.close()
+    sql_query = extractor.finish()
+    if on_statement and extractor.statement and not notified:
+        on_statement(extractor.statement)
+    return sql_query
@@ -0,0 +1,298 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Metrik Ayarları ---
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_FILE = os.environ.get("METRICS_FILE")
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_RECENT_ERRORS = 50
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Etiket değerlerine göre ayrılmış ölçümler tutan temel metrik"""
+
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.label_names, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + self._labels(key), value) for key, value in sorted(self._values.items())]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name} {_format_value(value)}" for name, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Yalnızca artan sayaç"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """Tüm etiketlerdeki değerlerin toplamı"""
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    """Anlık değer; set_function ile her dışa aktarımda yeniden hesaplanabilir"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function, **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def samples(self):
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                self.set(function(), **dict(zip(self.label_names, key)))
+            except Exception:
+                pass  # kaynak henüz hazır değilse son değer kalır
+        return super().samples()
+
+
+class Histogram(_Metric):
+    """Kova (bucket) sayıları, toplam ve adet tutan süre/boyut dağılımı"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels):
+        """Adet, toplam, ortalama ve kovalardan kestirilen p50/p95/p99"""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0] * (len(self.buckets) + 1), 0.0))
+            counts = list(counts)
+        count = sum(counts)
+        result = {"count": count, "sum": total, "mean": total / count if count else 0.0}
+        for q in (0.5, 0.95, 0.99):
+            result[f"p{int(q * 100)}"] = self._quantile(counts, q)
+        return result
+
+    def _quantile(self, counts, q):
+        # Prometheus histogram_quantile gibi: hedef kovanın içinde doğrusal ara değer
+        count = sum(counts)
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * ((rank - cumulative) / bucket_count)
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def label_values(self):
+        with self._lock:
+            return [dict(zip(self.label_names, key)) for key in sorted(self._values)]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        result = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                result.append((self.name + '_bucket' + self._labels(key, [('le', _format_value(bound))]), cumulative))
+            result.append((self.name + '_sum' + self._labels(key), total))
+            result.append((self.name + '_count' + self._labels(key), cumulative))
+        return result
+
+
+class Registry:
+    """Süreç genelindeki metrikler; aynı adla ikinci kayıt var olan metriği döndürür"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, label_names, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self):
+        """Tüm metrikleri Prometheus metin biçiminde döndür"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    'texttosql_stage_duration_seconds', 'Text-to-SQL hattı aşama süreleri', ('stage',))
+CRUD_SECONDS = REGISTRY.histogram(
+    'texttosql_crud_duration_seconds', 'CRUD işlemlerinin süreleri', ('operation',))
+ERRORS = REGISTRY.counter('texttosql_errors_total', 'Aşama veya işlem başına hata sayısı', ('stage',))
+LLM_TOKENS = REGISTRY.counter('texttosql_llm_tokens_total', 'LLM token kullanımı', ('kind',))
+CACHE_HIT_RATIO = REGISTRY.gauge('texttosql_cache_hit_ratio', 'Önbellek isabet oranı', ('cache',))
+CACHE_ENTRIES = REGISTRY.gauge('texttosql_cache_entries', 'Önbellekteki kayıt sayısı', ('cache',))
+
+recent_errors = deque(maxlen=MAX_RECENT_ERRORS)
+
+
+def record_error(stage, error):
+    """Hatayı sayaca ve son hatalar listesine ekle"""
+    ERRORS.inc(stage=stage)
+    recent_errors.append({
+        "time": time.strftime('%H:%M:%S'),
+        "stage": stage,
+        "error": f"{type(error).__name__}: {error}",
+    })
+
+
+@contextmanager
+def track(stage, histogram=STAGE_SECONDS, label='stage'):
+    """Bloğun süresini histograma yaz; hata çıkarsa sayıp yeniden fırlat"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, e)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **{label: stage})
+
+
+def track_operation(operation):
+    """CRUD işlemi için track"""
+    return track(operation, CRUD_SECONDS, 'operation')
+
+
+def record_tokens(response):
+    """Gemini yanıtındaki usage_metadata'dan token sayılarını ekle"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, 'prompt_token_count', 0) or 0, kind='prompt')
+    LLM_TOKENS.inc(getattr(usage, 'candidates_token_count', 0) or 0, kind='completion')
+
+
+def watch_cache(name, cache):
+    """stats() sunan bir önbelleğin isabet oranını ve boyutunu dışa aktarımlara ekle"""
+    CACHE_HIT_RATIO.set_function(lambda: cache.stats()["hit_rate"], cache=name)
+    CACHE_ENTRIES.set_function(lambda: cache.stats()["entries"], cache=name)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def write_textfile(path=METRICS_FILE):
+    """Metrikleri (node_exporter textfile toplayıcısı için) dosyaya atomik olarak yaz"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # her kazıma isteği konsola yazılmasın
+
+
+def start_http_server(port=METRICS_PORT, host='127.0.0.1'):
+    """/metrics uç noktasını arka planda sun; sunucu nesnesini döndür"""
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
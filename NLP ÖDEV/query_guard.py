@@ -0,0 +1,250 @@
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from sql_params import bind
+
+# --- Koruma Ayarları ---
+MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "10000"))
+MAX_COST = float(os.environ.get("QUERY_MAX_COST", "500000000"))
+TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", "10"))
+MAX_VM_STEPS = int(os.environ.get("QUERY_MAX_VM_STEPS", "0"))   # 0 = yalnızca süre sınırı
+# Akıtılan indirmeler ekrandaki önizlemeden büyük olabilir, ama yine de sınırlıdır
+EXPORT_MAX_ROWS = int(os.environ.get("QUERY_EXPORT_MAX_ROWS", "1000000"))
+EXPORT_TIMEOUT_SECONDS = float(os.environ.get("QUERY_EXPORT_TIMEOUT_SECONDS", "120"))
+PROGRESS_INTERVAL = 10000      # ilerleme işleyicisi bu kadar VM komutunda bir çağrılır
+SEARCH_ROWS = 10               # indeksli aramada döngü başına tahmini satır
+_READ_KEYWORDS = ('select', 'with', 'values')
+_STATEMENT_KEYWORDS = {'select', 'values', 'insert', 'replace', 'update', 'delete'}
+_SQL_KEYWORDS = {
+    'on', 'where', 'join', 'inner', 'left', 'right', 'cross', 'outer', 'natural', 'group', 'order', 'limit',
+    'using', 'as', 'union', 'having', 'select', 'from', 'and', 'or', 'not', 'by', 'window', 'except', 'intersect',
+}
+# sql_params.bind sonrası sayılar '?' parametresi olarak gelir
+_LIMIT_RE = re.compile(r'\bLIMIT\s+(\d+|\?)\s*(?:(?:OFFSET\s+(?:\d+|\?))|,\s*(\d+|\?))?\s*$', re.I)
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+
+
+class QueryRejected(Exception):
+    """Sorgu çalıştırılmadan önce güvenlik denetiminden geçemedi"""
+
+
+class QueryTimeout(Exception):
+    """Sorgu süre veya VM adımı bütçesini aştığı için durduruldu"""
+
+
+def split_statements(sql_query):
+    """SQL metnini ifadelere böl; tırnak ve yorum içindeki ';' işaretleri bölmez"""
+    statements = []
+    current = ''
+    for char in sql_query:
+        current += char
+        if char == ';' and sqlite3.complete_statement(current):
+            statements.append(current.strip().rstrip(';').strip())
+            current = ''
+    if current.strip():
+        statements.append(current.strip())
+    return [s for s in statements if s]
+
+
+def _strip_comments(sql_query):
+    return re.sub(r'--[^\n]*|/\*.*?\*/', ' ', sql_query, flags=re.S).strip()
+
+
+def _cte_main_keyword(statement):
+    """WITH ifadesinde CTE listesinden sonraki ana ifadenin anahtar sözcüğü (SELECT, DELETE...)"""
+    depth = 0
+    for token in re.findall(r'\w+|[()]', _QUOTED_RE.sub(' x ', statement)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token.lower() in _STATEMENT_KEYWORDS:
+            return token.lower()
+    return ''
+
+
+def check_statement(sql_query):
+    """Tek bir okuma (SELECT/WITH) ifadesi olduğunu doğrula ve sondaki ';' olmadan döndür"""
+    statements = split_statements(sql_query)
+    if len(statements) != 1:
+        raise QueryRejected("Yalnızca tek bir SQL ifadesi çalıştırılabilir.")
+    statement = statements[0]
+    stripped = _strip_comments(statement)
+    first_word = stripped.split(None, 1)[0].lower() if stripped else ''
+    if first_word not in _READ_KEYWORDS:
+        raise QueryRejected(f"Yalnızca okuma sorguları çalıştırılabilir ({first_word.upper() or 'boş'} reddedildi).")
+    if first_word == 'with':
+        # 'WITH x AS (...) DELETE FROM ...' de WITH ile başlar; belirleyici olan ana ifadedir
+        main_word = _cte_main_keyword(stripped)
+        if main_word not in ('select', 'values'):
+            raise QueryRejected(
+                f"Yalnızca okuma sorguları çalıştırılabilir (WITH ... {main_word.upper() or 'eksik ifade'} reddedildi).")
+    return statement
+
+
+def _limit_value(sql_query, match, group, params):
+    """LIMIT sayısını oku; '?' ise konumuna karşılık gelen parametreden al, bilinmiyorsa None"""
+    value = match.group(group)
+    if value != '?':
+        return int(value)
+    index = _strip_comments(_QUOTED_RE.sub(' ', sql_query[:match.start(group)])).count('?')
+    if isinstance(params, (list, tuple)) and index < len(params):
+        try:
+            return int(params[index])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def enforce_limit(sql_query, limit, params=None):
+    """Sonucun en fazla limit satır olmasını sağla; (sql, LIMIT eklendi mi) döndür"""
+    match = _LIMIT_RE.search(sql_query)
+    if match:
+        count = _limit_value(sql_query, match, 2 if match.group(2) else 1, params)
+        if count is not None and 0 <= count <= limit:   # LIMIT -1 sınırsız demektir
+            return sql_query, False
+    # Dış sorgu sıralamayı değiştirmez; alt sorgudaki ORDER BY korunur.
+    # Satır sonları, sorgunun sonundaki '--' yorumunun kapanış parantezini yutmasını önler.
+    return f"SELECT * FROM (\n{sql_query}\n) LIMIT {limit}", True
+
+
+def _table_aliases(conn, sql_query):
+    """Sorgu planında geçen ad (tablo adı veya takma ad) → tablo eşlemesi"""
+    aliases = {}
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        # 'FROM products p', 'JOIN sales AS s' ve 'FROM products, sales s' biçimleri
+        for match in re.finditer(rf'\b{re.escape(table)}\b(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?', sql_query, re.I):
+            aliases[table.lower()] = table
+            alias = match.group(1)
+            if alias and alias.lower() not in _SQL_KEYWORDS:
+                aliases[alias.lower()] = table
+    return aliases
+
+
+def _table_rows(conn, table, cache):
+    """Tablodaki satır sayısı tahmini; rowid tablolarında MAX(rowid) O(log n)'dir"""
+    if table not in cache:
+        try:
+            cache[table] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.Error:
+            cache[table] = 0
+    return cache[table]
+
+
+def estimate_cost(conn, sql_query, params=None):
+    """EXPLAIN QUERY PLAN üzerinden taranacak satır sayısını tahmin et
+
+    Aynı üst düğümdeki SCAN/SEARCH satırları iç içe döngülerdir, tahminleri çarpılır;
+    bu yüzden indekssiz bir kartezyen JOIN tablo boyutlarının çarpımı kadar maliyetlidir.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql_query}", params or ()).fetchall()
+    aliases = _table_aliases(conn, sql_query)
+    row_cache = {}
+    loops = {}
+    for _, parent, _, detail in plan:
+        match = re.match(r'(SCAN|SEARCH) (?:TABLE )?(\w+)', detail)
+        if match is None or match.group(2) == 'CONSTANT':
+            continue
+        table = aliases.get(match.group(2).lower())
+        if table is None:
+            continue  # alt sorgu / CTE taraması; kendi satırları ayrıca sayılır
+        if match.group(1) == 'SCAN':
+            rows = _table_rows(conn, table, row_cache)
+        else:
+            rows = 1 if 'INTEGER PRIMARY KEY' in detail or 'rowid=' in detail else SEARCH_ROWS
+        loops.setdefault(parent, []).append(max(rows, 1))
+    cost = 0
+    for estimates in loops.values():
+        product = 1
+        for rows in estimates:
+            product *= rows
+        cost += product
+    return {"cost": cost, "plan": [row[3] for row in plan]}
+
+
+@contextmanager
+def execution_budget(conn, timeout=TIMEOUT_SECONDS, max_steps=MAX_VM_STEPS, interval=PROGRESS_INTERVAL):
+    """Bağlantıdaki sorguları süre veya VM adımı bütçesi aşılınca kes"""
+    deadline = time.monotonic() + timeout if timeout else None
+    state = {"steps": 0, "reason": None}
+
+    def handler():
+        state["steps"] += interval
+        if max_steps and state["steps"] > max_steps:
+            state["reason"] = f"{max_steps:,} VM adımı"
+            return 1
+        if deadline is not None and time.monotonic() > deadline:
+            state["reason"] = f"{timeout:g} sn"
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, interval)
+    try:
+        yield state
+    except Exception as e:
+        # pandas, sqlite3 hatasını kendi DatabaseError türüne sarar
+        if state["reason"]:
+            raise QueryTimeout(f"Sorgu {state['reason']} bütçesini aştığı için durduruldu.") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, interval)
+
+
+def prepare(conn, sql_query, params=None, limit=MAX_ROWS, max_cost=MAX_COST):
+    """Denetle, maliyeti tahmin et ve LIMIT uygula; (çalıştırılacak sql, maliyet) döndür"""
+    statement = check_statement(sql_query)
+    try:
+        estimate = estimate_cost(conn, statement, params)
+    except sqlite3.Error as e:
+        raise QueryRejected(f"Sorgu planı oluşturulamadı: {e}") from e
+    if max_cost and estimate["cost"] > max_cost:
+        raise QueryRejected(
+            f"Tahmini maliyet çok yüksek (~{estimate['cost']:,.0f} satır, sınır {max_cost:,.0f}). "
+            "Sorguya filtre ekleyin veya JOIN koşulunu kontrol edin."
+        )
+    limited_sql, _ = enforce_limit(statement, limit, params)
+    return limited_sql, estimate
+
+
+def validate(pool, sql_query, params=None, max_cost=MAX_COST):
+    """Sorguyu çalıştırmadan denetle (tek okuma ifadesi, derlenebilirlik, EXPLAIN maliyeti); tahmini döndür
+
+    Model yanıtının kalanı akarken çağrılır; hatalı SQL çalıştırma aşamasına gelmeden QueryRejected ile bildirilir.
+    """
+    sql_query, params = bind(sql_query, params, record=False)
+    with pool.read_only() as conn:
+        _, estimate = prepare(conn, sql_query, params, MAX_ROWS, max_cost)
+    return estimate
+
+
+def run_query(pool, sql_query, params=None, max_rows=MAX_ROWS, timeout=TIMEOUT_SECONDS,
+              max_steps=MAX_VM_STEPS, max_cost=MAX_COST):
+    """Sorguyu salt okunur bağlantıda korumalı çalıştır; (DataFrame, kesildi mi) döndür
+
+    params verilmezse sorgudaki sabitler parametreye çevrilir (sql_params.py); aynı biçimdeki
+    sorgular bağlantının ifade önbelleğindeki hazırlanmış ifadeyi kullanır.
+    """
+    sql_query, params = bind(sql_query, params)
+    # pandas ilk sorguda yüklenir; modülü içe aktarmak başlangıcı yavaşlatmasın
+    import pandas as pd
+    with pool.read_only() as conn:
+        # Bir fazla satır okunur; böylece sonucun max_rows'ta kesildiği anlaşılır
+        limited_sql, _ = prepare(conn, sql_query, params, max_rows + 1, max_cost)
+        with execution_budget(conn, timeout, max_steps):
+            df = pd.read_sql_query(limited_sql, conn, params=params)
+    return df.iloc[:max_rows], len(df) > max_rows
+
+
+def iter_query(pool, sql_query, params=None, chunksize=10000, max_rows=MAX_ROWS, timeout=TIMEOUT_SECONDS,
+               max_steps=MAX_VM_STEPS, max_cost=MAX_COST):
+    """run_query'nin akış sürümü: sonucu chunksize satırlık DataFrame parçaları olarak üret"""
+    sql_query, params = bind(sql_query, params)
+    import pandas as pd
+    with pool.read_only() as conn:
+        limited_sql, _ = prepare(conn, sql_query, params, max_rows, max_cost)
+        with execution_budget(conn, timeout, max_steps):
+            yield from pd.read_sql_query(limited_sql, conn, params=params, chunksize=chunksize)
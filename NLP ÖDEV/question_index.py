@@ -0,0 +1,285 @@
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from db_pool import get_pool
+from sql_cache import CACHE_FILE, normalize_question, question_template
+
+# Yerel bir cümle gömme modeli kuruluysa kullanılabilir; yoksa karakter n-gram'larına düşülür
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# --- İndeks Ayarları ---
+DEFAULT_DIM = 256
+DEFAULT_THRESHOLD = 0.85
+NGRAM_SIZES = (2, 3, 4)
+# Bu boyutun üzerinde tam tarama yerine kaba (IVF) kümeleme ile arama yapılır
+IVF_MIN_SIZE = 20000
+IVF_PROBES = 8
+KMEANS_ITERATIONS = 8
+_NUMBER_RE = re.compile(r'\d+')
+_WORD_RE = re.compile(r'\w+')
+# Anlamı değiştirmeyen sözcükler; geri kalan (içerik) sözcükleri iki soruda aynı olmalıdır
+_STOPWORDS = {
+    'lütfen', 'bana', 'tüm', 'bütün', 'hepsi', 'olan', 'ile', 've', 'için', 'bir', 'bu', 'de', 'da',
+    'mi', 'mı', 'nedir', 'neler', 'listele', 'göster', 'getir', 'ver', 'bul', 'hesapla', 'yaz',
+    'please', 'me', 'the', 'a', 'an', 'all', 'of', 'show', 'list', 'give', 'get', 'find', 'display',
+    'what', 'are', 'is',
+}
+# Türkçe ekler (ürünü/ürünleri, miktarı/miktarını) sözcüğün ilk harflerini değiştirmez
+STEM_LENGTH = 4
+# Karakter olarak çok benzeyen ama zıt anlamlı sözcük grupları; iki soru aynı tarafı kullanmalıdır.
+# Üç harfe kadar olanlar tam, daha uzunlar ek almış biçimleriyle (miktarını, pahalı olan) eşleşir.
+CONTRASTS = (
+    ({'az', 'düşük', 'ucuz', 'least', 'lowest', 'cheapest', 'fewest'},
+     {'çok', 'fazla', 'yüksek', 'pahalı', 'most', 'highest', 'expensive'}),
+    ({'miktar', 'adet', 'quantity'}, {'tutar', 'gelir', 'ciro', 'harcama', 'revenue', 'amount'}),
+    ({'artan', 'ascending'}, {'azalan', 'descending'}),
+    ({'ilk', 'first'}, {'son', 'last'}),
+)
+
+
+def _content_words(words):
+    return {word if len(word) <= STEM_LENGTH else word[:STEM_LENGTH]
+            for word in words if word not in _STOPWORDS and not word.isdigit()}
+
+
+def _contrast_sides(words):
+    sides = []
+    for group in CONTRASTS:
+        sides.append(tuple(
+            any(word == term if len(term) <= 3 else word.startswith(term) for word in words for term in side)
+            for side in group
+        ))
+    return sides
+
+
+def same_meaning(question, other):
+    """İki soru yalnızca dolgu sözcükleriyle ve eklerle mi farklı"""
+    # "En pahalı 3 ürün" ile "En pahalı 5 ürün" çok benzer ama farklı sorulardır
+    if _NUMBER_RE.findall(question) != _NUMBER_RE.findall(other):
+        return False
+    if question_template(question)[1] != question_template(other)[1]:
+        return False
+    words = _WORD_RE.findall(normalize_question(question))
+    other_words = _WORD_RE.findall(normalize_question(other))
+    return (_contrast_sides(words) == _contrast_sides(other_words)
+            and _content_words(words) == _content_words(other_words))
+
+
+class CharNgramEmbedder:
+    """Ağ gerektirmeyen, özet tabanlı (hashing) karakter n-gram gömücü"""
+
+    def __init__(self, dim=DEFAULT_DIM, ngram_sizes=NGRAM_SIZES):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def embed(self, texts):
+        """Metinleri L2-normalize edilmiş float32 vektörlere dönüştür"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f" {normalize_question(text)} "
+            buckets = []
+            for n in self.ngram_sizes:
+                for i in range(len(padded) - n + 1):
+                    buckets.append(zlib.crc32(padded[i:i + n].encode('utf-8')))
+            if not buckets:
+                continue
+            hashes = np.asarray(buckets, dtype=np.uint32)
+            # İşaretli özetleme çakışmaların birbirini şişirmesini önler
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        # Alt-doğrusal tf ağırlığı ve L2 normalizasyonu
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+
+class SentenceEmbedder:
+    """Yerelde önbelleğe alınmış bir sentence-transformers modeli ile gömme"""
+
+    def __init__(self, model_name):
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        return self.model.encode(
+            [normalize_question(t) for t in texts], normalize_embeddings=True
+        ).astype(np.float32)
+
+
+class CoarseIndex:
+    """k-ortalamalar merkezleri üzerinde ters liste (IVF); yalnızca en yakın kümeler taranır"""
+
+    def __init__(self, matrix, seed=0):
+        size = len(matrix)
+        n_lists = max(16, int(np.sqrt(size)))
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(size, size=min(size, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+        self.centroids = centroids
+        self.built_size = size
+
+        labels = np.empty(size, dtype=np.int64)
+        for start in range(0, size, 8192):
+            labels[start:start + 8192] = np.argmax(matrix[start:start + 8192] @ centroids.T, axis=1)
+        # Satırlar kümelere göre sıralanınca her küme bitişik bir dilim olur ve
+        # arama sırasında rastgele satır toplamaya (gather) gerek kalmaz
+        self.order = np.argsort(labels, kind='stable')
+        self.bounds = np.searchsorted(labels[self.order], np.arange(n_lists + 1))
+
+    def slices(self, query, probes=IVF_PROBES):
+        """Sorguya en yakın kümelerin (başlangıç, bitiş) dilimlerini döndür"""
+        probes = min(probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return [(int(self.bounds[c]), int(self.bounds[c + 1])) for c in nearest]
+
+
+def make_embedder(model_name=None, dim=DEFAULT_DIM):
+    """Model adı verilmiş ve kütüphane kuruluysa yerel modeli, değilse n-gram gömücüyü döndür"""
+    if model_name and SentenceTransformer is not None:
+        return SentenceEmbedder(model_name)
+    return CharNgramEmbedder(dim)
+
+
+class QuestionIndex:
+    """Doğrulanmış soru → SQL çiftleri üzerinde vektörel yakın-kopya araması"""
+
+    def __init__(self, schema_key, cache_file=CACHE_FILE, threshold=DEFAULT_THRESHOLD, embedder=None):
+        self.pool = get_pool(cache_file)
+        self.schema_key = schema_key
+        self.threshold = threshold
+        self.embedder = embedder or make_embedder()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._questions = []
+        self._sqls = []
+        self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._size = 0
+        self._coarse = None
+        self._load()
+
+    def _load(self):
+        """Geçerli şemaya ait kayıtları yükle, diğer şemalara ait olanları sil"""
+        with self.pool.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_index (
+                    question_key TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (question_key, schema_hash)
+                );
+            """)
+            conn.execute("DELETE FROM question_index WHERE schema_hash != ?", (self.schema_key,))
+            rows = conn.execute(
+                "SELECT question, sql, embedding FROM question_index WHERE schema_hash = ? ORDER BY created_at",
+                (self.schema_key,)
+            ).fetchall()
+
+        row_bytes = self.embedder.dim * 4
+        rows = [r for r in rows if len(r[2]) == row_bytes]  # gömücü değiştiyse eski vektörleri atla
+        if rows:
+            self._matrix = np.frombuffer(b''.join(r[2] for r in rows), dtype=np.float32).reshape(len(rows), -1).copy()
+            self._questions = [r[0] for r in rows]
+            self._sqls = [r[1] for r in rows]
+            self._size = len(rows)
+
+    def _append(self, vector):
+        """Kapasiteyi ikiye katlayarak amortize O(1) ekleme"""
+        if self._size == len(self._matrix):
+            grown = np.zeros((max(64, 2 * len(self._matrix)), self.embedder.dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size] = vector
+        self._size += 1
+
+    def add(self, question, sql):
+        """Başarıyla çalıştırılmış bir soru/SQL çiftini indekse ekle"""
+        key = normalize_question(question)
+        vector = self.embedder.embed([question])[0]
+        with self._lock:
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO question_index "
+                    "(question_key, schema_hash, question, sql, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, self.schema_key, question, sql, vector.tobytes(), time.time())
+                )
+                if cursor.rowcount == 0:
+                    return
+            self._questions.append(question)
+            self._sqls.append(sql)
+            self._append(vector)
+
+    def _maybe_rebuild_coarse(self):
+        """Kaba indeksi eşik aşıldığında ve sonradan eklenen kuyruk büyüdüğünde yeniden kur"""
+        if self._size < IVF_MIN_SIZE:
+            self._coarse = None
+            return
+        if self._coarse is not None and self._size - self._coarse.built_size <= self._coarse.built_size // 8:
+            return
+        coarse = CoarseIndex(self._matrix[:self._size])
+        order = coarse.order
+        self._matrix[:self._size] = self._matrix[order]
+        self._questions = [self._questions[i] for i in order]
+        self._sqls = [self._sqls[i] for i in order]
+        self._coarse = coarse
+
+    def search(self, question, k=5):
+        """En benzer k kaydı (benzerlik, soru, sql) olarak döndür"""
+        query = self.embedder.embed([question])[0]
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return []
+            self._maybe_rebuild_coarse()
+            if self._coarse is not None:
+                # Seçilen kümeler + kaba indeks kurulduktan sonra eklenen kuyruk
+                spans = self._coarse.slices(query) + [(self._coarse.built_size, size)]
+                rows = np.concatenate([np.arange(a, b) for a, b in spans])
+                scores = np.concatenate([self._matrix[a:b] @ query for a, b in spans])
+            else:
+                rows = None
+                scores = self._matrix[:size] @ query
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            ids = top if rows is None else rows[top]
+            return [(float(scores[t]), self._questions[i], self._sqls[i]) for t, i in zip(top, ids)]
+
+    def lookup(self, question):
+        """Eşik üzerindeki ve aynı anlamdaki en iyi eşleşmenin SQL'ini döndür
+
+        Karakter benzerliği tek başına yetmez: "en az satan" ile "en çok satan" ya da "satış
+        miktarı" ile "satış tutarı" eşiğin üzerinde benzer ama farklı sorulardır. Eşleşme için
+        sayılar ve yuva değerleri, içerik sözcükleri ve zıt anlamlı sözcüklerin tarafı aynı olmalıdır.
+        """
+        for score, matched_question, sql in self.search(question, k=5):
+            if score < self.threshold:
+                break
+            if same_meaning(question, matched_question):
+                self.hits += 1
+                return sql
+        self.misses += 1
+        return None
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,133 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# --- Önbellek Ayarları ---
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+_IDENTIFIER_RE = re.compile(r'[a-z_][a-z0-9_]*')
+_READ_PREFIXES = ('select', 'with')
+
+
+def normalize_sql(sql_query):
+    """Önbellek anahtarı için SQL metnindeki boşlukları ve sondaki ';' işaretini sadeleştir"""
+    return re.sub(r'\s+', ' ', sql_query).strip().rstrip(';').strip()
+
+
+def referenced_names(sql_query):
+    """Sorguda geçen tüm tanımlayıcılar; tablo adları bunların bir alt kümesidir"""
+    return frozenset(_IDENTIFIER_RE.findall(sql_query.lower()))
+
+
+class DataVersion:
+    """Veritabanına herhangi bir bağlantının (başka süreçler dahil) commit ettiğini izler
+
+    PRAGMA data_version, aynı bağlantıdaki okumalar arasında başka bir bağlantı commit ettiyse
+    değişir; bu yüzden hiç yazmayan ayrı bir salt okunur bağlantı kullanılır.
+    """
+
+    def __init__(self, db_file):
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(db_file)}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+class ResultCache:
+    """Tablo yazma sürümleriyle geçersiz kılınan, bellek sınırlı DataFrame önbelleği
+
+    bump() bu süreçteki yazmaları tablo bazında bildirir. data_version (ör. DataVersion) verilirse
+    başka süreçlerin ya da bağlantıların yazmaları da görülür: kayıttan sonra veritabanına herhangi
+    bir commit yapıldıysa kayıt geçersizdir (hangi tablonun değiştiği bilinmediğinden tümü).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, data_version=None):
+        self.max_bytes = max_bytes
+        self.data_version = data_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()   # (sql, parametreler) -> (sürüm anlık görüntüsü, veri sürümü, df, bayt)
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _snapshot(self, names):
+        # Hiç yazılmamış adlar 0 sürümündedir; sütun adları hiç artırılmaz
+        return tuple(sorted((name, self._versions.get(name, 0)) for name in names))
+
+    def version(self):
+        """Veritabanının o anki veri sürümü; sorgu çalıştırılmadan önce alınıp put()'a verilir"""
+        return self.data_version() if self.data_version is not None else None
+
+    def get(self, sql_query, params=None):
+        """Sorgunun tablolarına o zamandan beri yazılmadıysa önbellekteki DataFrame'i döndür"""
+        key = (normalize_sql(sql_query), tuple(params or ()))
+        current = self.version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                snapshot, version, df, nbytes = entry
+                if version == current and snapshot == self._snapshot(name for name, _ in snapshot):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return df
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, sql_query, df, params=None, version=None):
+        """Okuma sorgusunun sonucunu kaydet; bellek sınırı aşılırsa en eskileri çıkar
+
+        version, sorgudan önce version() ile alınmalıdır; sorgu ile kayıt arasındaki bir commit
+        sonucu eski verisiyle önbellekte bırakmaz.
+        """
+        sql_key = normalize_sql(sql_query)
+        if not sql_key.lower().startswith(_READ_PREFIXES):
+            return
+        key = (sql_key, tuple(params or ()))
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._snapshot(referenced_names(sql_key)), version, df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def bump(self, *tables):
+        """Tablolara yazıldığını bildir; bu tabloları okuyan sonuçlar geçersiz olur"""
+        with self._lock:
+            for table in tables:
+                key = table.lower()
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """İsabet/ıska, tahliye ve bellek kullanımı istatistikleri"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": self.hits / total if total else 0.0,
+                "versions": dict(self._versions),
+            }
@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+import time
+
+from aggregates import PROMPT_HINT as AGGREGATES_HINT, TABLE_NOTES as AGGREGATE_NOTES
+from llm_backend import QUESTION_MARKER
+from sql_cache import normalize_question, schema_hash
+
+# --- Şema Ayarları ---
+MAX_SAMPLE_VALUES = 20          # bu kadar veya daha az farklı değeri olan metin sütunu kategorik sayılır
+SAMPLE_SCAN_ROWS = 50000        # farklı değerler tablonun yalnızca bu kadar satırında aranır
+SAMPLE_MAX_LENGTH = 24          # bundan uzun örnek değerler prompta eklenmez
+# Daha fazla tabloda şema sistem talimatına gömülmez; her soruya yalnızca ilgili tablolar eklenir
+MAX_FULL_SCHEMA_TABLES = int(os.environ.get("SCHEMA_MAX_FULL_TABLES", "8"))
+SAMPLE_TTL_SECONDS = float(os.environ.get("SCHEMA_SAMPLE_TTL_SECONDS", "300"))
+STEM_LENGTH = 4                 # Türkçe ekler yüzünden sözcükler ilk harfleriyle eşleştirilir
+INSTRUCTIONS = (
+    "SQLite veritabanı için soruyu tek bir SQL sorgusuna çevir. "
+    "Yalnızca SQL döndür; açıklama veya başka metin ekleme."
+)
+TABLE_NOTES = {
+    'products': "ürünler: ad, kategori, fiyat",
+    'sales': "satışlar: ürün, müşteri, tarih, adet, tutar",
+    **AGGREGATE_NOTES,
+}
+_WORD_RE = re.compile(r'\w+')
+
+
+class TableInfo:
+    """Tek bir tablonun sütunları, yabancı anahtarları ve örnek değerleri"""
+
+    def __init__(self, name, columns, foreign_keys, samples, note=None):
+        self.name = name
+        self.columns = columns            # [(ad, tür, birincil anahtar mı)]
+        self.foreign_keys = foreign_keys  # sütun → (tablo, sütun)
+        self.samples = samples            # sütun → değer listesi (tek değer = örnek)
+        self.note = note
+
+    def render(self):
+        """Tabloyu tek satırlık, az token tutan biçimde yaz"""
+        parts = []
+        for name, column_type, pk in self.columns:
+            text = f"{name} {column_type}".rstrip()
+            if pk:
+                text += " PK"
+            if name in self.foreign_keys:
+                text += " → {}.{}".format(*self.foreign_keys[name])
+            values = self.samples.get(name)
+            if values and len(values) == 1:
+                text += f" örn. {values[0]!r}"
+            elif values:
+                text += " ∈ {" + ", ".join(repr(v) for v in values) + "}"
+            parts.append(text)
+        line = f"{self.name}({', '.join(parts)})"
+        return f"{line} -- {self.note}" if self.note else line
+
+    def words(self):
+        """İlgili tablo seçiminde kullanılan ad, sütun, not ve örnek değer sözcükleri"""
+        text = " ".join([self.name, self.note or ''] + [c[0] for c in self.columns]
+                        + [str(v) for values in self.samples.values() for v in values])
+        return _stems(text.replace('_', ' '))
+
+
+def _stems(text):
+    return {word[:STEM_LENGTH] for word in _WORD_RE.findall(normalize_question(text)) if len(word) >= 3}
+
+
+def _samples(conn, table, columns):
+    """Metin sütunlarından kategorik değerler (veya tek bir örnek değer)"""
+    samples = {}
+    scanned = None
+    for name, column_type, pk in columns:
+        if pk or (column_type and 'TEXT' not in column_type.upper()):
+            continue
+        rows = conn.execute(
+            f'SELECT DISTINCT "{name}" FROM (SELECT "{name}" FROM "{table}" LIMIT ?) '
+            f'WHERE "{name}" IS NOT NULL LIMIT ?',
+            (SAMPLE_SCAN_ROWS, MAX_SAMPLE_VALUES + 1)
+        ).fetchall()
+        values = [row[0] for row in rows]
+        if not values or any(len(str(v)) > SAMPLE_MAX_LENGTH for v in values):
+            continue
+        if scanned is None:
+            scanned = conn.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM "{table}" LIMIT ?)', (SAMPLE_SCAN_ROWS,)).fetchone()[0]
+        # Değerler pek tekrar etmiyorsa (ad, tarih) sütun kategorik değildir; yalnızca biçim için bir örnek yeter
+        categorical = len(values) <= MAX_SAMPLE_VALUES and len(values) * 3 <= scanned * 2
+        samples[name] = sorted(values, key=str) if categorical else values[:1]
+    return samples
+
+
+def introspect(conn, notes=None):
+    """sqlite_master, PRAGMA table_info ve foreign_key_list ile tabloları oku"""
+    notes = TABLE_NOTES if notes is None else notes
+    tables = []
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY rowid"
+    )]
+    for name in names:
+        columns = [(row[1], row[2], bool(row[5])) for row in conn.execute(f'PRAGMA table_info("{name}")')]
+        foreign_keys = {row[3]: (row[2], row[4] or 'rowid') for row in conn.execute(f'PRAGMA foreign_key_list("{name}")')}
+        tables.append(TableInfo(name, columns, foreign_keys, _samples(conn, name, columns), notes.get(name)))
+    return tables
+
+
+class SchemaPrompt:
+    """Canlı veritabanından üretilmiş, sıkıştırılmış şema talimatı"""
+
+    def __init__(self, tables, key, max_full_tables=MAX_FULL_SCHEMA_TABLES):
+        self.tables = {table.name: table for table in tables}
+        self.key = key
+        self.full = len(tables) <= max_full_tables
+        self.text = "\n".join(table.render() for table in tables)
+        self.built_at = time.monotonic()
+
+    def _instructions(self):
+        hint = AGGREGATES_HINT if set(AGGREGATE_NOTES) & set(self.tables) else ''
+        return f"{INSTRUCTIONS} {hint}".strip()
+
+    @property
+    def system_instruction(self):
+        """Modelin sistem talimatı; küçük şemalarda şemanın tamamını içerir"""
+        if self.full:
+            return f"{self._instructions()}\n\n{self.text}"
+        return f"{self._instructions()} İlgili tablolar her soruyla birlikte verilir."
+
+    def relevant_tables(self, question):
+        """Soruda geçen sözcüklerle eşleşen tablolar ve onların yabancı anahtarla bağlı olduğu tablolar"""
+        words = _stems(question)
+        selected = [name for name, table in self.tables.items() if words & table.words()]
+        for name in list(selected):
+            for target, _ in self.tables[name].foreign_keys.values():
+                if target in self.tables and target not in selected:
+                    selected.append(target)
+        return selected or list(self.tables)
+
+    def user_prompt(self, question):
+        """Modele gönderilecek metin; büyük şemalarda yalnızca ilgili tablolar eklenir"""
+        if self.full:
+            return question
+        schema = "\n".join(self.tables[name].render() for name in self.relevant_tables(question))
+        return f"{schema}\n\n{QUESTION_MARKER} {question}"
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_schema_prompt(conn, notes=None, max_full_tables=MAX_FULL_SCHEMA_TABLES, sample_ttl=SAMPLE_TTL_SECONDS):
+    """Şema özetine göre önbelleğe alınmış SchemaPrompt döndür
+
+    Anahtar yalnızca yapıdan (sqlite_master) hesaplanır; böylece yeni bir kategori eklenmesi çeviri
+    önbelleğini geçersiz kılmaz. Örnek değerler sample_ttl saniyede bir yeniden okunur.
+    """
+    notes = TABLE_NOTES if notes is None else notes
+    key = schema_hash(f"{INSTRUCTIONS} {AGGREGATES_HINT} {sorted(notes.items())} {max_full_tables}", conn)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached.built_at < sample_ttl:
+        return cached
+    prompt = SchemaPrompt(introspect(conn, notes), key, max_full_tables)
+    with _cache_lock:
+        _cache.clear()
+        _cache[key] = prompt
+    return prompt
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+from db_pool import get_pool
+from sql_params import literal_value, render_literal, scan_literals
+
+# --- Önbellek Ayarları ---
+CACHE_FILE = 'nl_sql_cache.db'
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+# Sorudaki tam sayılar ve çift tırnaklı metinler kalıp yuvasıdır ("en pahalı 3 ürün" → "en pahalı <#> ürün").
+# "1.500" gibi ayraçlı sayılar yuva sayılmaz; anlamı belirsizdir ve kalıbın parçası olarak kalır.
+_QUESTION_SLOT_RE = re.compile(r'"([^"]+)"|(?<![\w.,])(\d+)(?!\w|[.,]\d)')
+
+
+def normalize_question(question):
+    """Soruyu önbellek anahtarı için normalleştir (Türkçe küçük harf, boşluk, noktalama)"""
+    text = question.replace('İ', 'i').replace('I', 'ı').lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip(' ?.!')
+
+
+def question_template(question):
+    """Sorunun kalıbı ve yuva değerleri: ("en pahalı <#> ürünü göster", [3])"""
+    values = []
+
+    def slot(match):
+        if match.group(1) is not None:
+            values.append(match.group(1))
+            return '<">'
+        values.append(int(match.group(2)))
+        return '<#>'
+    return normalize_question(_QUESTION_SLOT_RE.sub(slot, question)), values
+
+
+def _matches(value, kind, text):
+    literal = literal_value(kind, text)
+    if kind == 'string':
+        return literal == str(value)
+    return isinstance(value, int) and literal == value
+
+
+def sql_template(sql, values):
+    """SQL'i sorunun yuvalarına bağlanmış parçalara böl; her değer tam bir SQL sabitine denk gelmiyorsa None
+
+    Parçalar metin ve {"slot": i, "kind": tür} öğelerinden oluşur. Değer birden fazla sabite
+    uyuyorsa (LIMIT 5 ve quantity > 5 gibi) hangisinin yuva olduğu bilinemez; kalıp çıkarılmaz.
+    """
+    literals = scan_literals(sql) if values else None
+    if not literals:
+        return None
+    slots = {}
+    for index, value in enumerate(values):
+        candidates = [item for item in literals if not item[5] and _matches(value, item[0], item[1])]
+        if len(candidates) != 1 or candidates[0][2] in slots:
+            return None
+        kind, _, start, end, _, _ = candidates[0]
+        slots[start] = (end, {"slot": index, "kind": kind})
+    parts, position = [], 0
+    for start in sorted(slots):
+        end, slot = slots[start]
+        parts.extend([sql[position:start], slot])
+        position = end
+    parts.append(sql[position:])
+    return parts
+
+
+def fill_template(parts, values):
+    """sql_template parçalarını yeni sorunun değerleriyle SQL'e çevir"""
+    sql = []
+    for part in parts:
+        if isinstance(part, str):
+            sql.append(part)
+        else:
+            value = values[part["slot"]]
+            sql.append(render_literal(str(value) if part["kind"] == 'string' else value))
+    return "".join(sql)
+
+
+def schema_hash(schema_prompt, conn=None):
+    """Şema metninden (ve varsa canlı veritabanı şemasından) kısa bir özet üret
+
+    Yalnızca tablo ve görünüm tanımları özete girer. İndeks, tetikleyici ve ANALYZE istatistikleri
+    (sqlite_stat1) sorguların anlamını değiştirmez; indeks danışmanı bir indeks eklediğinde
+    önbellekler ve düzeltme deposu silinmesin.
+    """
+    digest = hashlib.sha256(re.sub(r'\s+', ' ', schema_prompt).strip().encode('utf-8'))
+    if conn is not None:
+        rows = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('table', 'view') AND sql IS NOT NULL "
+            "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY type, name"
+        ).fetchall()
+        for row in rows:
+            digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class QueryCache:
+    """Doğal dil → SQL çevirileri için kalıcı, LRU/TTL tahliyeli önbellek
+
+    Tam soru bulunamazsa soru kalıbı denenir: "en pahalı 3 ürün" için kaydedilen SQL'deki
+    LIMIT 3, "en pahalı 5 ürün" sorusunda LIMIT 5 olarak doldurulur; LLM'e gidilmez.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.pool = get_pool(cache_file)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.template_hits = 0
+        self._stats_lock = threading.Lock()
+        with self.pool.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                    question_key TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (question_key, schema_hash)
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_nl_sql_cache_access ON nl_sql_cache (last_access);")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_sql_templates (
+                    shape_key TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql_parts TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (shape_key, schema_hash)
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_nl_sql_templates_access ON nl_sql_templates (last_access);")
+
+    def _count(self, hit, template=False):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+                self.template_hits += template
+            else:
+                self.misses += 1
+
+    def get(self, question, schema_key):
+        """Önbellekteki SQL'i döndür; yoksa veya süresi dolmuşsa None"""
+        key = normalize_question(question)
+        now = time.time()
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT sql, created_at FROM nl_sql_cache WHERE question_key = ? AND schema_hash = ?",
+                (key, schema_key)
+            ).fetchone()
+
+        if row is None:
+            sql = self._get_template(question, schema_key, now)
+            self._count(sql is not None, template=True)
+            return sql
+
+        sql, created_at = row
+        with self.pool.writer() as conn:
+            if now - created_at > self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM nl_sql_cache WHERE question_key = ? AND schema_hash = ?",
+                    (key, schema_key)
+                )
+                sql = None
+            else:
+                conn.execute(
+                    "UPDATE nl_sql_cache SET last_access = ?, hit_count = hit_count + 1 "
+                    "WHERE question_key = ? AND schema_hash = ?",
+                    (now, key, schema_key)
+                )
+        self._count(sql is not None)
+        return sql
+
+    def _get_template(self, question, schema_key, now):
+        """Soru kalıbına kayıtlı SQL'i bu sorunun değerleriyle doldur; kalıp yoksa None"""
+        shape, values = question_template(question)
+        if not values:
+            return None
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT sql_parts, created_at FROM nl_sql_templates WHERE shape_key = ? AND schema_hash = ?",
+                (shape, schema_key)
+            ).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            return None
+        with self.pool.writer() as conn:
+            conn.execute(
+                "UPDATE nl_sql_templates SET last_access = ?, hit_count = hit_count + 1 "
+                "WHERE shape_key = ? AND schema_hash = ?",
+                (now, shape, schema_key)
+            )
+        return fill_template(json.loads(row[0]), values)
+
+    def put(self, question, schema_key, sql):
+        """Çeviriyi ve bağlanabiliyorsa soru kalıbını kaydet; kapasite aşıldıysa en eski kullanılanları sil"""
+        now = time.time()
+        shape, values = question_template(question)
+        parts = sql_template(sql, values)
+        with self.pool.writer() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO nl_sql_cache "
+                "(question_key, schema_hash, question, sql, created_at, last_access, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (normalize_question(question), schema_key, question, sql, now, now)
+            )
+            conn.execute(
+                "DELETE FROM nl_sql_cache WHERE rowid IN ("
+                "SELECT rowid FROM nl_sql_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            if parts is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO nl_sql_templates "
+                    "(shape_key, schema_hash, question, sql_parts, created_at, last_access, hit_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (shape, schema_key, question, json.dumps(parts, ensure_ascii=False), now, now)
+                )
+                conn.execute(
+                    "DELETE FROM nl_sql_templates WHERE rowid IN ("
+                    "SELECT rowid FROM nl_sql_templates ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def discard(self, question, schema_key):
+        """Hatalı olduğu anlaşılan bir çeviriyi (ve SQL'i üretmiş olabilecek soru kalıbını) önbellekten çıkar"""
+        with self.pool.writer() as conn:
+            conn.execute(
+                "DELETE FROM nl_sql_cache WHERE question_key = ? AND schema_hash = ?",
+                (normalize_question(question), schema_key)
+            )
+            conn.execute(
+                "DELETE FROM nl_sql_templates WHERE shape_key = ? AND schema_hash = ?",
+                (question_template(question)[0], schema_key)
+            )
+
+    def set_schema(self, schema_key):
+        """Geçerli şemaya ait olmayan ve süresi dolmuş kayıtları temizle"""
+        with self.pool.writer() as conn:
+            removed = 0
+            for table in ('nl_sql_cache', 'nl_sql_templates'):
+                cursor = conn.execute(
+                    f"DELETE FROM {table} WHERE schema_hash != ? OR created_at < ?",
+                    (schema_key, time.time() - self.ttl_seconds)
+                )
+                removed += cursor.rowcount
+            return removed
+
+    def stats(self):
+        """İsabet/ıska sayaçlarını ve kayıt sayısını döndür"""
+        with self.pool.reader() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM nl_sql_cache").fetchone()[0]
+            templates = conn.execute("SELECT COUNT(*) FROM nl_sql_templates").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "templates": templates,
+            "template_hits": self.template_hits,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from metrics import REGISTRY
+
+# --- Parametreleştirme Ayarları ---
+PARAMETERIZE = os.environ.get("SQL_PARAMETERIZE", "1").lower() not in ('0', 'false', 'off')
+# Yalnızca bu cümlelerdeki sabitler parametreye çevrilir. SELECT listesindeki sabitler sütun adını
+# belirler, ORDER BY / GROUP BY'daki sayılar sütun sırasıdır; ikisi de sorgunun biçimine aittir.
+PARAMETER_CLAUSES = {'where', 'having', 'on', 'limit', 'offset'}
+# Tarih işlevlerinin biçim ve değiştirici metinleri ('%Y-%m', '-30 days') sorgunun biçimine aittir
+FORMAT_FUNCTIONS = {'strftime', 'date', 'time', 'datetime', 'julianday', 'unixepoch'}
+MAX_TRACKED_SHAPES = 4096
+# Sabitleri çıkarılmış sorgu biçimi başına hangi sabitin parametre olacağı bir kez hesaplanır
+PARAMETERIZE_CACHE_SIZE = 1024
+_CLAUSE_KEYWORDS = {
+    'select': 'select', 'from': 'from', 'where': 'where', 'group': 'group', 'order': 'order', 'having': 'having',
+    'limit': 'limit', 'offset': 'offset', 'on': 'on', 'join': 'from', 'using': 'from', 'window': 'window',
+    'union': 'select', 'except': 'select', 'intersect': 'select', 'values': 'values',
+}
+# Sözcük ayırıcı: parçaların birleşimi sorgunun kendisidir; tür ilk karakterden anlaşılır
+_TOKEN_RE = re.compile(r"""
+      --[^\n]*|/\*.*?(?:\*/|$)                           # yorum
+    | [xX]'[0-9A-Fa-f]*'                                 # blob
+    | '(?:[^']|'')*'                                     # dizgi
+    | "(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]                   # tırnaklı ad
+    | [^\W\d]\w*                                         # sözcük
+    | 0[xX][0-9A-Fa-f]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?   # sayı
+    | \?\d*|[:@$][^\W\d]\w*                                # parametre
+    | [^'"`\[\w?:@$\-/.()]+                               # boşluk ve işleçler
+    | .
+""", re.S | re.X)
+# Hızlı yol: yalnızca sabitleri bulur (1. grup). Yorum, tırnaklı ad ve blob içlerindeki sayı/tırnak
+# sabit sayılmasın diye eşleşir ama grup boş kalır. Baştaki ileri bakış, sabit başlatamayacak
+# karakterlerde diğer seçenekleri denemeden geçer; tam sözcük ayırıcıdan birkaç kat hızlıdır.
+_LITERAL_RE = re.compile(r"""
+    (?=[-/"`\['\d.xX])
+    (?: --[^\n]*|/\*.*?(?:\*/|$)
+      | "(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]
+      | (?<!\w)[xX]'[0-9A-Fa-f]*'
+      | ( '(?:[^']|'')*'
+        | (?<![\w.])(?:0[xX][0-9A-Fa-f]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?) ) )
+""", re.S | re.X)
+
+# result: new (ilk kez görülen sorgu biçimi) ya da reused (hazırlanmış ifadesi yeniden kullanılabilen biçim)
+STATEMENT_SHAPES = REGISTRY.counter(
+    'texttosql_statement_shapes_total', 'Parametreleştirilmiş sorgu biçimleri', ('result',))
+
+
+def literal_value(kind, text):
+    """SQL sabitinin Python değeri: sayı → int/float, dizgi → str"""
+    if kind == 'string':
+        return text[1:-1].replace("''", "'")
+    if text[:2].lower() == '0x':
+        return int(text, 16)
+    if text.isdigit():
+        return int(text)
+    return float(text)
+
+
+def render_literal(value):
+    """Python değerini SQL sabiti olarak yaz"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def scan_literals(sql_query):
+    """Sorgudaki sayı ve dizgi sabitleri: (tür, metin, başlangıç, bitiş, cümle, biçim metni mi) listesi
+
+    Cümle, sabitin bulunduğu parantez düzeyindeki son cümle anahtar sözcüğüdür (where, limit, select...).
+    Parantez, dıştaki cümleyi devralır; alt sorgu kendi SELECT'iyle yeni cümle başlatır. Sorguda
+    zaten parametre varsa None döndürülür.
+    """
+    literals = []
+    stack = [(None, False)]            # parantez düzeyi başına (cümle, tarih işlevi argümanı mı)
+    previous_word = None
+    end = 0
+    for token in _TOKEN_RE.findall(sql_query):
+        start, end = end, end + len(token)
+        first = token[0]
+        if first.isalpha() or first == '_':
+            if token[1:2] == "'":
+                previous_word = None   # blob
+                continue
+            lowered = token.lower()
+            clause = _CLAUSE_KEYWORDS.get(lowered)
+            if clause is not None:
+                stack[-1] = (clause, stack[-1][1])
+            previous_word = lowered
+        elif first == "'" or first.isdigit() or (first == '.' and len(token) > 1):
+            clause, in_format = stack[-1]
+            literals.append(('string' if first == "'" else 'number', token, start, end, clause, in_format))
+            previous_word = None
+        elif first == '(':
+            clause, in_format = stack[-1]
+            stack.append((clause, in_format or previous_word in FORMAT_FUNCTIONS))
+            previous_word = None
+        elif first == ')':
+            if len(stack) > 1:
+                stack.pop()
+            previous_word = None
+        elif first == '?' or (first in ':@$' and len(token) > 1):
+            return None
+        elif token.isspace() or token.startswith(('--', '/*')):
+            continue                   # işlev adı ile parantez arasında boşluk olabilir
+        else:
+            previous_word = None
+    return literals
+
+
+@lru_cache(maxsize=PARAMETERIZE_CACHE_SIZE)
+def _parameter_slots(shape):
+    """Sabitleri NUL karakteriyle değiştirilmiş biçimde her sabit parametre mi; sorgu parametreliyse None"""
+    parts = shape.split('\x00')
+    literals = scan_literals('0'.join(parts))
+    if literals is None:
+        return None
+    by_start = {start: clause in PARAMETER_CLAUSES and not in_format
+                for _, _, start, _, clause, in_format in literals}
+    slots, position = [], 0
+    for part in parts[:-1]:
+        position += len(part)
+        slots.append(by_start.get(position, False))
+        position += 1
+    return tuple(slots)
+
+
+@lru_cache(maxsize=PARAMETERIZE_CACHE_SIZE)
+def parameterize(sql_query):
+    """WHERE/HAVING/ON/LIMIT/OFFSET sabitlerini '?' parametresine çevir; (sql, parametreler) döndür
+
+    Yalnızca sabitleri farklı sorgular aynı SQL metnine iner; sqlite3'ün bağlantı başına ifade
+    önbelleği bu metinle hazırlanmış ifadeyi yeniden kullanır, sorgu her seferinde derlenmez.
+    Cümle çözümlemesi biçim başına bir kez yapılır; aynı biçimdeki sonraki sorgularda yalnızca
+    sabitler bulunur. Parametreye çevrilecek sabit yoksa parametreler boş demettir; sorgu zaten
+    parametre içeriyorsa (sql, None) döner.
+    """
+    parts, literals, position = [], [], 0
+    for match in _LITERAL_RE.finditer(sql_query):
+        literal = match.group(1)
+        if literal is not None:
+            parts.append(sql_query[position:match.start()])
+            literals.append(literal)
+            position = match.end()
+    parts.append(sql_query[position:])
+    slots = _parameter_slots('\x00'.join(parts))
+    if slots is None:
+        return sql_query, None
+    text, params = [parts[0]], []
+    for literal, slot, part in zip(literals, slots, parts[1:]):
+        if slot:
+            text.append('?')
+            params.append(literal_value('string' if literal[0] == "'" else 'number', literal))
+        else:
+            text.append(literal)
+        text.append(part)
+    return "".join(text), tuple(params)
+
+
+def fingerprint(sql_query):
+    """Parametreleştirilmiş sorgunun biçim özeti; ifade önbelleği metne bağlı olduğundan yalnızca boşluk yok sayılır"""
+    return hashlib.sha1(" ".join(sql_query.split()).encode('utf-8')).hexdigest()[:12]
+
+
+class ShapeTracker:
+    """Görülen sorgu biçimlerini (özetlerini) sınırlı LRU kümesinde izler"""
+
+    def __init__(self, max_shapes=MAX_TRACKED_SHAPES):
+        self.max_shapes = max_shapes
+        self._shapes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, sql_query):
+        """Biçimi kaydet; özetini döndür"""
+        key = fingerprint(sql_query)
+        with self._lock:
+            reused = key in self._shapes
+            self._shapes[key] = self._shapes.get(key, 0) + 1
+            self._shapes.move_to_end(key)
+            if len(self._shapes) > self.max_shapes:
+                self._shapes.popitem(last=False)
+        STATEMENT_SHAPES.inc(result='reused' if reused else 'new')
+        return key
+
+    def stats(self):
+        new, reused = STATEMENT_SHAPES.value(result='new'), STATEMENT_SHAPES.value(result='reused')
+        return {"shapes": len(self._shapes), "new": new, "reused": reused,
+                "reuse_rate": reused / (new + reused) if new + reused else 0.0}
+
+
+SHAPES = ShapeTracker()
+
+
+def bind(sql_query, params=None, record=True):
+    """Çalıştırmadan önce: parametre verilmemişse sabitleri parametreye çevir ve biçimi kaydet"""
+    if params is not None or not PARAMETERIZE:
+        return sql_query, params
+    sql_query, params = parameterize(sql_query)
+    if record:
+        SHAPES.record(sql_query)
+    return sql_query, params
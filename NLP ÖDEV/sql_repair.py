@@ -0,0 +1,254 @@
+import difflib
+import json
+import os
+import re
+import sqlite3
+import time
+
+from db_pool import get_pool
+from llm_client import generate_text, strip_code_fences
+from metrics import REGISTRY, track
+from query_guard import QueryTimeout
+from result_cache import normalize_sql
+from sql_cache import CACHE_FILE
+
+# --- Onarım Ayarları ---
+MAX_REPAIR_ATTEMPTS = int(os.environ.get("REPAIR_MAX_ATTEMPTS", "2"))
+# Düzeltme bundan fazla sözcüğü değiştiriyorsa başka sorgulara kalıp olarak uygulanmaz
+MAX_PATTERN_TOKENS = 3
+DEFAULT_MAX_FIXES = 5000
+# Yalnızca modelin düzeltebileceği derleme/anlam hataları onarılır; kilit, disk veya süre hataları onarılmaz
+_REPAIRABLE_RE = re.compile(
+    r'no such (?:column|table|function)|syntax error|ambiguous column|misuse of|wrong number of arguments'
+    r'|incomplete input|unrecognized token|term out of range|does not match any column'
+    r'|do not have the same number of result columns|GROUP BY clause is required', re.I)
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|\w+|\S")
+REPAIR_PROMPT = (
+    "Aşağıdaki SQLite sorgusu hata verdi. Yalnızca düzeltilmiş tek SQL sorgusunu döndür.\n"
+    "Hata: {error}\n{tables}SQL:\n{sql}"
+)
+
+# source: store (aynı hata, kayıtlı düzeltme), pattern (aynı hata kalıbı), llm
+REPAIRS = REGISTRY.counter('texttosql_sql_repairs_total', 'Otomatik düzeltilen SQL sorguları', ('source',))
+
+
+def repairable_error(error):
+    """Onarılabilir SQLite hata iletisi; zaman aşımı, maliyet/güvenlik reddi ve diğer hatalar için None
+
+    pandas ve query_guard sqlite3 hatasını sarar; asıl hata __cause__ zincirinde aranır.
+    """
+    if isinstance(error, QueryTimeout):
+        return None
+    while error is not None:
+        if isinstance(error, sqlite3.Error):
+            message = str(error)
+            return message if _REPAIRABLE_RE.search(message) else None
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def _error_key(message):
+    return re.sub(r'\s+', ' ', message).strip().lower()
+
+
+def _tokens(sql_query):
+    """(sözcük, başlangıç, bitiş) listesi; dizgi sabitleri tek sözcüktür"""
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(sql_query)]
+
+
+def derive_pattern(broken_sql, fixed_sql, error):
+    """Düzeltmeyi [eski sözcükler, yeni metin] değişimlerine indir; genellenemiyorsa None
+
+    Değişen sözcük sayısı küçük olmalı ve değiştirilen her parça hata iletisinde geçmelidir
+    (ör. "no such column: nope" için nope → product_name); böylece kalıp yalnızca aynı hatayı
+    veren sorgulara ve hatanın işaret ettiği yere uygulanır.
+    """
+    old, new = _tokens(broken_sql), _tokens(fixed_sql)
+    old_words, new_words = [t[0] for t in old], [t[0] for t in new]
+    lowered = error.lower()
+    replacements = []
+    changed = 0
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes():
+        if op == 'equal':
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        if op != 'replace' or changed > MAX_PATTERN_TOKENS:
+            return None
+        if not any(word.lower() in lowered for word in old_words[i1:i2]):
+            return None
+        replacements.append([old_words[i1:i2], fixed_sql[new[j1][1]:new[j2 - 1][2]]])
+    return replacements or None
+
+
+def apply_pattern(sql_query, replacements):
+    """Değişimleri sorgudaki tüm eşleşen sözcük dizilerine uygula; hiçbiri eşleşmezse None"""
+    applied = False
+    for old_words, new_text in replacements:
+        tokens = _tokens(sql_query)
+        words = [t[0] for t in tokens]
+        parts, position, i = [], 0, 0
+        while i < len(tokens):
+            if words[i:i + len(old_words)] == old_words:
+                parts.append(sql_query[position:tokens[i][1]] + new_text)
+                position = tokens[i + len(old_words) - 1][2]
+                i += len(old_words)
+                applied = True
+            else:
+                i += 1
+        sql_query = "".join(parts) + sql_query[position:]
+    return sql_query if applied else None
+
+
+class FixStore:
+    """Hatalı SQL + hata → çalışan SQL çiftlerini ve bunlardan çıkarılan kalıpları tutan kalıcı depo
+
+    Aynı sorgu aynı hatayı tekrar verdiğinde kayıtlı düzeltme, farklı bir sorgu aynı hatayı
+    verdiğinde kalıp denenir; ikisi de LLM çağrısı gerektirmez.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, max_entries=DEFAULT_MAX_FIXES):
+        self.pool = get_pool(cache_file)
+        self.max_entries = max_entries
+        with self.pool.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sql_fixes (
+                    sql_key TEXT NOT NULL,
+                    error_key TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    fixed_sql TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (sql_key, error_key, schema_hash)
+                );
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sql_fix_patterns (
+                    error_key TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    replacements TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (error_key, schema_hash)
+                );
+            """)
+
+    def lookup(self, sql_query, error, schema_key):
+        """(düzeltilmiş SQL, 'store' | 'pattern') ya da (None, None)"""
+        sql_key, error_key = normalize_sql(sql_query), _error_key(error)
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT fixed_sql FROM sql_fixes WHERE sql_key = ? AND error_key = ? AND schema_hash = ?",
+                (sql_key, error_key, schema_key)
+            ).fetchone()
+            pattern = None if row else conn.execute(
+                "SELECT replacements FROM sql_fix_patterns WHERE error_key = ? AND schema_hash = ?",
+                (error_key, schema_key)
+            ).fetchone()
+        if row is not None:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    "UPDATE sql_fixes SET hit_count = hit_count + 1 WHERE sql_key = ? AND error_key = ? AND schema_hash = ?",
+                    (sql_key, error_key, schema_key)
+                )
+            return row[0], 'store'
+        if pattern is not None:
+            fixed_sql = apply_pattern(sql_query, json.loads(pattern[0]))
+            if fixed_sql is not None:
+                with self.pool.writer() as conn:
+                    conn.execute(
+                        "UPDATE sql_fix_patterns SET hit_count = hit_count + 1 WHERE error_key = ? AND schema_hash = ?",
+                        (error_key, schema_key)
+                    )
+                return fixed_sql, 'pattern'
+        return None, None
+
+    def record(self, broken_sql, error, fixed_sql, schema_key):
+        """Çalıştığı doğrulanmış düzeltmeyi (ve genellenebiliyorsa kalıbını) kaydet"""
+        now = time.time()
+        error_key = _error_key(error)
+        replacements = derive_pattern(broken_sql, fixed_sql, error)
+        with self.pool.writer() as conn:
+            # Kayıt yeniden kullanıldıktan sonra tekrar yazılır; isabet sayısı korunur
+            conn.execute(
+                "INSERT INTO sql_fixes (sql_key, error_key, schema_hash, fixed_sql, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sql_key, error_key, schema_hash) DO UPDATE SET "
+                "fixed_sql = excluded.fixed_sql, created_at = excluded.created_at",
+                (normalize_sql(broken_sql), error_key, schema_key, fixed_sql, now)
+            )
+            if replacements:
+                conn.execute(
+                    "INSERT INTO sql_fix_patterns (error_key, schema_hash, replacements, created_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (error_key, schema_hash) DO UPDATE SET "
+                    "replacements = excluded.replacements, created_at = excluded.created_at",
+                    (error_key, schema_key, json.dumps(replacements), now)
+                )
+            conn.execute(
+                "DELETE FROM sql_fixes WHERE rowid IN ("
+                "SELECT rowid FROM sql_fixes ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def set_schema(self, schema_key):
+        """Geçerli şemaya ait olmayan düzeltmeleri temizle"""
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM sql_fixes WHERE schema_hash != ?", (schema_key,))
+            conn.execute("DELETE FROM sql_fix_patterns WHERE schema_hash != ?", (schema_key,))
+
+    def stats(self):
+        """Kayıt sayıları ve LLM'e gidilmeden yapılan onarımlar (kazanılan LLM çağrıları)"""
+        with self.pool.reader() as conn:
+            fixes = conn.execute("SELECT COUNT(*) FROM sql_fixes").fetchone()[0]
+            patterns = conn.execute("SELECT COUNT(*) FROM sql_fix_patterns").fetchone()[0]
+            reused = conn.execute(
+                "SELECT (SELECT COALESCE(SUM(hit_count), 0) FROM sql_fixes) "
+                "+ (SELECT COALESCE(SUM(hit_count), 0) FROM sql_fix_patterns)"
+            ).fetchone()[0]
+        return {
+            "fixes": fixes,
+            "patterns": patterns,
+            "llm_repairs": REPAIRS.value(source='llm'),
+            # Bu süreçte ve depo oluşturulduğundan beri LLM'e gidilmeden yapılan onarımlar
+            "saved_llm_calls": REPAIRS.value(source='store') + REPAIRS.value(source='pattern'),
+            "saved_llm_calls_total": reused,
+        }
+
+
+def repair_prompt(sql_query, error, schema=None):
+    """Kısa düzeltme istemi: hata ve SQL; büyük şemalarda yalnızca sorguda geçen tablolar eklenir"""
+    tables = ""
+    if schema is not None and not schema.full:
+        tables = "Tablolar:\n" + "\n".join(schema.tables[name].render() for name in schema.relevant_tables(sql_query)) + "\n"
+    return REPAIR_PROMPT.format(error=error, tables=tables, sql=sql_query)
+
+
+def execute_with_repair(execute, sql_query, model, schema_key, store, schema=None, max_attempts=MAX_REPAIR_ATTEMPTS):
+    """execute(sql)'i çalıştır; onarılabilir hata olursa önce depodaki düzeltmeyi/kalıbı, sonra LLM'i dene
+
+    (execute sonucu, çalışan SQL, denemeler) döndürür; denemeler [(hatalı sql, hata, kaynak)] listesidir.
+    max_attempts düzeltme denemesinden sonra (veya hata onarılamazsa) son hata fırlatılır.
+    """
+    attempts = []
+    current = sql_query
+    while True:
+        try:
+            result = execute(current)
+            break
+        except Exception as e:
+            error = repairable_error(e)
+            if error is None or len(attempts) >= max_attempts:
+                raise
+            fixed_sql, source = store.lookup(current, error, schema_key)
+            if fixed_sql is None or normalize_sql(fixed_sql) == normalize_sql(current):
+                if model is None:
+                    raise
+                with track("repair"):
+                    fixed_sql = strip_code_fences(generate_text(model, repair_prompt(current, error, schema)))
+                source = 'llm'
+            if not fixed_sql or normalize_sql(fixed_sql) == normalize_sql(current):
+                raise
+            attempts.append((current, error, source))
+            current = fixed_sql
+    for broken_sql, error, source in attempts:
+        REPAIRS.inc(source=source)
+        store.record(broken_sql, error, current, schema_key)
+    return result, current, attempts
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# --- Başlangıç Kıyaslaması Ayarları ---
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REPEATS = 3
+DEFAULT_QUESTION = "En pahalı 3 ürünü göster"
+# CLI demosunda ilk sonuç tablosundan hemen önce yazılan satırlar
+RESULT_MARKERS = ("SQL Sorgu Sonuçları", "Sonuçlar:")
+# İçe aktarma sırasında yüklenmemesi gereken ağır modüller
+HEAVY_MODULES = ('pandas', 'google.generativeai', 'pyarrow', 'duckdb')
+REGRESSION_THRESHOLD = 0.10
+CHILD_TIMEOUT_SECONDS = 180
+
+# Her ölçüm yeni bir yorumlayıcıda yapılır; son satır JSON sonuçtur, öncesi içe aktarmanın çıktısıdır
+_IMPORT_CHILD = """
+import json, os, sys, time
+before = set(os.listdir('.'))
+started = time.perf_counter()
+import text_to_sql_app
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "loaded": [m for m in %r if m in sys.modules],
+                  "new_files": sorted(set(os.listdir('.')) - before)}))
+"""
+_WEB_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=%d)
+at.run()
+first_run = time.perf_counter() - started
+first_answer = None
+if sys.argv[2]:
+    at.text_area(key="ai_query").input(sys.argv[2])
+    next(b for b in at.button if 'SQL' in b.label).click()
+    at.run()
+    first_answer = time.perf_counter() - started
+print(json.dumps({"first_run": first_run, "first_answer": first_answer,
+                  "errors": [str(e.value) for e in list(at.exception) + list(at.error)]}))
+"""
+
+
+def _environment(backend):
+    env = dict(os.environ, LLM_BACKEND=backend, PYTHONUNBUFFERED='1')
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [HERE, env.get("PYTHONPATH")]))
+    return env
+
+
+def _workdir(db_file):
+    """Her ölçüm için veritabanı kopyası içeren boş klasör; önbellek dosyaları ölçümler arasında taşınmaz"""
+    path = tempfile.mkdtemp(prefix="startup_")
+    if db_file and os.path.exists(db_file):
+        shutil.copy(db_file, os.path.join(path, 'sales.db'))
+    return path
+
+
+def _run_child(code, workdir, env, *args):
+    completed = subprocess.run([sys.executable, "-c", code, *args], cwd=workdir, env=env, capture_output=True,
+                               text=True, encoding='utf-8', timeout=CHILD_TIMEOUT_SECONDS)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"Alt süreç başarısız ({completed.returncode}): {completed.stderr.strip()[-500:]}")
+    return json.loads(lines[-1]), lines[:-1]
+
+
+def measure_cli_import(db_file, backend):
+    """import text_to_sql_app süresi ve yan etkileri (ekrana yazma, dosya oluşturma, ağır modüller)"""
+    workdir = _workdir(db_file)
+    try:
+        result, printed = _run_child(_IMPORT_CHILD % (HEAVY_MODULES,), workdir, _environment(backend))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"seconds": result["seconds"], "printed_lines": len(printed), "new_files": result["new_files"],
+            "heavy_modules": result["loaded"]}
+
+
+def measure_cli_first_result(db_file, backend):
+    """Süreç başlangıcından demo sorusunun sonuç tablosuna ve sürecin bitişine kadar geçen süre"""
+    workdir = _workdir(db_file)
+    started = time.perf_counter()
+    first_result = None
+    try:
+        process = subprocess.Popen([sys.executable, os.path.join(HERE, 'text_to_sql_app.py')], cwd=workdir,
+                                   env=_environment(backend), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True, encoding='utf-8')
+        for line in process.stdout:
+            if first_result is None and line.strip().startswith(RESULT_MARKERS):
+                first_result = time.perf_counter() - started
+        returncode = process.wait(CHILD_TIMEOUT_SECONDS)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if returncode != 0 or first_result is None:
+        raise RuntimeError(f"CLI demosu sonuç üretmedi (çıkış kodu {returncode}).")
+    return {"first_result": first_result, "exit": time.perf_counter() - started}
+
+
+def measure_web(db_file, backend, question=DEFAULT_QUESTION):
+    """Streamlit uygulamasının ilk çizimi ve (question verilirse) ilk sorunun yanıtı (AppTest ile, tarayıcısız)"""
+    workdir = _workdir(db_file)
+    try:
+        result, _ = _run_child(_WEB_CHILD % CHILD_TIMEOUT_SECONDS, workdir, _environment(backend),
+                               os.path.join(HERE, 'text_to_sql_web.py'), question or '')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result["errors"]:
+        raise RuntimeError(f"Web uygulaması hata verdi: {result['errors'][0]}")
+    return {name: seconds for name, seconds in result.items() if name != "errors" and seconds is not None}
+
+
+def _summary(samples):
+    values = [value * 1000 for value in samples]
+    return {"min_ms": round(min(values), 1), "median_ms": round(statistics.median(values), 1),
+            "max_ms": round(max(values), 1)}
+
+
+def benchmark(db_file, backend, repeats=DEFAULT_REPEATS, include_web=True):
+    """Her giriş noktasını repeats kez yeni süreçte ölç; ölçüm adı → min/medyan/maks ms
+
+    Gerçek bir LLM arka ucuyla soru yanıtlamak ağ gerektirdiği için yalnızca mock'ta ilk yanıt ölçülür;
+    diğer arka uçlarda içe aktarma ve ilk çizim (model kurulumu dahil) ölçülür.
+    """
+    offline = backend == 'mock'
+    samples = {}
+    checks = {}
+    for _ in range(repeats):
+        result = measure_cli_import(db_file, backend)
+        samples.setdefault("cli_import", []).append(result.pop("seconds"))
+        checks = result
+        if offline:
+            for name, seconds in measure_cli_first_result(db_file, backend).items():
+                samples.setdefault(f"cli_{name}", []).append(seconds)
+        if include_web:
+            for name, seconds in measure_web(db_file, backend, DEFAULT_QUESTION if offline else None).items():
+                samples.setdefault(f"web_{name}", []).append(seconds)
+    return {name: _summary(values) for name, values in samples.items()}, checks
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Medyanı baz çizgisine göre threshold oranından fazla kötüleşen ölçümleri listele"""
+    regressions = []
+    for name, item in current["timings"].items():
+        old = baseline.get("timings", {}).get(name)
+        if old is None or not old["median_ms"]:
+            continue
+        before, after = old["median_ms"], item["median_ms"]
+        if (after - before) / before > threshold:
+            regressions.append({"measure": name, "before_median_ms": before, "after_median_ms": after,
+                                "change": round((after - before) / before, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CLI ve web giriş noktalarının soğuk başlangıç sürelerini ölç")
+    parser.add_argument("--db", default=os.path.join(HERE, 'sales.db'), help="Her ölçümde kopyalanan veritabanı")
+    parser.add_argument("--backend", default='mock', help="LLM arka ucu (mock ağ gerektirmez)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Her ölçümün tekrar sayısı")
+    parser.add_argument("--no-web", action="store_true", help="Streamlit ölçümlerini atla")
+    parser.add_argument("--output", help="JSON sonucun yazılacağı dosya (varsayılan: stdout)")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON sonuç; gerileme varsa çıkış kodu 1")
+    args = parser.parse_args(argv)
+
+    include_web = not args.no_web
+    if include_web:
+        try:
+            import streamlit.testing.v1  # noqa: F401
+        except ImportError:
+            print("streamlit kurulu değil; web ölçümleri atlanıyor.", file=sys.stderr)
+            include_web = False
+
+    try:
+        timings, checks = benchmark(args.db, args.backend, args.repeats, include_web)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"HATA: {e}", file=sys.stderr)
+        return 1
+    for name, item in timings.items():
+        print(f"  {name:18s} medyan {item['median_ms']:8.1f} ms  (min {item['min_ms']:.1f}, maks {item['max_ms']:.1f})",
+              file=sys.stderr)
+    if checks["printed_lines"] or checks["new_files"] or checks["heavy_modules"]:
+        print(f"UYARI: içe aktarmanın yan etkileri var: {checks}", file=sys.stderr)
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "repeats": args.repeats,
+        "import_side_effects": checks,
+        "timings": timings,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report["regressions"] = compare(report, json.load(f))
+        for r in report["regressions"]:
+            print(f"GERİLEME: {r['measure']} medyan {r['before_median_ms']} → {r['after_median_ms']} ms", file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import io
+import tempfile
+
+# Parquet dışa aktarımı isteğe bağlıdır; pyarrow kurulu değilse yalnızca CSV sunulur
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# --- Akış Ayarları ---
+# Sorgular burada çalıştırılmaz; parçalar korumalı query_guard.iter_query'den gelir
+PREVIEW_ROWS = 1000
+PARQUET_AVAILABLE = pa is not None
+
+
+def iter_csv_bytes(chunks, encoding='utf-8'):
+    """DataFrame parçalarını başlığı yalnızca bir kez yazarak CSV baytlarına dönüştür"""
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode(encoding)
+        header = False
+
+
+class _ByteSink(io.RawIOBase):
+    """Yazılan baytları biriktirip boşaltılabilen, konumu kendisi izleyen hedef"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet_bytes(chunks):
+    """DataFrame parçalarını tek bir Parquet dosyasının ardışık baytları olarak üret"""
+    if pa is None:
+        raise RuntimeError("Parquet dışa aktarımı için pyarrow kurulu olmalıdır.")
+    sink = _ByteSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                # Tamamı NULL olan bir parçada sütun tipi farklı çıkarılabilir
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def spool_to_file(byte_chunks):
+    """Bayt akışını diske yazılan geçici bir dosyaya aktar ve başa sarılmış dosyayı döndür"""
+    spool = tempfile.TemporaryFile()
+    for data in byte_chunks:
+        spool.write(data)
+    spool.seek(0)
+    return spool
@@ -1,7 +1,27 @@
+import argparse
 import os
 import sqlite3
-import pandas as pd
-import google.generativeai as genai
+import sys
+import threading
+
+import batch_runner
+import columnar
+from aggregates import install as install_aggregates
+from db_pool import get_pool
+from index_advisor import WorkloadRecorder
+from intent_matcher import FAST_PATH_ENABLED, IntentMatcher
+from llm_backend import DEFAULT_BACKEND, get_model
+from llm_client import generate_text, get_client, stream_sql, strip_code_fences
+from metrics import METRICS_FILE, track, watch_cache, write_textfile
+from query_guard import MAX_ROWS, QueryRejected, QueryTimeout
+from question_index import DEFAULT_THRESHOLD, QuestionIndex
+from schema_info import get_schema_prompt
+from sql_cache import QueryCache
+from sql_repair import FixStore, execute_with_repair
+from warmup import WarmUp, preload_modules
+
+# Modülü içe aktarmak yan etki üretmez (ekrana yazma, veritabanı, model kurulumu yok);
+# kurulum initialize() ile ilk kullanımda ya da main() içinde arka planda yapılır.
 
 # --- 1. API Anahtarını Yapılandırma ---
 API_KEY = os.environ.get("GOOGLE_API_KEY")
@@ -9,178 +29,315 @@ API_KEY = os.environ.get("GOOGLE_API_KEY")
 # API anahtarını burada doğrudan ayarlayabilirsiniz:
 # API_KEY = "YOUR_ACTUAL_API_KEY"
 
+# LLM_BACKEND=mock ile Gemini yerine ağ gerektirmeyen yerel SQL üretici kullanılır
+LLM_BACKEND = os.environ.get("LLM_BACKEND", DEFAULT_BACKEND).lower()
+MODEL_NAME = 'gemini-1.5-flash'
+
 API_CONFIGURED = False
-if not API_KEY:
-    print("HATA: GOOGLE_API_KEY ortam değişkeni bulunamadı.")
-    print("Lütfen API anahtarınızı ayarlayın:")
-    print("  Windows: set GOOGLE_API_KEY=your_api_key")
-    print("  Veya kodda API_KEY değişkenine doğrudan yazın.")
-else:
-    genai.configure(api_key=API_KEY)
-    print("Google Generative AI API başarıyla yapılandırıldı.")
-    API_CONFIGURED = True
+
+def check_api_configuration():
+    """API anahtarı durumunu yazdır; LLM kullanılabiliyorsa True döndür"""
+    if LLM_BACKEND == 'mock':
+        print("Yerel (mock) LLM arka ucu kullanılıyor; API anahtarı gerekmez.")
+        return True
+    if not API_KEY:
+        print("HATA: GOOGLE_API_KEY ortam değişkeni bulunamadı.")
+        print("Lütfen API anahtarınızı ayarlayın:")
+        print("  Windows: set GOOGLE_API_KEY=your_api_key")
+        print("  Veya kodda API_KEY değişkenine doğrudan yazın.")
+        return False
+    print("Google Generative AI API anahtarı bulundu.")
+    return True
 
 # --- 2. SQLite Veritabanı ve Örnek Veri Oluşturma ---
 DB_FILE = 'sales.db'
+# Havuz bağlantıları ilk kullanımda açar
+db_pool = get_pool(DB_FILE)
+# Çalıştırılan sorgular indeks danışmanı (index_advisor.py) için kaydedilir
+workload = None
 
 def create_and_populate_database():
-    conn = None
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        # Tabloları oluştur
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_name TEXT NOT NULL,
-                category TEXT,
-                price REAL NOT NULL
-            );
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sales (
-                sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                customer_id INTEGER NOT NULL,
-                sale_date TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                total_amount REAL NOT NULL,
-                FOREIGN KEY (product_id) REFERENCES products(product_id)
-            );
-        """)
-        print("Tablolar 'products' ve 'sales' oluşturuldu veya zaten mevcut.")
-
-        # Ürün verilerini ekle
-        cursor.execute("SELECT COUNT(*) FROM products;")
-        if cursor.fetchone()[0] == 0:
-            products_data = [
-                ('Laptop', 'Electronics', 1200.00),
-                ('Mouse', 'Electronics', 25.00),
-                ('Keyboard', 'Electronics', 75.00),
-                ('Monitor', 'Electronics', 300.00),
-                ('Desk Chair', 'Furniture', 150.00),
-                ('Coffee Mug', 'Kitchenware', 10.00),
-                ('Notebook', 'Stationery', 5.00),
-                ('Pen Set', 'Stationery', 12.00)
-            ]
-            cursor.executemany(
-                "INSERT INTO products (product_name, category, price) VALUES (?, ?, ?)",
-                products_data
-            )
-            print("Örnek ürün verileri eklendi.")
-
-        # Satış verilerini ekle
-        cursor.execute("SELECT COUNT(*) FROM sales;")
-        if cursor.fetchone()[0] == 0:
-            sales_data = [
-                (1, 101, '2024-06-15', 1, 1200.00),
-                (2, 102, '2024-06-16', 2, 50.00),
-                (1, 103, '2024-07-01', 1, 1200.00),
-                (3, 101, '2024-07-02', 1, 75.00),
-                (4, 104, '2024-07-05', 1, 300.00),
-                (5, 105, '2024-07-08', 1, 150.00),
-                (6, 102, '2024-07-10', 3, 30.00),
-                (7, 101, '2024-07-12', 5, 25.00),
-                (8, 103, '2024-08-01', 1, 12.00),
-                (1, 104, '2024-08-03', 1, 1200.00),
-                (2, 105, '2024-08-05', 1, 25.00)
-            ]
-            cursor.executemany(
-                "INSERT INTO sales (product_id, customer_id, sale_date, quantity, total_amount) VALUES (?, ?, ?, ?, ?)",
-                sales_data
-            )
-            print("Örnek satış verileri eklendi.")
-
-        conn.commit()
+        with db_pool.writer() as conn:
+            _create_and_populate(conn)
         print("Veritabanı işlemleri tamamlandı.")
     except sqlite3.Error as e:
         print(f"Veritabanı hatası: {e}")
-    finally:
-        if conn:
-            conn.close()
 
-create_and_populate_database()
+def _create_and_populate(conn):
+    cursor = conn.cursor()
+
+    # Tabloları oluştur
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_name TEXT NOT NULL,
+            category TEXT,
+            price REAL NOT NULL
+        );
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales (
+            sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            customer_id INTEGER NOT NULL,
+            sale_date TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        );
+    """)
+    print("Tablolar 'products' ve 'sales' oluşturuldu veya zaten mevcut.")
+
+    # Ürün verilerini ekle
+    cursor.execute("SELECT COUNT(*) FROM products;")
+    if cursor.fetchone()[0] == 0:
+        products_data = [
+            ('Laptop', 'Electronics', 1200.00),
+            ('Mouse', 'Electronics', 25.00),
+            ('Keyboard', 'Electronics', 75.00),
+            ('Monitor', 'Electronics', 300.00),
+            ('Desk Chair', 'Furniture', 150.00),
+            ('Coffee Mug', 'Kitchenware', 10.00),
+            ('Notebook', 'Stationery', 5.00),
+            ('Pen Set', 'Stationery', 12.00)
+        ]
+        cursor.executemany(
+            "INSERT INTO products (product_name, category, price) VALUES (?, ?, ?)",
+            products_data
+        )
+        print("Örnek ürün verileri eklendi.")
+
+    # Satış verilerini ekle
+    cursor.execute("SELECT COUNT(*) FROM sales;")
+    if cursor.fetchone()[0] == 0:
+        sales_data = [
+            (1, 101, '2024-06-15', 1, 1200.00),
+            (2, 102, '2024-06-16', 2, 50.00),
+            (1, 103, '2024-07-01', 1, 1200.00),
+            (3, 101, '2024-07-02', 1, 75.00),
+            (4, 104, '2024-07-05', 1, 300.00),
+            (5, 105, '2024-07-08', 1, 150.00),
+            (6, 102, '2024-07-10', 3, 30.00),
+            (7, 101, '2024-07-12', 5, 25.00),
+            (8, 103, '2024-08-01', 1, 12.00),
+            (1, 104, '2024-08-03', 1, 1200.00),
+            (2, 105, '2024-08-05', 1, 25.00)
+        ]
+        cursor.executemany(
+            "INSERT INTO sales (product_id, customer_id, sale_date, quantity, total_amount) VALUES (?, ?, ?, ?, ?)",
+            sales_data
+        )
+        print("Örnek satış verileri eklendi.")
+
+    # Sık sorulan toplamlar için tetikleyicilerle güncel tutulan özet tabloları (aggregates.py)
+    if install_aggregates(conn):
+        print("Özet tabloları oluşturuldu.")
 
 # --- 3. LLM için Veritabanı Şeması Tanıtımı (System Prompt) ---
-schema_prompt = """
-Aşağıdaki SQLite veritabanı şemasına göre SQL sorguları oluşturmanız istenmektedir:
-
-TABLE products (
-    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_name TEXT NOT NULL,
-    category TEXT,
-    price REAL NOT NULL
-);
-
-TABLE sales (
-    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_id INTEGER NOT NULL,
-    customer_id INTEGER NOT NULL,
-    sale_date TEXT NOT NULL,
-    quantity INTEGER NOT NULL,
-    total_amount REAL NOT NULL,
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
-);
-
-Yalnızca verilen şemaya uygun SQL sorguları oluşturun. Açıklama veya başka bir metin eklemeyin.
-Sadece SQL sorgusunu döndürün.
-"""
-
-# --- 4. Generative Model'i Başlatma ---
+# Şema canlı veritabanından okunur (schema_info.py); tablolar, yabancı anahtarlar ve kategorik
+# değerler az token tutan tek satırlık biçimde yazılır
+schema = None
+schema_prompt = None
+SCHEMA_HASH = None
+
+# --- 4. Generative Model ve Önbellekler ---
 model = None
-if API_CONFIGURED:
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash', system_instruction=schema_prompt)
-        print("Generative Model 'gemini-1.5-flash' başlatıldı.")
-    except Exception as e:
-        print(f"Model başlatılırken hata: {e}")
-else:
-    print("API anahtarı bulunamadığı için Generative Model başlatılamadı.")
+# Doğal dil → SQL önbelleği; şema değiştiyse eski kayıtlar temizlenir
+query_cache = None
+# Hatalı SQL → çalışan SQL düzeltmeleri; aynı hata tekrarlanınca LLM'e gidilmez (sql_repair.py)
+fix_store = None
+# Benzer (yeniden ifade edilmiş) sorular için doğrulanmış SQL indeksi
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", DEFAULT_THRESHOLD))
+question_index = None
+# Sık soru biçimleri için LLM'siz hızlı yol (intent_matcher.py); FAST_PATH=0 ile kapatılır
+fast_path = None
+
+_initialized = False
+_init_lock = threading.Lock()
+
+def initialize():
+    """Veritabanını, şema talimatını, modeli ve önbellekleri bir kez hazırla
+
+    Birden çok iş parçacığından çağrılabilir; kurulum sürerken gelen çağrılar onu bekler.
+    """
+    global API_CONFIGURED, workload, schema, schema_prompt, SCHEMA_HASH, model, query_cache, fix_store, question_index
+    global fast_path
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        API_CONFIGURED = check_api_configuration()
+        workload = WorkloadRecorder()
+        create_and_populate_database()
+
+        with db_pool.reader() as conn:
+            schema = get_schema_prompt(conn)
+        schema_prompt = schema.system_instruction
+
+        if API_CONFIGURED:
+            try:
+                model = get_model(LLM_BACKEND, API_KEY, MODEL_NAME, system_instruction=schema_prompt)
+                print(f"Generative Model '{model.model_name}' başlatıldı.")
+            except Exception as e:
+                print(f"Model başlatılırken hata: {e}")
+        else:
+            print("API anahtarı bulunamadığı için Generative Model başlatılamadı.")
+
+        query_cache = QueryCache()
+        SCHEMA_HASH = schema.key
+        query_cache.set_schema(SCHEMA_HASH)
+        watch_cache("sql", query_cache)
+        fix_store = FixStore()
+        fix_store.set_schema(SCHEMA_HASH)
+        question_index = QuestionIndex(SCHEMA_HASH, threshold=NEAR_DUPLICATE_THRESHOLD)
+        if FAST_PATH_ENABLED:
+            fast_path = IntentMatcher(db_pool)
+        _initialized = True
 
 # --- 5. Doğal Dilden SQL'e Çevirme Fonksiyonu Geliştirme ---
-def get_sql_query(user_query):
-    if model is None:
-        print("Hata: Model başlatılamadı.")
-        return None
-    try:
-        response = model.generate_content(user_query)
-        sql_response_text = response.text.strip()
+def translate_question(user_query, on_text=None):
+    """Soruyu SQL'e çevir; on_text verilirse yanıt akıtılır ve SQL geldikçe bildirilir. Hata durumunda istisna fırlatır"""
+    initialize()
+    with track("nl_to_sql"):
+        matched = fast_path.match(user_query) if fast_path is not None else None
+        if matched is not None:
+            return matched.sql
 
-        # Markdown kod bloğu işaretlerini kaldır
-        if sql_response_text.startswith('```sql'):
-            sql_response_text = sql_response_text[6:]
-        elif sql_response_text.startswith('```sqlite'):
-            sql_response_text = sql_response_text[9:]
-        elif sql_response_text.startswith('```'):
-            sql_response_text = sql_response_text[3:]
+        cached_sql = query_cache.get(user_query, SCHEMA_HASH)
+        if cached_sql is not None:
+            return cached_sql
 
-        if sql_response_text.endswith('```'):
-            sql_response_text = sql_response_text[:-3]
+        # Benzer sorudan alınan SQL tam eşleşme önbelleğine yazılmaz; yanlış eşleşme kalıcı olmasın
+        similar_sql = question_index.lookup(user_query)
+        if similar_sql is not None:
+            return similar_sql
 
-        return sql_response_text.strip()
+        if on_text is None:
+            # Aynı anda gelen aynı sorular tek bir API çağrısında birleştirilir
+            sql_query = strip_code_fences(generate_text(model, schema.user_prompt(user_query)))
+        else:
+            sql_query = stream_sql(model, schema.user_prompt(user_query), on_text)
+        if sql_query:
+            query_cache.put(user_query, SCHEMA_HASH, sql_query)
+        return sql_query
 
+def get_sql_query(user_query, on_text=None):
+    initialize()
+    if model is None:
+        print("Hata: Model başlatılamadı.")
+        return None
+    try:
+        return translate_question(user_query, on_text)
     except Exception as e:
         print(f"SQL sorgusu oluşturulurken hata: {e}")
         return None
 
 # --- 6. SQL Sorgusunu Çalıştırma ve Sonuçları Gösterme ---
+def run_sql(sql_query, max_rows=MAX_ROWS):
+    """Sorguyu korumalı çalıştır; (DataFrame, kesildi mi) döndürür, hata durumunda istisna fırlatır"""
+    initialize()
+    workload.record(sql_query)
+    # Salt okunur bağlantı, maliyet denetimi, LIMIT ve süre bütçesi (query_guard.py);
+    # COLUMNAR_ENGINE=duckdb ise doğrulanmış analiz sorguları sütunlu kopyada çalışır (columnar.py)
+    with track("execute"):
+        return columnar.run_query(db_pool, sql_query, max_rows=max_rows)
+
+def run_repaired_sql(sql_query, max_rows=MAX_ROWS, verbose=True):
+    """run_sql gibi; onarılabilir SQLite hatasında sorgu düzeltilip yeniden denenir
+
+    (DataFrame, kesildi mi, çalışan SQL) döndürür; düzeltilemezse son hata fırlatılır.
+    Toplu modda çıktı stdout olabileceği için düzeltmeler yazdırılmaz (kayıtta repaired_from olur).
+    """
+    initialize()
+    (df, truncated), executed_sql, attempts = execute_with_repair(
+        lambda sql: run_sql(sql, max_rows), sql_query, model, SCHEMA_HASH, fix_store, schema
+    )
+    for broken_sql, error, source in attempts if verbose else ():
+        print(f"Sorgu otomatik düzeltildi ({source}): {error}")
+    return df, truncated, executed_sql
+
 def execute_sql_query(sql_query):
-    conn = None
     try:
-        conn = sqlite3.connect(DB_FILE)
-        df = pd.read_sql_query(sql_query, conn)
+        df, truncated = run_sql(sql_query)
+        if truncated:
+            print(f"Uyarı: Sonuç ilk {len(df)} satırla sınırlandı.")
         return df
+    except (QueryRejected, QueryTimeout) as e:
+        print(f"Sorgu engellendi: {e}")
+        return None
     except Exception as e:
         print(f"SQL sorgusu yürütülürken hata: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
-# --- 7. Örnek Sorgu ve Demo ---
-if __name__ == "__main__":
+# --- 7. Toplu Çalıştırma (--batch) ---
+def run_batch_mode(args):
+    """Dosyadaki soruları sınırlı paralellikle çevir, çalıştır ve sırayla çıktıya yaz"""
+    initialize()
+    if model is None:
+        print("Hata: Model başlatılamadı.")
+        return 1
+    # Sütunlu kopya sorular çevrilirken arka planda yüklenmeye başlar
+    columnar.get_mirror(DB_FILE)
+
+    def remember(record):
+        # Başarılı çeviriler benzer sorular için indekse girer; hatalı SQL önbellekte kalmaz
+        if record["error"] is None:
+            if record.get("repaired_from"):
+                query_cache.put(record["question"], SCHEMA_HASH, record["sql"])
+            question_index.add(record["question"], record["sql"])
+        elif record["sql"]:
+            query_cache.discard(record["question"], SCHEMA_HASH)
+
+    try:
+        stats = batch_runner.run(
+            args.batch, args.output, translate_question, lambda sql: run_repaired_sql(sql, args.max_rows, verbose=False),
+            output_format=args.format, concurrency=args.concurrency, retries=args.retries, on_result=remember,
+        )
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Toplu çalıştırma hatası: {e}")
+        return 1
+    llm_stats = get_client(model).stats()
+    cache_stats = query_cache.stats()
+    print(f"{stats['questions']} soru {stats['seconds']:.2f} sn'de işlendi ({stats['questions_per_sec']} soru/sn): "
+          f"{stats['succeeded']} başarılı, {stats['failed']} hatalı, {stats['retried']} yeniden denendi, "
+          f"{stats['rows']:,} satır → {args.output}")
+    print(f"LLM: {llm_stats['calls']} çağrı, {llm_stats['coalesced']} birleştirilen, {llm_stats['retries']} yeniden deneme · "
+          f"SQL önbelleği isabet oranı: {cache_stats['hit_rate']:.0%} ({cache_stats['template_hits']} kalıptan)")
+    print(f"Motor: {columnar.ENGINE_QUERIES.value(engine='duckdb')} DuckDB, "
+          f"{columnar.ENGINE_QUERIES.value(engine='sqlite')} SQLite sorgusu")
+    if fast_path is not None:
+        fast_stats = fast_path.stats()
+        print(f"Hızlı yol: {fast_stats['hits']} soru LLM'siz yanıtlandı (isabet oranı {fast_stats['hit_rate']:.0%})")
+    fix_stats = fix_store.stats()
+    print(f"Onarım: {fix_stats['llm_repairs']} modelle, {fix_stats['saved_llm_calls']} yerel düzeltmeyle "
+          f"({fix_stats['saved_llm_calls']} LLM çağrısı kazanıldı)")
+    if METRICS_FILE:
+        write_textfile(METRICS_FILE)
+    return 0 if stats["failed"] == 0 else 2
+
+# --- 8. Örnek Sorgu ve Demo ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Doğal dil sorularını SQL'e çevir ve çalıştır")
+    parser.add_argument("--batch", metavar="DOSYA", help="Soruları JSONL dosyasından ('-' ise stdin) toplu işle")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Toplu sonuç dosyası (.jsonl, .csv, .parquet)")
+    parser.add_argument("--format", choices=batch_runner.FORMATS, help="Çıktı biçimi (varsayılan: uzantıdan)")
+    parser.add_argument("--concurrency", type=int, default=batch_runner.DEFAULT_CONCURRENCY, help="Aynı anda işlenen soru sayısı")
+    parser.add_argument("--retries", type=int, default=batch_runner.DEFAULT_RETRIES, help="Hatalı soru başına yeniden deneme")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS, help="Soru başına en fazla sonuç satırı")
+    cli_args = parser.parse_args(argv)
+
+    # Kurulum (veritabanı, şema, model) ve pandas'ın yüklenmesi aynı anda arka planda başlar
+    warm_up = WarmUp()
+    warm_up.start("modules", preload_modules)
+    warm_up.start("initialize", initialize)
+    if cli_args.batch:
+        return run_batch_mode(cli_args)
+    warm_up.wait("initialize")
+
     print("\n--- Text-to-SQL Demo Başlıyor ---\n")
 
     if not API_CONFIGURED:
@@ -202,15 +359,50 @@ if __name__ == "__main__":
         user_natural_language_query = 'Geçen ay en çok satış yapan 5 ürünü listele'
         print(f"Doğal Dil Sorgusu: {user_natural_language_query}")
 
-        generated_sql_query = get_sql_query(user_natural_language_query)
+        print("\nOluşturulan SQL Sorgusu:")
+        shown = {"sql": ""}
+
+        def show_partial(sql):
+            # Yalnızca yeni gelen kısım yazılır; önceki metin değiştiyse sorgu baştan yazılır
+            previous = shown["sql"]
+            print(sql[len(previous):] if sql.startswith(previous) else f"\n{sql}", end="", flush=True)
+            shown["sql"] = sql
+
+        generated_sql_query = get_sql_query(user_natural_language_query, on_text=show_partial)
 
         if generated_sql_query:
-            print(f"\nOluşturulan SQL Sorgusu:\n{generated_sql_query}\n")
-            results_df = execute_sql_query(generated_sql_query)
+            if generated_sql_query != shown["sql"]:
+                # Önbellekten geldi (akış olmadı) ya da son hali akan metinden farklı
+                print(("\n" if shown["sql"] else "") + generated_sql_query, end="")
+            print("\n")
+            try:
+                results_df, truncated, executed_sql = run_repaired_sql(generated_sql_query)
+            except (QueryRejected, QueryTimeout) as e:
+                print(f"Sorgu engellendi: {e}")
+                results_df = None
+            except Exception as e:
+                print(f"SQL sorgusu yürütülürken hata: {e}")
+                results_df = None
             if results_df is not None:
+                if executed_sql != generated_sql_query:
+                    print(f"Düzeltilmiş SQL Sorgusu:\n{executed_sql}\n")
+                    query_cache.put(user_natural_language_query, SCHEMA_HASH, executed_sql)
+                if truncated:
+                    print(f"Uyarı: Sonuç ilk {len(results_df)} satırla sınırlandı.")
                 print("SQL Sorgu Sonuçları:")
                 print(results_df)
+                question_index.add(user_natural_language_query, executed_sql)
+            else:
+                query_cache.discard(user_natural_language_query, SCHEMA_HASH)
         else:
             print("SQL sorgusu oluşturulamadı.")
 
-    print("\n--- Text-to-SQL Demo Tamamlandı ---")
\ No newline at end of file
+    if METRICS_FILE:
+        write_textfile(METRICS_FILE)
+        print(f"Metrikler yazıldı: {METRICS_FILE}")
+
+    print("\n--- Text-to-SQL Demo Tamamlandı ---")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
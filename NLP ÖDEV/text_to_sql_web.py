@@ -1,8 +1,36 @@
 import os
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import streamlit as st
-import google.generativeai as genai
+
+from aggregates import affected_tables, install as install_aggregates
+import columnar
+import crud
+from bulk_import import DEFAULT_BATCH_SIZE, import_file
+from db_pool import get_pool
+from index_advisor import WorkloadRecorder, apply as apply_indexes, create_index_sql, propose as propose_indexes
+from intent_matcher import FAST_PATH_ENABLED, IntentMatcher
+from llm_backend import BACKENDS, DEFAULT_BACKEND, get_model, peek_model
+from llm_client import get_client, stream_sql
+from metrics import (
+    CRUD_SECONDS, ERRORS, LLM_TOKENS, METRICS_PORT, STAGE_SECONDS, recent_errors, render as render_metrics,
+    start_http_server, track, watch_cache
+)
+from query_guard import (
+    EXPORT_MAX_ROWS, EXPORT_TIMEOUT_SECONDS, QueryRejected, QueryTimeout, iter_query, validate as validate_query
+)
+from question_index import DEFAULT_THRESHOLD, QuestionIndex
+from result_cache import DataVersion, ResultCache
+from streaming import (
+    PARQUET_AVAILABLE, PREVIEW_ROWS, iter_csv_bytes, iter_parquet_bytes, spool_to_file
+)
+from schema_info import get_schema_prompt
+from sql_cache import QueryCache
+from sql_params import SHAPES
+from sql_repair import FixStore, execute_with_repair, repairable_error
+from warmup import WarmUp, open_connections
+from write_queue import WRITE_QUEUE_ENABLED, get_write_queue
 
 # --- Sayfa Yapılandırması ---
 st.set_page_config(
@@ -48,11 +76,21 @@ st.markdown("""
 
 # --- Veritabanı Ayarları ---
 DB_FILE = 'sales.db'
+db_pool = get_pool(DB_FILE)
+MODEL_NAME = 'gemini-2.0-flash'
 
 @st.cache_resource
 def init_database():
     """Veritabanını oluştur ve örnek verilerle doldur"""
-    conn = sqlite3.connect(DB_FILE)
+    with db_pool.writer() as conn:
+        _create_and_populate(conn)
+    # Şema değiştiyse önbellekteki eski çeviriler ve SQL düzeltmeleri geçersizdir
+    get_query_cache().set_schema(get_schema_hash())
+    get_fix_store().set_schema(get_schema_hash())
+    return True
+
+def _create_and_populate(conn):
+    """Tabloları oluştur ve boşsa örnek verileri ekle"""
     cursor = conn.cursor()
     
     # Tabloları oluştur
@@ -116,86 +154,184 @@ def init_database():
             sales_data
         )
     
-    conn.commit()
-    conn.close()
-    return True
+    # Sık sorulan toplamlar için tetikleyicilerle güncel tutulan özet tabloları
+    install_aggregates(conn)
+
+# --- LLM için Veritabanı Şeması (System Prompt) ---
+def get_schema():
+    """Canlı veritabanından üretilen, şema özetine göre önbelleklenen şema talimatı (schema_info.py)"""
+    with db_pool.reader() as conn:
+        return get_schema_prompt(conn)
+
+@st.cache_resource
+def get_query_cache():
+    """Doğal dil → SQL önbelleğini başlat"""
+    query_cache = QueryCache()
+    watch_cache("sql", query_cache)
+    return query_cache
 
 @st.cache_resource
-def init_model(api_key):
-    """Gemini modelini başlat"""
-    schema_prompt = """
-    Aşağıdaki SQLite veritabanı şemasına göre SQL sorguları oluşturmanız istenmektedir:
-
-    TABLE products (
-        product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_name TEXT NOT NULL,
-        category TEXT,
-        price REAL NOT NULL
-    );
-
-    TABLE sales (
-        sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id INTEGER NOT NULL,
-        customer_id INTEGER NOT NULL,
-        sale_date TEXT NOT NULL,
-        quantity INTEGER NOT NULL,
-        total_amount REAL NOT NULL,
-        FOREIGN KEY (product_id) REFERENCES products(product_id)
-    );
-
-    Yalnızca verilen şemaya uygun SQL sorguları oluşturun. Açıklama veya başka bir metin eklemeyin.
-    Sadece SQL sorgusunu döndürün.
+def get_fix_store():
+    """Hatalı SQL → çalışan SQL düzeltmelerinin kalıcı deposunu başlat"""
+    return FixStore()
+
+@st.cache_resource
+def get_question_index(schema_key):
+    """Şemaya özel, benzer sorular için doğrulanmış SQL indeksini yükle"""
+    threshold = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", DEFAULT_THRESHOLD))
+    return QuestionIndex(schema_key, threshold=threshold)
+
+@st.cache_resource
+def get_intent_matcher(schema_key):
+    """Sık soru biçimleri için LLM'siz hızlı yol; niyetler bu şemada derlenenlerle sınırlıdır"""
+    return IntentMatcher(db_pool)
+
+def get_schema_hash():
+    """Canlı veritabanı şemasından önbellek anahtarı üret"""
+    return get_schema().key
+
+def init_model(api_key, backend=DEFAULT_BACKEND, system_instruction=None):
+    """Seçilen LLM arka ucunu (Gemini veya yerel mock) döndür; şema talimatı değişirse yeniden kurulur
+
+    Model süreç genelinde önbelleklenir (llm_backend.get_model); arka plan ısınması sürüyorsa onu bekler.
     """
-    
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash', system_instruction=schema_prompt)
-    return model
+    return get_model(backend, api_key, MODEL_NAME, system_instruction=system_instruction)
+
+@st.cache_resource
+def get_warmup():
+    """Başlangıçta bağlantıları arka planda açar; modeller warm_model ile eklenir"""
+    warm_up = WarmUp()
+    warm_up.start("connections", open_connections, db_pool)
+    return warm_up
 
-def get_sql_query(model, user_query):
-    """Doğal dilden SQL sorgusu oluştur"""
+@st.cache_resource
+def warm_model(api_key, backend, system_instruction):
+    """Modeli ilk sorudan önce arka planda kur; anahtar, arka uç ve talimat başına bir kez çalışır"""
+    get_warmup().start("model", get_model, backend, api_key, MODEL_NAME, system_instruction=system_instruction)
+    return True
+
+@st.cache_resource
+def get_validation_executor():
+    """Model yanıtı akarken tamamlanan SQL ifadesini doğrulayan iş parçacıkları"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="validate")
+
+def get_sql_query(model, user_query, on_text=None, on_statement=None):
+    """Doğal dilden SQL sorgusu oluştur; yanıt akarken SQL on_text ile, ilk tam ifade on_statement ile bildirilir"""
     try:
-        response = model.generate_content(user_query)
-        sql_response_text = response.text.strip()
-        
-        # Markdown kod bloğu işaretlerini kaldır
-        if sql_response_text.startswith('```sql'):
-            sql_response_text = sql_response_text[6:]
-        elif sql_response_text.startswith('```sqlite'):
-            sql_response_text = sql_response_text[9:]
-        elif sql_response_text.startswith('```'):
-            sql_response_text = sql_response_text[3:]
-        
-        if sql_response_text.endswith('```'):
-            sql_response_text = sql_response_text[:-3]
-        
-        return sql_response_text.strip()
+        with track("nl_to_sql"):
+            query_cache = get_query_cache()
+            schema = get_schema()
+            schema_key = schema.key
+            if FAST_PATH_ENABLED:
+                matched = get_intent_matcher(schema_key).match(user_query)
+                if matched is not None:
+                    return matched.sql
+
+            cached_sql = query_cache.get(user_query, schema_key)
+            if cached_sql is not None:
+                return cached_sql
+
+            # Benzer sorudan alınan SQL tam eşleşme önbelleğine yazılmaz; yanlış eşleşme kalıcı olmasın
+            similar_sql = get_question_index(schema_key).lookup(user_query)
+            if similar_sql is not None:
+                return similar_sql
+
+            # Yanıt akıtılır; kod bloğu kapanınca modelin eklediği açıklama beklenmez
+            sql_query = stream_sql(model, schema.user_prompt(user_query), on_text, on_statement)
+            if sql_query:
+                query_cache.put(user_query, schema_key, sql_query)
+            return sql_query
     except Exception as e:
         st.error(f"SQL sorgusu oluşturulurken hata: {e}")
         return None
 
-def execute_sql_query(sql_query):
+@st.cache_resource
+def get_result_cache():
+    """Tablo sürümleriyle ve başka süreçlerin (API, toplu içe aktarma, CLI) commit'leriyle geçersiz kılınan sonuç önbelleği"""
+    result_cache = ResultCache(data_version=DataVersion(DB_FILE))
+    watch_cache("result", result_cache)
+    return result_cache
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """METRICS_PORT ayarlıysa Prometheus /metrics uç noktasını bir kez başlat"""
+    if METRICS_PORT:
+        return start_http_server(METRICS_PORT)
+    return None
+
+@st.cache_resource
+def get_workload():
+    """İndeks danışmanı için çalıştırılan sorguların kaydını başlat"""
+    return WorkloadRecorder()
+
+def execute_sql_query(sql_query, params=None):
     """SQL sorgusunu çalıştır"""
+    get_workload().record(sql_query, params)
+    result_cache = get_result_cache()
+    cached_df = result_cache.get(sql_query, params)
+    if cached_df is not None:
+        return cached_df
+    version = result_cache.version()
     try:
-        conn = sqlite3.connect(DB_FILE)
-        df = pd.read_sql_query(sql_query, conn)
-        conn.close()
+        with track("execute"), db_pool.reader() as conn:
+            df = pd.read_sql_query(sql_query, conn, params=params)
+        result_cache.put(sql_query, df, params, version)
         return df
     except Exception as e:
         st.error(f"SQL sorgusu yürütülürken hata: {e}")
         return None
 
+def execute_sql_preview(sql_query, model=None):
+    """LLM'in ürettiği sorgunun yalnızca ilk sayfasını korumalı çalıştır; (DataFrame, devamı var mı, çalışan SQL) döndürür
+
+    SQLite derleme hatasında sorgu önce yerel düzeltme deposuyla, gerekirse modelle düzeltilir (sql_repair.py).
+    """
+    def run(sql):
+        # COLUMNAR_ENGINE=duckdb ise doğrulanmış analiz sorguları sütunlu kopyada, diğerleri SQLite'ta çalışır
+        with track("execute"):
+            return columnar.run_query(db_pool, sql, max_rows=PREVIEW_ROWS)
+
+    try:
+        schema = get_schema()
+        (df, has_more), executed_sql, attempts = execute_with_repair(
+            run, sql_query, model, schema.key, get_fix_store(), schema
+        )
+    except (QueryRejected, QueryTimeout) as e:
+        st.error(f"🛡️ Sorgu engellendi: {e}")
+        return None, False, sql_query
+    except Exception as e:
+        st.error(f"SQL sorgusu yürütülürken hata: {e}")
+        return None, False, sql_query
+    # İndeks danışmanı kullanıcıların gerçekten sorduğu sorguları da görsün
+    get_workload().record(executed_sql)
+    if attempts:
+        sources = {'store': 'kayıtlı düzeltme', 'pattern': 'hata kalıbı', 'llm': 'model'}
+        st.info(f"🩹 Sorgu otomatik düzeltildi ({', '.join(sources[source] for _, _, source in attempts)}). "
+                f"İlk hata: {attempts[0][1]}")
+    return df, has_more, executed_sql
+
+def _timed_export(serialize, sql_query):
+    def export():
+        with track("serialize"):
+            chunks = iter_query(db_pool, sql_query, max_rows=EXPORT_MAX_ROWS, timeout=EXPORT_TIMEOUT_SECONDS)
+            return spool_to_file(serialize(chunks))
+    return export
+
+def export_csv(sql_query):
+    """İndirme anında sonucu parça parça CSV olarak diske akıt"""
+    return _timed_export(iter_csv_bytes, sql_query)
+
+def export_parquet(sql_query):
+    """İndirme anında sonucu parça parça Parquet olarak diske akıt"""
+    return _timed_export(iter_parquet_bytes, sql_query)
+
 # --- CRUD İşlemleri ---
+# SQL ve süre ölçümü crud.py'de (HTTP API ile ortak); burada hata gösterilir ve sonuç önbelleği geçersiz kılınır
 def add_product(product_name, category, price):
     """Yeni ürün ekle"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO products (product_name, category, price) VALUES (?, ?, ?)",
-            (product_name, category, price)
-        )
-        conn.commit()
-        conn.close()
+        crud.add_product(db_pool, product_name, category, price)
+        get_result_cache().bump(*affected_tables("products"))
         return True
     except Exception as e:
         st.error(f"Ürün eklenirken hata: {e}")
@@ -204,14 +340,8 @@ def add_product(product_name, category, price):
 def update_product(product_id, product_name, category, price):
     """Ürün güncelle"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE products SET product_name = ?, category = ?, price = ? WHERE product_id = ?",
-            (product_name, category, price, product_id)
-        )
-        conn.commit()
-        conn.close()
+        crud.update_product(db_pool, product_id, product_name, category, price)
+        get_result_cache().bump(*affected_tables("products"))
         return True
     except Exception as e:
         st.error(f"Ürün güncellenirken hata: {e}")
@@ -220,11 +350,8 @@ def update_product(product_id, product_name, category, price):
 def delete_product(product_id):
     """Ürün sil"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
-        conn.commit()
-        conn.close()
+        crud.delete_product(db_pool, product_id)
+        get_result_cache().bump(*affected_tables("products"))
         return True
     except Exception as e:
         st.error(f"Ürün silinirken hata: {e}")
@@ -233,14 +360,8 @@ def delete_product(product_id):
 def add_sale(product_id, customer_id, sale_date, quantity, total_amount):
     """Yeni satış ekle"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO sales (product_id, customer_id, sale_date, quantity, total_amount) VALUES (?, ?, ?, ?, ?)",
-            (product_id, customer_id, sale_date, quantity, total_amount)
-        )
-        conn.commit()
-        conn.close()
+        crud.add_sale(db_pool, product_id, customer_id, sale_date, quantity, total_amount)
+        get_result_cache().bump(*affected_tables("sales"))
         return True
     except Exception as e:
         st.error(f"Satış eklenirken hata: {e}")
@@ -249,14 +370,8 @@ def add_sale(product_id, customer_id, sale_date, quantity, total_amount):
 def update_sale(sale_id, product_id, customer_id, sale_date, quantity, total_amount):
     """Satış güncelle"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE sales SET product_id = ?, customer_id = ?, sale_date = ?, quantity = ?, total_amount = ? WHERE sale_id = ?",
-            (product_id, customer_id, sale_date, quantity, total_amount, sale_id)
-        )
-        conn.commit()
-        conn.close()
+        crud.update_sale(db_pool, sale_id, product_id, customer_id, sale_date, quantity, total_amount)
+        get_result_cache().bump(*affected_tables("sales"))
         return True
     except Exception as e:
         st.error(f"Satış güncellenirken hata: {e}")
@@ -265,11 +380,8 @@ def update_sale(sale_id, product_id, customer_id, sale_date, quantity, total_amo
 def delete_sale(sale_id):
     """Satış sil"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sales WHERE sale_id = ?", (sale_id,))
-        conn.commit()
-        conn.close()
+        crud.delete_sale(db_pool, sale_id)
+        get_result_cache().bump(*affected_tables("sales"))
         return True
     except Exception as e:
         st.error(f"Satış silinirken hata: {e}")
@@ -278,27 +390,127 @@ def delete_sale(sale_id):
 def get_product_by_id(product_id):
     """ID'ye göre ürün getir"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE product_id = ?", (product_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        return crud.get_product(db_pool, product_id)
     except Exception as e:
         return None
 
 def get_sale_by_id(sale_id):
     """ID'ye göre satış getir"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM sales WHERE sale_id = ?", (sale_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        return crud.get_sale(db_pool, sale_id)
     except Exception as e:
         return None
 
+# --- Sayfalama ve Arama ---
+PAGE_SIZE_OPTIONS = [25, 50, 100, 500]
+PICKER_LIMIT = 50
+
+def _page_next(state_key):
+    """Sonraki sayfaya geç (buton geri çağrısı)"""
+    state = st.session_state[state_key]
+    if state["next_key"] is not None:
+        state["stack"].append(state["next_key"])
+
+def _page_prev(state_key):
+    """Önceki sayfaya dön (buton geri çağrısı)"""
+    state = st.session_state[state_key]
+    if len(state["stack"]) > 1:
+        state["stack"].pop()
+
+def paginated_table(page_sql, count_sql, key_column, key):
+    """Anahtar kümesi (keyset) sayfalamalı tablo göster; yalnızca geçerli sayfa yüklenir"""
+    state_key = f"{key}_pages"
+    page_size = st.selectbox("Sayfa boyutu", PAGE_SIZE_OPTIONS, index=1, key=f"{key}_page_size")
+    state = st.session_state.setdefault(state_key, {"page_size": page_size, "stack": [0], "next_key": None})
+    if state["page_size"] != page_size:
+        state.update(page_size=page_size, stack=[0], next_key=None)
+    
+    # Bir fazla satır çekerek sonraki sayfanın olup olmadığını anla
+    page_df = execute_sql_query(page_sql, (state["stack"][-1], page_size + 1))
+    if page_df is None:
+        return
+    if len(page_df) == 0 and len(state["stack"]) > 1:
+        # Geçerli sayfadaki tüm kayıtlar silinmiş; ilk sayfaya dön
+        state.update(stack=[0], next_key=None)
+        page_df = execute_sql_query(page_sql, (0, page_size + 1))
+        if page_df is None:
+            return
+    has_next = len(page_df) > page_size
+    page_df = page_df.iloc[:page_size]
+    state["next_key"] = int(page_df[key_column].iloc[-1]) if has_next else None
+    
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+    
+    # Toplam satır sayısı sonuç önbelleğinden gelir; tabloya yazılana kadar yeniden sayılmaz
+    count_df = execute_sql_query(count_sql)
+    total_rows = int(count_df.iloc[0, 0]) if count_df is not None else 0
+    total_pages = max(1, -(-total_rows // page_size))
+    
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("◀️ Önceki", key=f"{key}_prev", on_click=_page_prev, args=(state_key,),
+                  disabled=len(state["stack"]) == 1, use_container_width=True)
+    with col_info:
+        st.caption(f"Sayfa {len(state['stack'])} / {total_pages} · Toplam {total_rows} kayıt")
+    with col_next:
+        st.button("Sonraki ▶️", key=f"{key}_next", on_click=_page_next, args=(state_key,),
+                  disabled=not has_next, use_container_width=True)
+
+def search_products(term, limit=PICKER_LIMIT):
+    """Ürün adı veya ID'ye göre en fazla limit kadar ürün ara"""
+    if term:
+        return execute_sql_query(
+            "SELECT product_id, product_name, category, price FROM products "
+            "WHERE product_name LIKE ? OR product_id = ? ORDER BY product_id LIMIT ?",
+            (f"%{term}%", int(term) if term.isdigit() else -1, limit)
+        )
+    return execute_sql_query(
+        "SELECT product_id, product_name, category, price FROM products ORDER BY product_id LIMIT ?",
+        (limit,)
+    )
+
+def search_sales(term, limit=PICKER_LIMIT):
+    """Satış ID'si veya müşteri ID'sine göre en fazla limit kadar satış ara"""
+    if term.isdigit():
+        return execute_sql_query(
+            "SELECT * FROM sales WHERE sale_id = ? OR customer_id = ? ORDER BY sale_id DESC LIMIT ?",
+            (int(term), int(term), limit)
+        )
+    return execute_sql_query("SELECT * FROM sales ORDER BY sale_id DESC LIMIT ?", (limit,))
+
+def search_picker(label, search_fn, format_fn, id_column, key, current_row=None, help_text=None):
+    """Aramalı, sınırlı sayıda seçenek yükleyen seçim kutusu; seçilen satırı döndürür"""
+    term = st.text_input(f"🔎 {label} - ara", key=f"{key}_search", help=help_text).strip()
+    df = search_fn(term)
+    if df is None:
+        return None
+    rows = [row._asdict() for row in df.itertuples(index=False)]
+    # Arama yokken mevcut kayıt ilk sayfada olmasa bile seçili gösterilmeli
+    if current_row is not None and not term and all(r[id_column] != current_row[id_column] for r in rows):
+        rows.insert(0, current_row)
+    if not rows:
+        st.info("Eşleşen kayıt bulunamadı.")
+        return None
+    
+    index = 0
+    if current_row is not None:
+        index = next((i for i, r in enumerate(rows) if r[id_column] == current_row[id_column]), 0)
+    selected = st.selectbox(label, options=range(len(rows)), index=index,
+                            format_func=lambda i: format_fn(rows[i]), key=key)
+    return rows[selected]
+
+def format_product_option(row):
+    return f"{row['product_id']} - {row['product_name']}"
+
+def format_product_price_option(row):
+    return f"{row['product_name']} (₺{row['price']})"
+
+def format_sale_option(row):
+    return f"Satış #{row['sale_id']} - Müşteri {row['customer_id']} ({row['sale_date']})"
+
+def format_sale_delete_option(row):
+    return f"{format_sale_option(row)} - ₺{row['total_amount']}"
+
 # --- Ana Uygulama ---
 def main():
     # Başlık
@@ -307,11 +519,24 @@ def main():
     
     # Veritabanını başlat
     init_database()
+    get_warmup()
+    start_metrics_endpoint()
+    # Sütunlu kopya ilk analiz sorusundan önce arka planda yüklenmeye başlar
+    mirror = columnar.get_mirror(DB_FILE)
     
     # Sidebar - API Anahtarı ve Ayarlar
     with st.sidebar:
         st.header("⚙️ Ayarlar")
         
+        # LLM Arka Ucu
+        backend = st.selectbox(
+            "LLM Arka Ucu",
+            BACKENDS,
+            index=BACKENDS.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in BACKENDS else 0,
+            format_func=lambda name: {"gemini": "Google Gemini", "mock": "Yerel (mock, çevrimdışı)"}[name],
+            help="Yerel arka uç kurallar ve kayıtlı soru→SQL çiftleriyle ağ bağlantısı olmadan çalışır"
+        )
+        
         # API Anahtarı
         api_key = st.text_input(
             "Google API Anahtarı",
@@ -319,26 +544,17 @@ def main():
             value=os.environ.get("GOOGLE_API_KEY", ""),
             help="Google AI Studio'dan alınan API anahtarınızı girin"
         )
+        llm_ready = backend == 'mock' or bool(api_key)
+        if llm_ready:
+            # google.generativeai'nin yüklenmesi ve model kurulumu ilk soruyu beklemeden başlar
+            warm_model(api_key, backend, get_schema().system_instruction)
         
         st.markdown("---")
         
         # Veritabanı Şeması
         st.header("📊 Veritabanı Şeması")
-        st.code("""
-TABLE products:
-- product_id (INTEGER, PK)
-- product_name (TEXT)
-- category (TEXT)
-- price (REAL)
-
-TABLE sales:
-- sale_id (INTEGER, PK)
-- product_id (INTEGER, FK)
-- customer_id (INTEGER)
-- sale_date (TEXT)
-- quantity (INTEGER)
-- total_amount (REAL)
-        """, language="sql")
+        st.code(get_schema().text, language="sql", wrap_lines=True)
+        st.caption("Canlı veritabanından okunur; özet tablolar tetikleyicilerle güncel tutulur.")
         
         st.markdown("---")
         
@@ -354,9 +570,133 @@ TABLE sales:
         ]
         for query in example_queries:
             st.markdown(f"• {query}")
+        
+        st.markdown("---")
+        
+        # Önbellek İstatistikleri
+        cache_stats = get_query_cache().stats()
+        st.caption(
+            f"🗄️ SQL önbelleği: {cache_stats['entries']} kayıt, {cache_stats['templates']} kalıp, "
+            f"{cache_stats['hits']} isabet ({cache_stats['template_hits']} kalıptan) / {cache_stats['misses']} ıska"
+        )
+        if FAST_PATH_ENABLED:
+            fast_stats = get_intent_matcher(get_schema_hash()).stats()
+            st.caption(
+                f"⚡ Hızlı yol: {fast_stats['hits']} soru LLM'siz yanıtlandı, "
+                f"{fast_stats['misses']} soru LLM'e gitti (isabet oranı {fast_stats['hit_rate']:.0%})"
+            )
+        result_stats = get_result_cache().stats()
+        st.caption(
+            f"📦 Sonuç önbelleği: {result_stats['entries']} sorgu, "
+            f"{result_stats['bytes'] / 1024:.0f} KB, "
+            f"{result_stats['hits']} isabet / {result_stats['misses']} ıska"
+        )
+        ready_model = peek_model(backend, api_key, MODEL_NAME, get_schema().system_instruction) if llm_ready else None
+        if ready_model is not None:
+            llm_stats = get_client(ready_model).stats()
+            st.caption(
+                f"🤖 LLM: {llm_stats['calls']} çağrı, {llm_stats['coalesced']} birleştirilen, "
+                f"{llm_stats['retries']} yeniden deneme"
+            )
+        elif llm_ready:
+            st.caption("🤖 LLM: model arka planda hazırlanıyor...")
+        fix_stats = get_fix_store().stats()
+        st.caption(
+            f"🩹 SQL onarımı: {fix_stats['llm_repairs']} modelle, {fix_stats['saved_llm_calls']} yerel düzeltmeyle "
+            f"(toplam {fix_stats['saved_llm_calls_total']} LLM çağrısı kazanıldı) · {fix_stats['fixes']} kayıt, "
+            f"{fix_stats['patterns']} kalıp"
+        )
+        
+        # İndeks Danışmanı
+        with st.expander("🧭 İndeks Danışmanı"):
+            workload_queries = get_workload().queries()
+            st.caption(f"Kaydedilen farklı sorgu sayısı: {len(workload_queries)}")
+            # EXPLAIN her sorgu için çalışır; bu yüzden yalnızca istenince hesaplanır
+            if st.button("🔍 Önerileri Hesapla", use_container_width=True):
+                st.session_state["index_proposals"] = propose_indexes(DB_FILE, workload_queries)
+            index_proposals = st.session_state.get("index_proposals")
+            if index_proposals:
+                st.code(";\n".join(create_index_sql(p["table"], p["columns"]) for p in index_proposals), language="sql")
+                if st.button("⚡ Önerileri Uygula", use_container_width=True):
+                    with st.spinner("İndeksler oluşturuluyor ve gecikme ölçülüyor..."):
+                        index_report = apply_indexes(DB_FILE, workload_queries, index_proposals)
+                    st.session_state["index_proposals"] = None
+                    get_result_cache().clear()
+                    st.dataframe(
+                        pd.DataFrame(index_report)[["before_ms", "after_ms", "speedup", "sql"]],
+                        use_container_width=True, hide_index=True
+                    )
+            elif index_proposals is not None:
+                st.caption("Tam tarama yapan sorgu bulunamadı; önerilecek indeks yok.")
+        
+        # Performans
+        with st.expander("📈 Performans"):
+            perf_rows = [
+                {"aşama": labels.get("stage") or labels.get("operation"), **histogram.summary(**labels)}
+                for histogram in (STAGE_SECONDS, CRUD_SECONDS) for labels in histogram.label_values()
+            ]
+            if perf_rows:
+                perf_df = pd.DataFrame(perf_rows)
+                for column in ("mean", "p50", "p95", "p99"):
+                    perf_df[column] = (perf_df[column] * 1000).round(2)
+                st.dataframe(
+                    perf_df[["aşama", "count", "mean", "p50", "p95", "p99"]].rename(
+                        columns={"count": "adet", "mean": "ort. ms", "p50": "p50 ms", "p95": "p95 ms", "p99": "p99 ms"}
+                    ),
+                    use_container_width=True, hide_index=True
+                )
+            else:
+                st.caption("Henüz ölçüm yok.")
+            st.caption(
+                f"🔤 Token: {LLM_TOKENS.value(kind='prompt')} istem / {LLM_TOKENS.value(kind='completion')} yanıt · "
+                f"⚠️ Hata: {ERRORS.total()}"
+            )
+            if recent_errors:
+                st.dataframe(pd.DataFrame(list(recent_errors)[::-1]), use_container_width=True, hide_index=True)
+            st.download_button(
+                "📤 Prometheus metrikleri",
+                data=render_metrics(),
+                file_name="metrics.prom",
+                mime="text/plain",
+                on_click="ignore",
+                use_container_width=True
+            )
+            if METRICS_PORT:
+                st.caption(f"Uç nokta: http://127.0.0.1:{METRICS_PORT}/metrics")
+            if mirror is not None:
+                mirror_stats = mirror.stats()
+                if mirror_stats["current"]:
+                    mirror_state = f"güncel ({mirror_stats['rows'].get('sales', 0):,} satış, {mirror_stats['refresh_seconds']:.1f} sn'de yüklendi)"
+                else:
+                    mirror_state = "yükleniyor" if mirror_stats["refreshing"] else "eski; sorgular SQLite'ta"
+                st.caption(
+                    f"🦆 DuckDB kopyası: {mirror_state} · {mirror_stats['queries']} sorgu, "
+                    f"{mirror_stats['fallbacks']} SQLite'a geri dönüş · {mirror_stats['verified_shapes']} doğrulanmış, "
+                    f"{mirror_stats['sqlite_shapes']} farklı sonuçlu biçim"
+                )
+            else:
+                st.caption("🦆 Sütunlu motor kapalı (COLUMNAR_ENGINE=duckdb ile açılır, duckdb kurulu olmalı); sorgular SQLite'ta.")
+            if WRITE_QUEUE_ENABLED:
+                write_stats = get_write_queue(db_pool).stats()
+                st.caption(
+                    f"✍️ Yazma kuyruğu: {write_stats['ops']} işlem, {write_stats['batches']} commit "
+                    f"(commit başına ort. {write_stats['ops_per_commit']}) · {write_stats['failed']} hatalı"
+                )
+            shape_stats = SHAPES.stats()
+            st.caption(
+                f"🧩 Sorgu biçimleri: {shape_stats['shapes']} farklı, "
+                f"hazırlanmış ifade yeniden kullanımı {shape_stats['reuse_rate']:.0%}"
+            )
+            warmup_stats = get_warmup().stats()
+            st.caption("🔥 Isınma: " + ", ".join(
+                f"{name} {item['seconds']:.2f} sn" if item["seconds"] is not None else f"{name} sürüyor"
+                for name, item in warmup_stats.items()
+            ))
     
     # Ana Sekmeler
-    main_tab1, main_tab2, main_tab3 = st.tabs(["🤖 AI Sorgu", "📦 Ürün Yönetimi", "💰 Satış Yönetimi"])
+    main_tab1, main_tab2, main_tab3, main_tab4 = st.tabs(
+        ["🤖 AI Sorgu", "📦 Ürün Yönetimi", "💰 Satış Yönetimi", "📥 Toplu İçe Aktarım"]
+    )
     
     # --- TAB 1: AI Sorgu (Text-to-SQL) ---
     with main_tab1:
@@ -402,36 +742,83 @@ TABLE sales:
         
         # Sonuçlar
         if generate_btn and user_query:
-            if not api_key:
+            if not llm_ready:
                 st.warning("⚠️ Lütfen sidebar'dan API anahtarınızı girin!")
             else:
                 with st.spinner("SQL sorgusu oluşturuluyor..."):
                     try:
-                        model = init_model(api_key)
-                        generated_sql = get_sql_query(model, user_query)
+                        model = init_model(api_key, backend, get_schema().system_instruction)
+                        sql_box = st.empty()
+                        early_checks = {}
+
+                        def show_sql(sql, partial=True):
+                            with sql_box.container():
+                                st.subheader("🔧 Oluşturulan SQL Sorgusu")
+                                st.code(sql + (" ▌" if partial else ""), language="sql")
+
+                        def validate_early(statement):
+                            # Yanıtın kalanı gelirken sorgu planı çıkarılır; hatalı SQL çalıştırılmadan bildirilir
+                            early_checks[statement] = get_validation_executor().submit(validate_query, db_pool, statement)
+
+                        generated_sql = get_sql_query(model, user_query, show_sql, validate_early)
+                        early_check = early_checks.get(generated_sql)
+                        rejection = None
+                        if early_check is not None:
+                            try:
+                                early_check.result()
+                            except QueryRejected as e:
+                                # Olmayan sütun gibi hatalar çalıştırma aşamasında otomatik düzeltilir
+                                if repairable_error(e) is None:
+                                    rejection = e
                         
                         if generated_sql:
-                            st.subheader("🔧 Oluşturulan SQL Sorgusu")
-                            st.code(generated_sql, language="sql")
-                            
+                            show_sql(generated_sql, partial=False)
+
+                        if generated_sql and rejection is not None:
+                            get_query_cache().discard(user_query, get_schema_hash())
+                            st.error(f"🛡️ Sorgu engellendi: {rejection}")
+                        elif generated_sql:
                             # Sorguyu çalıştır
                             st.subheader("📋 Sorgu Sonuçları")
                             with st.spinner("Sorgu çalıştırılıyor..."):
-                                results_df = execute_sql_query(generated_sql)
+                                # Yalnızca ilk sayfa okunur; tam sonuç indirme sırasında akıtılır
+                                results_df, has_more, executed_sql = execute_sql_preview(generated_sql, model)
+                                if executed_sql != generated_sql:
+                                    show_sql(executed_sql, partial=False)
+                                    generated_sql = executed_sql
+                                    if results_df is not None:
+                                        get_query_cache().put(user_query, get_schema_hash(), executed_sql)
                                 
                                 if results_df is not None:
-                                    st.success(f"✅ {len(results_df)} satır bulundu")
-                                    st.dataframe(results_df, use_container_width=True)
+                                    get_question_index(get_schema_hash()).add(user_query, generated_sql)
+                                    if has_more:
+                                        st.success(f"✅ İlk {len(results_df)} satır gösteriliyor (tamamı indirilebilir)")
+                                    else:
+                                        st.success(f"✅ {len(results_df)} satır bulundu")
+                                    with track("render"):
+                                        st.dataframe(results_df, use_container_width=True)
                                     
-                                    # CSV İndirme
-                                    csv = results_df.to_csv(index=False).encode('utf-8')
-                                    st.download_button(
-                                        label="📥 CSV olarak indir",
-                                        data=csv,
-                                        file_name="sorgu_sonuclari.csv",
-                                        mime="text/csv"
-                                    )
+                                    # CSV / Parquet İndirme
+                                    col_csv, col_parquet = st.columns(2)
+                                    with col_csv:
+                                        st.download_button(
+                                            label="📥 CSV olarak indir",
+                                            data=export_csv(generated_sql),
+                                            file_name="sorgu_sonuclari.csv",
+                                            mime="text/csv",
+                                            on_click="ignore"
+                                        )
+                                    if PARQUET_AVAILABLE:
+                                        with col_parquet:
+                                            st.download_button(
+                                                label="📥 Parquet olarak indir",
+                                                data=export_parquet(generated_sql),
+                                                file_name="sorgu_sonuclari.parquet",
+                                                mime="application/vnd.apache.parquet",
+                                                on_click="ignore"
+                                            )
                                 else:
+                                    get_query_cache().discard(user_query, get_schema_hash())
                                     st.error("Sorgu çalıştırılırken bir hata oluştu.")
                     except Exception as e:
                         st.error(f"Hata: {e}")
@@ -442,9 +829,12 @@ TABLE sales:
         
         # Ürün Listesi
         st.subheader("📋 Ürün Listesi")
-        products_df = execute_sql_query("SELECT * FROM products ORDER BY product_id")
-        if products_df is not None:
-            st.dataframe(products_df, use_container_width=True, hide_index=True)
+        paginated_table(
+            "SELECT * FROM products WHERE product_id > ? ORDER BY product_id LIMIT ?",
+            "SELECT COUNT(*) FROM products",
+            "product_id",
+            key="products_table"
+        )
         
         st.markdown("---")
         
@@ -481,69 +871,63 @@ TABLE sales:
             st.subheader("✏️ Ürün Güncelle")
             
             # Ürün seçimi
-            if products_df is not None and len(products_df) > 0:
-                product_options = {f"{row['product_id']} - {row['product_name']}": row['product_id'] 
-                                   for _, row in products_df.iterrows()}
-                selected_product = st.selectbox(
-                    "Güncellenecek Ürünü Seçin",
-                    options=list(product_options.keys()),
-                    key="update_product_select"
-                )
+            selected_product = search_picker(
+                "Güncellenecek Ürünü Seçin",
+                search_products,
+                format_product_option,
+                "product_id",
+                key="update_product_select"
+            )
+            
+            if selected_product:
+                product_id = selected_product['product_id']
+                product_data = get_product_by_id(product_id)
                 
-                if selected_product:
-                    product_id = product_options[selected_product]
-                    product_data = get_product_by_id(product_id)
-                    
-                    if product_data:
-                        with st.form("update_product_form"):
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                upd_product_name = st.text_input("Ürün Adı", value=product_data[1])
-                            with col2:
-                                categories = ["Electronics", "Furniture", "Kitchenware", "Stationery", "Other"]
-                                current_cat_idx = categories.index(product_data[2]) if product_data[2] in categories else 0
-                                upd_category = st.selectbox("Kategori", categories, index=current_cat_idx)
-                            with col3:
-                                upd_price = st.number_input("Fiyat (₺)", value=float(product_data[3]), min_value=0.0, step=0.01, format="%.2f")
-                            
-                            submit_update = st.form_submit_button("✏️ Güncelle", type="primary", use_container_width=True)
-                            
-                            if submit_update:
-                                if update_product(product_id, upd_product_name, upd_category, upd_price):
-                                    st.success(f"✅ Ürün başarıyla güncellendi!")
-                                    st.rerun()
-            else:
-                st.info("Güncellenecek ürün bulunamadı.")
+                if product_data:
+                    with st.form("update_product_form"):
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            upd_product_name = st.text_input("Ürün Adı", value=product_data[1])
+                        with col2:
+                            categories = ["Electronics", "Furniture", "Kitchenware", "Stationery", "Other"]
+                            current_cat_idx = categories.index(product_data[2]) if product_data[2] in categories else 0
+                            upd_category = st.selectbox("Kategori", categories, index=current_cat_idx)
+                        with col3:
+                            upd_price = st.number_input("Fiyat (₺)", value=float(product_data[3]), min_value=0.0, step=0.01, format="%.2f")
+                        
+                        submit_update = st.form_submit_button("✏️ Güncelle", type="primary", use_container_width=True)
+                        
+                        if submit_update:
+                            if update_product(product_id, upd_product_name, upd_category, upd_price):
+                                st.success(f"✅ Ürün başarıyla güncellendi!")
+                                st.rerun()
         
         # Ürün Sil
         with crud_tab3:
             st.subheader("🗑️ Ürün Sil")
             
-            if products_df is not None and len(products_df) > 0:
-                product_options = {f"{row['product_id']} - {row['product_name']}": row['product_id'] 
-                                   for _, row in products_df.iterrows()}
-                selected_delete_product = st.selectbox(
-                    "Silinecek Ürünü Seçin",
-                    options=list(product_options.keys()),
-                    key="delete_product_select"
-                )
+            selected_delete_product = search_picker(
+                "Silinecek Ürünü Seçin",
+                search_products,
+                format_product_option,
+                "product_id",
+                key="delete_product_select"
+            )
+            
+            if selected_delete_product:
+                product_id = selected_delete_product['product_id']
                 
-                if selected_delete_product:
-                    product_id = product_options[selected_delete_product]
-                    
-                    st.warning(f"⚠️ '{selected_delete_product}' ürününü silmek istediğinizden emin misiniz?")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("🗑️ Evet, Sil", type="primary", use_container_width=True):
-                            if delete_product(product_id):
-                                st.success("✅ Ürün başarıyla silindi!")
-                                st.rerun()
-                    with col2:
-                        if st.button("❌ İptal", use_container_width=True):
+                st.warning(f"⚠️ '{format_product_option(selected_delete_product)}' ürününü silmek istediğinizden emin misiniz?")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("🗑️ Evet, Sil", type="primary", use_container_width=True):
+                        if delete_product(product_id):
+                            st.success("✅ Ürün başarıyla silindi!")
                             st.rerun()
-            else:
-                st.info("Silinecek ürün bulunamadı.")
+                with col2:
+                    if st.button("❌ İptal", use_container_width=True):
+                        st.rerun()
     
     # --- TAB 3: Satış Yönetimi (CRUD) ---
     with main_tab3:
@@ -551,18 +935,15 @@ TABLE sales:
         
         # Satış Listesi
         st.subheader("📋 Satış Listesi")
-        sales_query = """
+        sales_page_query = """
             SELECT s.sale_id, p.product_name, s.customer_id, s.sale_date, s.quantity, s.total_amount
             FROM sales s
             JOIN products p ON s.product_id = p.product_id
+            WHERE s.sale_id > ?
             ORDER BY s.sale_id
+            LIMIT ?
         """
-        sales_df = execute_sql_query(sales_query)
-        if sales_df is not None:
-            st.dataframe(sales_df, use_container_width=True, hide_index=True)
-        
-        # Raw sales data for CRUD operations
-        raw_sales_df = execute_sql_query("SELECT * FROM sales ORDER BY sale_id")
+        paginated_table(sales_page_query, "SELECT COUNT(*) FROM sales", "sale_id", key="sales_table")
         
         st.markdown("---")
         
@@ -573,19 +954,19 @@ TABLE sales:
         with sale_crud_tab1:
             st.subheader("➕ Yeni Satış Ekle")
             
-            # Ürün listesini al
-            products_for_sale = execute_sql_query("SELECT product_id, product_name, price FROM products")
+            # Ürün seçimi formun dışında; seçim değiştikçe toplam tutar güncellenir
+            selected_sale_product = search_picker(
+                "Ürün Seçin",
+                search_products,
+                format_product_price_option,
+                "product_id",
+                key="add_sale_product_select"
+            )
             
-            if products_for_sale is not None and len(products_for_sale) > 0:
+            if selected_sale_product:
                 with st.form("add_sale_form"):
                     col1, col2 = st.columns(2)
                     with col1:
-                        product_options_sale = {f"{row['product_name']} (₺{row['price']})": (row['product_id'], row['price']) 
-                                                for _, row in products_for_sale.iterrows()}
-                        selected_sale_product = st.selectbox(
-                            "Ürün Seçin",
-                            options=list(product_options_sale.keys())
-                        )
                         new_customer_id = st.number_input("Müşteri ID", min_value=1, step=1, value=101)
                     
                     with col2:
@@ -593,52 +974,58 @@ TABLE sales:
                         new_quantity = st.number_input("Adet", min_value=1, step=1, value=1)
                     
                     # Toplam tutarı hesapla
-                    if selected_sale_product:
-                        product_id, unit_price = product_options_sale[selected_sale_product]
-                        calculated_total = unit_price * new_quantity
-                        st.info(f"💵 Toplam Tutar: ₺{calculated_total:.2f}")
+                    product_id, unit_price = selected_sale_product['product_id'], selected_sale_product['price']
+                    calculated_total = unit_price * new_quantity
+                    st.info(f"💵 Toplam Tutar: ₺{calculated_total:.2f}")
                     
                     submit_add_sale = st.form_submit_button("➕ Satış Ekle", type="primary", use_container_width=True)
                     
                     if submit_add_sale:
-                        product_id, unit_price = product_options_sale[selected_sale_product]
                         total_amount = unit_price * new_quantity
                         sale_date_str = new_sale_date.strftime("%Y-%m-%d")
                         
                         if add_sale(product_id, new_customer_id, sale_date_str, new_quantity, total_amount):
                             st.success("✅ Satış başarıyla eklendi!")
                             st.rerun()
-            else:
+            elif not st.session_state.get("add_sale_product_select_search"):
                 st.warning("⚠️ Önce ürün eklemeniz gerekiyor!")
         
         # Satış Güncelle
         with sale_crud_tab2:
             st.subheader("✏️ Satış Güncelle")
             
-            if raw_sales_df is not None and len(raw_sales_df) > 0 and products_for_sale is not None:
-                sale_options = {f"Satış #{row['sale_id']} - Müşteri {row['customer_id']} ({row['sale_date']})": row['sale_id'] 
-                               for _, row in raw_sales_df.iterrows()}
-                selected_sale = st.selectbox(
-                    "Güncellenecek Satışı Seçin",
-                    options=list(sale_options.keys()),
-                    key="update_sale_select"
-                )
+            selected_sale = search_picker(
+                "Güncellenecek Satışı Seçin",
+                search_sales,
+                format_sale_option,
+                "sale_id",
+                key="update_sale_select",
+                help_text="Satış ID'si veya müşteri ID'si girin"
+            )
+            
+            if selected_sale:
+                sale_id = selected_sale['sale_id']
+                sale_data = get_sale_by_id(sale_id)
                 
-                if selected_sale:
-                    sale_id = sale_options[selected_sale]
-                    sale_data = get_sale_by_id(sale_id)
+                if sale_data:
+                    current_product = get_product_by_id(sale_data[1])
+                    current_product_row = None
+                    if current_product:
+                        current_product_row = dict(zip(("product_id", "product_name", "category", "price"), current_product))
+                    upd_product = search_picker(
+                        "Ürün",
+                        search_products,
+                        format_product_price_option,
+                        "product_id",
+                        key=f"update_sale_product_{sale_id}",
+                        current_row=current_product_row
+                    )
                     
-                    if sale_data:
+                    if upd_product:
                         with st.form("update_sale_form"):
                             col1, col2 = st.columns(2)
                             
-                            product_list = [(row['product_id'], row['product_name'], row['price']) 
-                                           for _, row in products_for_sale.iterrows()]
-                            product_names = [f"{p[1]} (₺{p[2]})" for p in product_list]
-                            current_product_idx = next((i for i, p in enumerate(product_list) if p[0] == sale_data[1]), 0)
-                            
                             with col1:
-                                upd_product = st.selectbox("Ürün", product_names, index=current_product_idx)
                                 upd_customer_id = st.number_input("Müşteri ID", value=sale_data[2], min_value=1, step=1)
                             
                             with col2:
@@ -648,52 +1035,98 @@ TABLE sales:
                                 upd_quantity = st.number_input("Adet", value=sale_data[4], min_value=1, step=1)
                             
                             # Toplam tutarı hesapla
-                            selected_idx = product_names.index(upd_product)
-                            new_unit_price = product_list[selected_idx][2]
+                            new_unit_price = upd_product['price']
                             new_total = new_unit_price * upd_quantity
                             st.info(f"💵 Yeni Toplam Tutar: ₺{new_total:.2f}")
                             
                             submit_update_sale = st.form_submit_button("✏️ Güncelle", type="primary", use_container_width=True)
                             
                             if submit_update_sale:
-                                new_product_id = product_list[selected_idx][0]
+                                new_product_id = upd_product['product_id']
                                 sale_date_str = upd_sale_date.strftime("%Y-%m-%d")
                                 
                                 if update_sale(sale_id, new_product_id, upd_customer_id, sale_date_str, upd_quantity, new_total):
                                     st.success("✅ Satış başarıyla güncellendi!")
                                     st.rerun()
-            else:
-                st.info("Güncellenecek satış bulunamadı.")
         
         # Satış Sil
         with sale_crud_tab3:
             st.subheader("🗑️ Satış Sil")
             
-            if raw_sales_df is not None and len(raw_sales_df) > 0:
-                sale_options = {f"Satış #{row['sale_id']} - Müşteri {row['customer_id']} ({row['sale_date']}) - ₺{row['total_amount']}": row['sale_id'] 
-                               for _, row in raw_sales_df.iterrows()}
-                selected_delete_sale = st.selectbox(
-                    "Silinecek Satışı Seçin",
-                    options=list(sale_options.keys()),
-                    key="delete_sale_select"
-                )
+            selected_delete_sale = search_picker(
+                "Silinecek Satışı Seçin",
+                search_sales,
+                format_sale_delete_option,
+                "sale_id",
+                key="delete_sale_select",
+                help_text="Satış ID'si veya müşteri ID'si girin"
+            )
+            
+            if selected_delete_sale:
+                sale_id = selected_delete_sale['sale_id']
                 
-                if selected_delete_sale:
-                    sale_id = sale_options[selected_delete_sale]
-                    
-                    st.warning(f"⚠️ '{selected_delete_sale}' satışını silmek istediğinizden emin misiniz?")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("🗑️ Evet, Sil", type="primary", use_container_width=True, key="confirm_delete_sale"):
-                            if delete_sale(sale_id):
-                                st.success("✅ Satış başarıyla silindi!")
-                                st.rerun()
-                    with col2:
-                        if st.button("❌ İptal", use_container_width=True, key="cancel_delete_sale"):
+                st.warning(f"⚠️ '{format_sale_delete_option(selected_delete_sale)}' satışını silmek istediğinizden emin misiniz?")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("🗑️ Evet, Sil", type="primary", use_container_width=True, key="confirm_delete_sale"):
+                        if delete_sale(sale_id):
+                            st.success("✅ Satış başarıyla silindi!")
                             st.rerun()
-            else:
-                st.info("Silinecek satış bulunamadı.")
+                with col2:
+                    if st.button("❌ İptal", use_container_width=True, key="cancel_delete_sale"):
+                        st.rerun()
+    
+    # --- TAB 4: Toplu İçe Aktarım ---
+    with main_tab4:
+        st.header("📥 Toplu İçe Aktarım")
+        st.markdown(
+            "CSV veya Parquet dosyasındaki ürün/satış kayıtlarını tek bir işlemde içe aktarın. "
+            "Satışlarda `total_amount` boşsa web formundaki gibi `fiyat × adet` olarak hesaplanır."
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            import_table = st.selectbox("Hedef Tablo", ["sales", "products"], key="import_table")
+        with col2:
+            import_batch_size = st.number_input(
+                "Batch Boyutu", min_value=1000, step=10000, value=DEFAULT_BATCH_SIZE, key="import_batch_size"
+            )
+        
+        if import_table == "sales":
+            st.caption("Zorunlu sütunlar: product_id, customer_id, sale_date (YYYY-MM-DD), quantity · İsteğe bağlı: sale_id, total_amount")
+        else:
+            st.caption("Zorunlu sütunlar: product_name, price · İsteğe bağlı: product_id, category")
+        
+        uploaded_file = st.file_uploader("Dosya Seçin", type=["csv", "parquet"], key="import_file")
+        
+        if uploaded_file and st.button("📥 İçe Aktar", type="primary", use_container_width=True):
+            progress_bar = st.progress(0.0, text="İçe aktarılıyor...")
+            
+            def report_progress(rows_read, rows_inserted, rows_rejected):
+                # Toplam satır sayısı önceden bilinmediği için dosya konumundan tahmin edilir
+                fraction = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                progress_bar.progress(
+                    fraction,
+                    text=f"{rows_read:,} satır okundu · {rows_inserted:,} eklendi · {rows_rejected:,} reddedildi"
+                )
+            
+            try:
+                stats = import_file(
+                    uploaded_file, import_table, db_file=DB_FILE, batch_size=int(import_batch_size),
+                    progress=report_progress, file_name=uploaded_file.name
+                )
+                get_result_cache().bump(*affected_tables(import_table))
+                progress_bar.progress(1.0, text="Tamamlandı")
+                st.success(
+                    f"✅ {stats['rows_inserted']:,} satır {stats['seconds']:.2f} sn'de eklendi "
+                    f"({stats['rows_per_sec']:,.0f} satır/sn)"
+                )
+                if stats["rows_rejected"]:
+                    st.warning(f"⚠️ {stats['rows_rejected']:,} satır doğrulamadan geçemedi:")
+                    st.code("\n".join(stats["errors"]))
+            except Exception as e:
+                st.error(f"İçe aktarım hatası (işlem geri alındı): {e}")
     
     # Footer
     st.markdown("---")
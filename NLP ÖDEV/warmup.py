@@ -0,0 +1,98 @@
+import importlib
+import os
+import threading
+import time
+
+from metrics import REGISTRY, record_error
+
+# --- Isınma Ayarları ---
+WARMUP_ENABLED = os.environ.get("WARMUP", "1").lower() not in ('0', 'false', 'off')
+# İlk istekte yüklenmesi saniyeler süren modüller (ör. google.generativeai ~1 sn, pandas ~0.6 sn)
+PRELOAD_MODULES = ('pandas', 'google.generativeai')
+
+WARMUP_SECONDS = REGISTRY.histogram(
+    'texttosql_warmup_seconds', 'Başlangıçta arka planda yapılan ısınma görevlerinin süresi', ('task',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+
+class WarmUp:
+    """Başlangıç işlerini arka plan iş parçacıklarında çalıştırır
+
+    İlk istek hazır olmayan görevi wait() ile bekler; böylece kurulum maliyeti kullanıcının
+    ilk sorusu yerine uygulamanın açılışıyla örtüşür. Hata veren görev wait()'te yeniden fırlatılır.
+    """
+
+    def __init__(self, enabled=WARMUP_ENABLED):
+        self.enabled = enabled
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, function, *args, **kwargs):
+        """Görevi arka planda başlat; aynı adlı görev zaten varsa yeniden başlatılmaz"""
+        with self._lock:
+            if name in self._tasks:
+                return self._tasks[name]
+            task = self._tasks[name] = {"done": threading.Event(), "result": None, "error": None, "seconds": None}
+
+        def run():
+            started = time.perf_counter()
+            try:
+                task["result"] = function(*args, **kwargs)
+            except Exception as e:
+                task["error"] = e
+                record_error(f"warmup_{name}", e)
+            finally:
+                task["seconds"] = time.perf_counter() - started
+                WARMUP_SECONDS.observe(task["seconds"], task=name)
+                task["done"].set()
+
+        if self.enabled:
+            threading.Thread(target=run, name=f"warmup-{name}", daemon=True).start()
+        else:
+            run()
+        return task
+
+    def wait(self, name, timeout=None):
+        """Görev bitene kadar bekle ve sonucunu döndür; başlatılmamış görev için None"""
+        with self._lock:
+            task = self._tasks.get(name)
+        if task is None:
+            return None
+        if not task["done"].wait(timeout):
+            raise TimeoutError(f"Isınma görevi '{name}' {timeout:g} sn içinde bitmedi.")
+        if task["error"] is not None:
+            raise task["error"]
+        return task["result"]
+
+    def ready(self, name):
+        with self._lock:
+            task = self._tasks.get(name)
+        return task is not None and task["done"].is_set() and task["error"] is None
+
+    def stats(self):
+        """Görev adı → süre (sn; sürüyorsa None) ve hata"""
+        with self._lock:
+            tasks = dict(self._tasks)
+        return {name: {"seconds": round(task["seconds"], 3) if task["seconds"] is not None else None,
+                       "error": f"{type(task['error']).__name__}: {task['error']}" if task["error"] else None}
+                for name, task in tasks.items()}
+
+
+def preload_modules(names=PRELOAD_MODULES):
+    """Ağır modülleri içe aktar; kurulu olmayanlar atlanır. Yüklenen modül adlarını döndür"""
+    loaded = []
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        loaded.append(name)
+    return loaded
+
+
+def open_connections(pool):
+    """Havuzdaki okuma ve salt okunur bağlantıları önceden aç (WAL ve PRAGMA ayarları dahil)"""
+    with pool.reader() as conn:
+        conn.execute("SELECT 1").fetchone()
+    with pool.read_only() as conn:
+        conn.execute("SELECT 1").fetchone()
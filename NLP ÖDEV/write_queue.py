@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import REGISTRY
+
+# --- Yazma Kuyruğu Ayarları ---
+WRITE_QUEUE_ENABLED = os.environ.get("WRITE_QUEUE", "1").lower() not in ('0', 'false', 'off')
+# İlk işlemden sonra en fazla bu kadar beklenir; 0 ise yalnızca o an kuyrukta bekleyenler birleştirilir
+MAX_DELAY_SECONDS = float(os.environ.get("WRITE_QUEUE_MAX_DELAY_MS", "5")) / 1000
+MAX_BATCH_OPS = int(os.environ.get("WRITE_QUEUE_MAX_BATCH", "1000"))
+
+BATCH_OPS = REGISTRY.histogram(
+    'texttosql_write_batch_ops', 'Tek commit ile yazılan CRUD işlemi sayısı',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+COMMIT_SECONDS = REGISTRY.histogram('texttosql_write_commit_seconds', 'Toplu yazmanın (yürütme + commit) süresi')
+
+
+class WriteQueue:
+    """Eşzamanlı yazma işlemlerini tek işlemde (transaction) birleştirip bir kez commit eden kuyruk
+
+    Her işlem kendi SAVEPOINT'inde çalışır: hata veren işlem geri alınır, diğerleri yazılır ve her
+    çağıran kendi sonucunu (ya da hatasını) alır. Böylece satır başına bir commit/fsync ve yazıcı
+    kilidi için bekleme yerine max_delay içinde gelen en fazla max_batch işlem için bir commit yapılır.
+    """
+
+    def __init__(self, pool, max_delay=MAX_DELAY_SECONDS, max_batch=MAX_BATCH_OPS):
+        self.pool = pool
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.ops = 0
+        self.failed = 0
+        self.batches = 0
+        self._last_batch = 1
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql_query, params=()):
+        """İşlemi kuyruğa koy; sonucu (lastrowid, rowcount) olan Future döndür"""
+        future = Future()
+        self._queue.put((sql_query, params, future))
+        return future
+
+    def execute(self, sql_query, params=()):
+        """İşlem commit edilene kadar bekle; (lastrowid, rowcount) döndür, işlem hata verdiyse fırlat"""
+        return self.submit(sql_query, params).result()
+
+    def _collect(self):
+        """İlk işlemi bekle, sonra süre veya adet sınırına kadar gelenleri ekle; durdurulduysa None
+
+        Kuyruk boşaldığında yalnızca grup önceki gruptan küçükse beklenir: önceki grubun boyutu o anki
+        eşzamanlı yazıcı sayısını gösterir. Tek yazıcı varken işlemler gecikmeden commit edilir.
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(batch) >= self._last_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                # Durdurma isteği bu grup yazıldıktan sonra işlenir
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        results = []
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql_query, params, _ in batch:
+                    conn.execute("SAVEPOINT write_op")
+                    try:
+                        cursor = conn.execute(sql_query, params)
+                        results.append((cursor.lastrowid, cursor.rowcount))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_op")
+                        results.append(e)
+                    conn.execute("RELEASE write_op")
+        except Exception as e:
+            # BEGIN veya commit başarısız oldu; gruptaki hiçbir işlem yazılmadı
+            results = [e] * len(batch)
+        COMMIT_SECONDS.observe(time.perf_counter() - started)
+        BATCH_OPS.observe(len(batch))
+        self._last_batch = len(batch)
+        failed = sum(isinstance(result, Exception) for result in results)
+        self.ops += len(batch)
+        self.failed += failed
+        self.batches += 1
+        for (_, _, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {"ops": self.ops, "failed": self.failed, "batches": self.batches,
+                "ops_per_commit": round(self.ops / self.batches, 1) if self.batches else 0.0,
+                "queued": self._queue.qsize()}
+
+    def close(self):
+        """Kuyruktakileri yazdıktan sonra iş parçacığını durdur"""
+        self._queue.put(None)
+        self._thread.join()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(pool):
+    """Bağlantı havuzu (veritabanı) başına tek yazma kuyruğu"""
+    with _queues_lock:
+        write_queue = _queues.get(id(pool))
+        if write_queue is None or write_queue.pool is not pool:
+            write_queue = _queues[id(pool)] = WriteQueue(pool)
+        return write_queue
+
+
+def write(pool, sql_query, params=()):
+    """Tek yazma ifadesini çalıştır ve commit et; (lastrowid, rowcount) döndür
+
+    WRITE_QUEUE açıksa (varsayılan) işlem kuyrukta diğer eşzamanlı yazmalarla birlikte commit edilir.
+    """
+    if WRITE_QUEUE_ENABLED:
+        return get_write_queue(pool).execute(sql_query, params)
+    with pool.writer() as conn:
+        cursor = conn.execute(sql_query, params)
+    return cursor.lastrowid, cursor.rowcount